@@ -0,0 +1,76 @@
+"""Micro-benchmark message codecs on typical agent payloads.
+
+Compares encode/decode throughput and encoded size of each available codec for a product manager's output
+(`PMOutputSchema`) wrapped in a `Message`, and for a task assignment with inlined inputs.
+
+Usage:
+    python -m benchmarks.bench_codecs [--number 20000]
+"""
+
+import argparse
+import timeit
+import uuid
+
+from germinate_ai.data.schemas.messages import Message
+from germinate_ai.data.schemas.tasks import TaskAssignment
+from germinate_ai.message_bus.codecs import CODECS, get_codec
+from germinate_ai.workflows.metagpt.states.design import PMOutputSchema, PRDDocument
+
+
+def pm_output_message() -> Message:
+    output = PMOutputSchema(
+        product_requirements="Build a command line snake game in Python. " * 4,
+        prd_document=PRDDocument(
+            product_goals=[f"Goal {i}: keep the player engaged for longer." for i in range(8)],
+            requirements=[f"Requirement {i}: the snake grows when it eats food." for i in range(24)],
+            user_stories=[f"As a player, I want feature #{i} so that the game is fun." for i in range(16)],
+        ),
+    )
+    return Message(source="pm_task", payload=output.model_dump())
+
+
+def task_assignment(message: Message) -> TaskAssignment:
+    return TaskAssignment(
+        state_instance_id=uuid.uuid4(),
+        name="sa_task",
+        phase_index=1,
+        inputs={"pm_task": message.payload},
+    )
+
+
+def bench(name: str, item, number: int):
+    try:
+        codec = get_codec(name)
+    except ImportError as e:
+        print(f"{name:>8}: skipped ({e})")
+        return
+    model = type(item)
+    data = codec.encode(item)
+    assert codec.decode_model(data, model) == item
+
+    encode = timeit.timeit(lambda: codec.encode(item), number=number)
+    decode = timeit.timeit(lambda: codec.decode_model(data, model), number=number)
+    print(
+        f"{name:>8}: {len(data):>6} bytes | "
+        f"encode {number / encode:>10,.0f}/s | decode {number / decode:>10,.0f}/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20_000, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    message = pm_output_message()
+    for label, item in [
+        ("Message(PMOutputSchema)", message),
+        ("TaskAssignment (inlined inputs)", task_assignment(message)),
+    ]:
+        print(label)
+        for name in CODECS:
+            bench(name, item, args.number)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Startup benchmark: measure CLI import time with `python -X importtime`, and fail on regressions.
+
+Imports the module in a fresh interpreter (without any settings in the environment), then checks its cumulative
+import time against a budget, and that none of the heavy modules only needed by commands were imported.
+
+Exits with status 1 if the budget is exceeded, or a heavy module was imported.
+
+Usage:
+    python -m benchmarks.bench_startup [--module germinate_ai.cli.cli] [--budget-ms 500] [--runs 5] [--top 10]
+        [--allow-heavy]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that only commands should import
+HEAVY_MODULES = [
+    "sqlalchemy",
+    "nats",
+    "langchain_core",
+    "cloudpickle",
+    "pydantic_settings",
+    "germinate_ai.data",
+    "germinate_ai.message_bus",
+]
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """Import `module` in a fresh interpreter, and return the (self, cumulative) import time of each imported
+    module, in microseconds."""
+    env = {
+        k: v
+        for k, v in os.environ.items()
+        if k not in ("DATABASE_URL", "NATS_URL", "GOOGLE_AI_API_KEY")
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # e.g. "import time:       289 |      42286 |     certifi.core"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="germinate_ai.cli.cli")
+    parser.add_argument("--budget-ms", type=float, default=500)
+    parser.add_argument("--runs", type=int, default=5, help="Report the median of this many runs")
+    parser.add_argument("--top", type=int, default=10, help="Show the modules slowest to import")
+    parser.add_argument(
+        "--allow-heavy", action="store_true", help="Don't fail if heavy modules are imported"
+    )
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(times[args.module][1] for times in runs) / 1000
+
+    times = runs[-1]
+    print(f"Slowest imports (self time) for `{args.module}`:")
+    for name, (self_us, cumulative_us) in sorted(
+        times.items(), key=lambda item: item[1][0], reverse=True
+    )[: args.top]:
+        print(f"  {self_us / 1000:>8.1f}ms  (cumulative {cumulative_us / 1000:>8.1f}ms)  {name}")
+
+    failed = False
+    heavy = [
+        m
+        for m in HEAVY_MODULES
+        if any(name == m or name.startswith(f"{m}.") for name in times)
+    ]
+    if heavy and not args.allow_heavy:
+        print(f"FAIL: imported heavy modules: {heavy}")
+        failed = True
+
+    status = "OK" if total_ms <= args.budget_ms else "FAIL"
+    print(f"{status}: `{args.module}` imports in {total_ms:.1f}ms (median of {args.runs}, budget {args.budget_ms:.0f}ms)")
+    failed = failed or total_ms > args.budget_ms
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,11 +4,8 @@ from typing import Annotated, Optional
 from loguru import logger
 import typer
 
-from germinate_ai.worker.main import start_worker_node
-from germinate_ai.coordinator.main import start_coordinator
-from germinate_ai.data.database import create_tables
-
-from germinate_ai.cli.run_workflow import import_and_run_workflow
+# Note: Commands import what they need when they run, so that e.g. `germinate --help` doesn't pay for
+# importing SQLAlchemy, NATS, langchain etc. (see `benchmarks/bench_startup.py`)
 
 
 cli = typer.Typer(no_args_is_help=True, pretty_exceptions_enable=False)
@@ -23,6 +20,8 @@ def api():
 @cli.command()
 def coordinator():
     """Start the germinate-ai Coordinator."""
+    from germinate_ai.coordinator.main import start_coordinator
+
     start_coordinator()
 
 
@@ -31,16 +30,34 @@ def worker(
     n_procs: Annotated[
         int, typer.Option("--num-procs", "-n", help="Number of worker processes")
     ] = None,
+    concurrency: Annotated[
+        int,
+        typer.Option(
+            "--concurrency", "-c", help="Number of concurrent task slots per worker process"
+        ),
+    ] = None,
+    workflows: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            "--workflow",
+            "-w",
+            help='Import path of a workflow to preload (repeatable) e.g. "germinate_ai.workflows.metagpt.main:workflow". Defaults to the `worker_workflows` setting',
+        ),
+    ] = None,
+    prefork: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--prefork/--no-prefork",
+            help="Import heavy modules once and fork worker processes that share them. Defaults to the `worker_prefork` setting",
+        ),
+    ] = None,
 ):
     """Start a germinate-ai Worker."""
+    from germinate_ai.worker.main import start_worker_node
 
-    # TODO importing manually so tasks get registered
-    # TODO IMPORTANT
-    from ..workflows.metagpt.main import workflow
-
-    logger.info(f"TEMP DEV - Manually imported workflow preset: {workflow.name}")
-
-    start_worker_node(n_procs=n_procs)
+    start_worker_node(
+        n_procs=n_procs, concurrency=concurrency, workflows=workflows, prefork=prefork
+    )
 
 
 @cli.command()
@@ -55,18 +72,50 @@ def workflow(
         Optional[str],
         typer.Argument(help="Input data for first task(s) as JSON string."),
     ] = None,
+    scheduling_mode: Annotated[
+        Optional[str],
+        typer.Option(
+            "--scheduling-mode",
+            help='"phases" to run tasks a DAG generation at a time, or "dag" to run each task as soon as its parents complete',
+        ),
+    ] = None,
 ):
     """Run workflow from a module.
 
     Example usage:
         germinate workflow simple_metagpt:workflow
     """
-    import_and_run_workflow(import_path, input_data_json=input_data_json)
+    from germinate_ai.cli.run_workflow import import_and_run_workflow
+
+    import_and_run_workflow(
+        import_path, input_data_json=input_data_json, scheduling_mode=scheduling_mode
+    )
+
+
+@cli.command()
+def tail(
+    workflow_run_id: Annotated[str, typer.Argument(help="ID of the workflow run")],
+    task_name: Annotated[
+        Optional[str],
+        typer.Option("--task", "-t", help="Only print this task's output"),
+    ] = None,
+):
+    """Print the output of a workflow run's tasks as it's streamed."""
+    import asyncio
+
+    from germinate_ai.cli.tail_run import tail_run
+
+    try:
+        asyncio.run(tail_run(workflow_run_id, task_name=task_name))
+    except KeyboardInterrupt:
+        pass
 
 
 @cli.command()
 def db():
     """Dev: Create DB tables."""
+    from germinate_ai.data.database import create_tables
+
     create_tables()
 
 
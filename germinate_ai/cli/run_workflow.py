@@ -5,6 +5,7 @@ from types import ModuleType
 from loguru import logger
 from pydantic import BaseModel, ValidationError
 
+from germinate_ai.config import settings
 from germinate_ai.coordinator import Scheduler
 from germinate_ai.core.exceptions import InvalidArgumentsException
 from germinate_ai.core.loader import (
@@ -15,6 +16,7 @@ from germinate_ai.core.loader import (
 from germinate_ai.core.workflows import Workflow
 from germinate_ai.data.database import get_db_session
 from germinate_ai.data.models import (
+    SchedulingModeEnum,
     StateInstance,
     StateInstanceStateEnum,
     TaskInstance,
@@ -24,6 +26,7 @@ from germinate_ai.data.repositories.workflow_runs_repository import (
     create_run_from_workflow,
 )
 from germinate_ai.data.schemas.messages import Message
+from germinate_ai.memory.claim_check import ClaimCheck
 from germinate_ai.message_bus import NATSQueue, nats_connection
 
 
@@ -32,16 +35,31 @@ def import_and_run_workflow(
     *,
     working_dir: typ.Optional[str] = None,
     input_data_json: typ.Optional[str] = None,
+    scheduling_mode: typ.Optional[str] = None,
 ):
     module_name, var_name = parse_import_path(workflow_import_path)
     module = import_module(module_name, working_dir=working_dir)
     workflow = get_workflow_from_module(module, var_name=var_name)
 
     logger.info(f"Running workflow {workflow.name}")
-    run_workflow(workflow, module, input_data_json)
+    run_workflow(workflow, module, input_data_json, scheduling_mode=scheduling_mode)
 
 
-def run_workflow(workflow: Workflow, module: ModuleType, input_data_json: str):
+def run_workflow(
+    workflow: Workflow,
+    module: ModuleType,
+    input_data_json: str,
+    scheduling_mode: typ.Optional[str] = None,
+):
+    if scheduling_mode is None:
+        scheduling_mode = settings.scheduling_mode
+    try:
+        scheduling_mode = SchedulingModeEnum[scheduling_mode]
+    except KeyError:
+        raise InvalidArgumentsException(
+            f"Invalid scheduling mode `{scheduling_mode}`: expected one of {[m.name for m in SchedulingModeEnum]}"
+        )
+
     # 1. sort each state's task DAG
     workflow.build()
     # print("BUILT")
@@ -88,7 +106,9 @@ def run_workflow(workflow: Workflow, module: ModuleType, input_data_json: str):
             initial_state = None
             for state in workflow.states:
                 state_instance = StateInstance(
-                    name=state.name, workflow_run=workflow_run
+                    name=state.name,
+                    workflow_run=workflow_run,
+                    scheduling_mode=scheduling_mode,
                 )
                 # Store toposorted generations
                 state_instance.sorted_tasks_phases = state_phases[state.name]
@@ -126,6 +146,8 @@ def run_workflow(workflow: Workflow, module: ModuleType, input_data_json: str):
                     state_transitions[condition.name] = condition.transition.target.name
                 state_instance.transitions = state_transitions
 
+                # Set up phase/dependency counters now that the tasks are added
+                state_instance.start()
                 db.add(state_instance)
 
 
@@ -134,6 +156,9 @@ def run_workflow(workflow: Workflow, module: ModuleType, input_data_json: str):
             db.add(workflow_run)
 
         db.refresh(initial_state)
+        logger.info(
+            f"Started workflow run {initial_state.workflow_run_id} (follow its output with `germinate tail {initial_state.workflow_run_id}`)"
+        )
 
         # 3. Queue first phase of initial state
         asyncio.run(_run_state(initial_state, input_data=input_data))
@@ -147,10 +172,13 @@ async def _run_state(state: StateInstance, *, input_data: BaseModel):
             stream="jobs",
             subject=f"jobs.{state.id}.from_start.to_descendant",
         )
-        await nq.connect()
+        await nq.connect(subscribe=False)
         msg = Message(source="start", payload=input_data.model_dump())
-        await nq.enqueue(msg.model_dump_json())
+        # Publish just a reference to large inputs
+        await nq.enqueue(
+            await ClaimCheck(connection=nc).offload(msg, name=f"{state.id}.start")
+        )
 
         scheduler = Scheduler(nc=nc)
         await scheduler.connect()
-        await scheduler.enqueue_state(state)
+        await scheduler.enqueue_state(state, start_output=msg.payload)
@@ -0,0 +1,43 @@
+import json
+import sys
+import typing as typ
+
+from germinate_ai.message_bus import nats_connection
+from germinate_ai.message_bus.streams import stream_subject
+
+
+class StreamPrinter:
+    """Prints the output chunks of a workflow run's tasks as they arrive, with a header whenever the task changes."""
+
+    def __init__(self, out: typ.TextIO = None):
+        if out is None:
+            out = sys.stdout
+        self.out = out
+        self.current = None
+
+    def handle(self, subject: str, data: bytes):
+        # streams.<workflow run id>.<state name>.<task name>
+        _, _, state_name, task_name = subject.split(".", 3)
+        task = f"{state_name}.{task_name}"
+        event = json.loads(data)
+
+        if task != self.current:
+            self.out.write(f"\n--- {task} ---\n")
+            self.current = task
+        if "chunk" in event:
+            self.out.write(event["chunk"])
+        elif event.get("done"):
+            error = event.get("error")
+            self.out.write(f"\n--- {task} {'failed: ' + error if error else 'done'} ---\n")
+            self.current = None
+        self.out.flush()
+
+
+async def tail_run(workflow_run_id: str, task_name: typ.Optional[str] = None):
+    """Print a workflow run's streamed task output (optionally just one task's) until interrupted."""
+    subject = stream_subject(workflow_run_id, task_name=task_name or "*")
+    printer = StreamPrinter()
+    async with nats_connection() as nc:
+        sub = await nc.nc.subscribe(subject)
+        async for msg in sub.messages:
+            printer.handle(msg.subject, msg.data)
@@ -1 +1,7 @@
-from .config import settings
\ No newline at end of file
+from .config import Settings, get_settings, settings
+
+__all__ = [
+    "Settings",
+    "get_settings",
+    "settings",
+]
@@ -1,3 +1,7 @@
+import functools
+import typing as typ
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -14,9 +18,144 @@ class Settings(BaseSettings):
     database_url: str
     nats_url: str
 
+    # DB connection pool (per process)
+    db_pool_size: int = 5
+    """Number of connections kept open in each process's pool."""
+    db_max_overflow: int = 10
+    """Number of extra connections allowed when the pool is exhausted."""
+    db_pool_timeout: float = 30
+    """Seconds to wait for a connection before giving up."""
+    db_pool_recycle: int = -1
+    """Replace connections older than this many seconds (-1 to never replace.)"""
+    db_pool_pre_ping: bool = False
+    """Test connections when checking them out of the pool."""
+    db_share_engine: bool = True
+    """Share one engine (and pool) between all async DB sessions in a process."""
+
     nats_jetstream_name: str = "germinate"
+    subscription_cache_size: int = 128
+    """Max number of NATS queues (and their consumers) cached per process."""
+    message_codec: Literal["json", "orjson", "msgpack"] = "json"
+    """Codec used to encode published messages (see `germinate_ai.message_bus.codecs`.)"""
+    message_compression: Literal["none", "zlib", "zstd", "lz4"] = "none"
+    """Compress published messages larger than `message_compression_min_bytes` (see `germinate_ai.message_bus.compression`.)"""
+    message_compression_min_bytes: int = 4 * 1024
+    """Messages smaller than this (after encoding) are never compressed."""
+    payload_offload_min_bytes: int = 512 * 1024
+    """Message payloads at least this size (as JSON) are stored in the object store instead. 0 disables offloading."""
+    payload_bucket: str = "payloads"
+    """Object store bucket for offloaded message payloads."""
+    payload_ttl: float = 7 * 24 * 60 * 60
+    """Seconds before offloaded payloads expire (only applies when creating the bucket.) They must outlive the workflow runs that read them. 0 keeps them forever."""
+    task_streaming: bool = True
+    """Publish running tasks' incremental output (e.g. LLM tokens) on `streams.<workflow run>.<state>.<task>`."""
+    inline_task_outputs_max_bytes: int = 16 * 1024
+    """Task outputs up to this size (as JSON) are inlined in their dependents' assignments. 0 disables inlining."""
+    scheduling_mode: Literal["phases", "dag"] = "phases"
+    """Run new workflow runs' tasks a phase (DAG generation) at a time, or each as soon as its parents complete."""
 
     google_ai_api_key: str
+    llm_max_concurrency: int = 8
+    """Max number of concurrent requests to each LLM per process."""
+    llm_thread_pool_size: int = 8
+    """Threads per process for LLM chains without native async support called from async tasks (see `germinate_ai.toolbox.chains.ainvoke_chain`.)"""
+    llm_concurrency_limits: dict[str, int] = {}
+    """Max number of concurrent requests to specific LLMs per process, by LLM code (e.g. `{"google:gemini-pro": 4}`.)"""
+    llm_cache: Literal["none", "memory", "sqlite"] = "none"
+    """Cache LLM responses in memory, or also persist them in an SQLite database at `llm_cache_path` (see `germinate_ai.utils.llm_cache`.)"""
+    llm_cache_max_size: int = 1024
+    """Max number of LLM responses cached in memory per process."""
+    llm_cache_path: str = ".germinate/llm_cache.sqlite"
+    """SQLite database for persisted LLM responses."""
+    llm_batch_window: float = 0.0
+    """Seconds to collect concurrent async requests to each LLM into a single batch (`0` disables batching, see `germinate_ai.utils.llm_batching`.)"""
+    llm_batch_windows: dict[str, float] = {}
+    """Batching windows of specific LLMs, by LLM code (e.g. `{"ollama:gemma:7b": 0.05}`.)"""
+    llm_batch_max_size: int = 8
+    """Max number of requests per batch sent to each LLM."""
+    llm_batch_max_sizes: dict[str, int] = {}
+    """Max batch sizes of specific LLMs, by LLM code."""
+    llm_adaptive_concurrency: bool = False
+    """Adjust each LLM's concurrency limit (up to its max) to rate limiting errors (AIMD, see `germinate_ai.utils.llm_pool.AIMDController`.)"""
+    llm_min_concurrency: int = 1
+    """Min number of concurrent requests to each LLM per process, with adaptive concurrency."""
+    llm_latency_tolerance: float = 0
+    """With adaptive concurrency, LLM latencies above this multiple of their baseline also lower the concurrency limit. Only suits workloads with similarly sized outputs. 0 only lowers it on rate limiting errors."""
+    llm_rate_limits: dict[str, float] = {}
+    """Max requests per second to specific LLMs across all workers, by LLM code (e.g. `{"google:gemini-pro": 1}` for 60 RPM, see `germinate_ai.utils.llm_rate_limit`.)"""
+    llm_rate_limit_burst: float = 1.0
+    """Seconds' worth of requests to a rate limited LLM that can be made at once after being idle."""
+    llm_rate_limit_bucket: str = "llm_rate_limits"
+    """NATS KV bucket for the token buckets shared by all workers."""
+    llm_rate_limit_fallback_share: float = 0.25
+    """Share of each LLM's rate limit a worker process may use while the shared buckets can't be reached (e.g. 1 / the number of worker processes.)"""
+    llm_rate_limit_retries: int = 5
+    """Max number of retries of LLM requests rejected by the provider's rate limits (e.g. HTTP 429.)"""
+    llm_rate_limit_backoff: float = 1.0
+    """Seconds before the first retry of a rate limited LLM request (doubled for each further retry.)"""
+
+    # Worker
+    worker_continuous: bool = True
+    """Long poll for assignments continuously instead of taking one per tick."""
+    worker_concurrency: int = 1
+    """Number of concurrent task slots in each worker process."""
+    worker_poll_timeout: float = 5
+    """Seconds to long poll an empty assignments queue before polling again."""
+    worker_tick_interval: int = 10
+    """Seconds between polls when not consuming continuously."""
+    worker_workflows: list[str] = ["germinate_ai.workflows.metagpt.main:workflow"]
+    """Import paths of workflows preloaded by workers (so their tasks can be executed.)"""
+    worker_llms: list[str] = []
+    """LLM codes of clients created at worker start, in addition to those that tasks depend on."""
+    worker_prefork: bool = True
+    """Import heavy modules once in the worker node's parent process, and fork worker processes from it."""
+    worker_preload_modules: list[str] = [
+        "langchain_core.runnables",
+        "langchain_google_genai",
+        "langchain_community.llms",
+    ]
+    """Modules imported before forking worker processes, in addition to the workflows' own imports."""
+    worker_gc_freeze: bool = True
+    """Freeze the GC after preloading, so forked worker processes keep sharing the preloaded objects' memory."""
+    task_cache_backend: Literal["none", "memory", "kv"] = "none"
+    """Cache task outputs by executor and input in each worker process ("memory"), or in a NATS KV bucket shared by all workers ("kv".)"""
+    task_cache_ttl: float = 60 * 60
+    """Seconds before cached task outputs expire."""
+    task_cache_max_size: int = 1024
+    """Max number of task outputs cached per worker process (with the "memory" backend.)"""
+    task_cache_bucket: str = "task_cache"
+    """NATS KV bucket for cached task outputs (with the "kv" backend.)"""
+    task_rate_limit_retries: int = 2
+    """Max number of reruns of tasks that failed because an LLM provider kept rate limiting requests."""
+    task_rate_limit_backoff: float = 30
+    """Seconds before the first rerun of a rate limited task (doubled for each further rerun.)"""
+
+    # Coordinator
+    coordinator_batch_size: int = 256
+    """Max number of task completions handled (and committed) together."""
+    coordinator_poll_timeout: float = 5
+    """Seconds to long poll an empty completions queue before polling again."""
+    coordinator_speculative_transitions: bool = False
+    """Enter a state's likely next state (its first transition's target) while its transition conditions are evaluated, discarding it if another transition fires. The speculated state's tasks really run: their side effects (e.g. KV writes, message channel publishes) aren't rolled back when it's discarded."""
+
+
+@functools.cache
+def get_settings() -> Settings:
+    """Load settings (from the environment and `.env`) on first use."""
+    return Settings()
+
+
+class _LazySettings:
+    """Stands in for the settings, and only loads them when an attribute is first accessed.
+
+    So importing modules that use `settings` doesn't require a configured environment, or pay for loading it.
+    """
+
+    def __getattr__(self, name: str) -> typ.Any:
+        return getattr(get_settings(), name)
+
+    def __repr__(self) -> str:
+        return repr(get_settings())
 
 
-settings = Settings()
+settings: Settings = _LazySettings()
@@ -1,74 +1,118 @@
 import asyncio
-import time
+import typing as typ
+from collections import defaultdict
+from uuid import UUID, uuid4
 
 from loguru import logger
-from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from nats.aio.msg import Msg
+from sqlalchemy.ext.asyncio import AsyncSession
 import attr
 
+from germinate_ai.memory.claim_check import ClaimCheck
 from germinate_ai.message_bus import nats
+from germinate_ai.message_bus.codecs import decode_model
 from germinate_ai.message_bus.message_queue import NATSQueue
+from germinate_ai.message_bus.subscriptions import SubscriptionCache
 from germinate_ai.data.schemas.tasks import TaskAssignment
-from germinate_ai.data.repositories.states_repository import get_state
-from germinate_ai.data.repositories.workflow_runs_repository import get_workflow_run
+from germinate_ai.data.repositories.states_repository import (
+    aget_state,
+    arecord_dag_task_completion,
+    arecord_task_completion,
+)
+from germinate_ai.data.repositories.tasks_repository import arelease_task_dependents
+from germinate_ai.data.repositories.workflow_runs_repository import aget_workflow_run
 from germinate_ai.data.models import StateInstanceStateEnum
 from germinate_ai.data.schemas.workflow_runs import WorkflowRunStateEnum
-from germinate_ai.data.models import StateInstance
-from germinate_ai.utils.helpers import get_next_tick
+from germinate_ai.data.models import StateInstance, WorkflowRun
 from germinate_ai.data.schemas.messages import Message
 
-from .scheduler import Scheduler
+from .scheduler import Scheduler, state_outputs
 
 
 @attr.define(init=False)
 class Coordinator:
-    """Polls task completions and updates corresponding state."""
+    """Polls task completions and updates corresponding state.
+
+    Completions are fetched in batches of up to `batch_size` and grouped by state, so that each state is loaded and
+    checked for phase completion once per batch. All the resulting state changes are committed in a single transaction.
+
+    Completions are acked only once their changes are committed. If handling a state's completions fails, just that
+    state's changes are rolled back, and its completions are redelivered (after `redelivery_delay` seconds) to be
+    handled again. Any assignments it already published are then published again, which is safe since each task's
+    completion is only counted once per phase (see `record_task_completion`.)
+
+    States scheduled by dependencies (see `SchedulingModeEnum`) have no phases: each completion instead releases the
+    task's children, which are enqueued as soon as all their parents are complete.
+
+    With `speculative` transitions, once only a state's transition conditions are left to run, the likely next state
+    (the target of its first transition) is entered right away instead of waiting for the conditions. If a different
+    transition fires, the speculative state's progress is discarded: it starts a new epoch, so completions of its
+    tasks still running are ignored, and it's back in its state from before the speculation.
+
+    Note: Speculation runs the state's tasks for real, and their side effects (e.g. KV writes, or messages published on
+    message channels) aren't rolled back when it's discarded. Only enable it for workflows whose likely next states'
+    tasks can safely run for nothing.
+    """
 
     nc: nats.NatsConnection
-    db: Session
-    tick_interval: int
+    db: AsyncSession
+    batch_size: int
+    poll_timeout: float
     scheduler: Scheduler
+    subscriptions: SubscriptionCache
+    claim_check: ClaimCheck
+    speculative: bool
+    redelivery_delay: float
     completions_queue: NATSQueue
 
     def __init__(
-        self, nc: nats.NatsConnection, db: Session, scheduler: Scheduler, tick_interval: int = 10
+        self,
+        nc: nats.NatsConnection,
+        db: AsyncSession,
+        scheduler: Scheduler,
+        batch_size: int = 256,
+        poll_timeout: float = 5,
+        subscriptions: SubscriptionCache = None,
+        claim_check: ClaimCheck = None,
+        speculative: bool = False,
+        redelivery_delay: float = 5,
     ):
         self.nc = nc
         self.db = db
-        self.tick_interval = tick_interval
+        self.batch_size = batch_size
+        self.poll_timeout = poll_timeout
         self.scheduler = scheduler
+        if subscriptions is None:
+            subscriptions = SubscriptionCache(connection=nc)
+        self.subscriptions = subscriptions
+        if claim_check is None:
+            claim_check = ClaimCheck(connection=nc)
+        self.claim_check = claim_check
+        self.speculative = speculative
+        self.redelivery_delay = redelivery_delay
 
     async def run(self):
         """Connect to message bus, wait for task completion notifications, and update state/schedule tasks accordingly."""
 
-        next_tick = get_next_tick(self.tick_interval)
-
         await self.connect()
         logger.success(
             "Coordinator connected to cluster! Waiting for task completions..."
         )
 
         while True:
-            last_tick = time.time()
-
             try:
-                msg = await self.completions_queue.dequeue()
-                task_json = msg.data
-                # ack message so we don't see it again
-                await msg.ack()
-                await self._handle_task_completion(task_json)                    
+                msgs = await self.completions_queue.dequeue_batch(
+                    batch=self.batch_size, timeout=self.poll_timeout
+                )
+                await self._handle_task_completions(msgs)
             except TimeoutError:
                 pass
             except asyncio.CancelledError:
-                logger.debug(
-                    "Worker #{self.id}: Cancelled! Shutting down coordinator..."
-                )
+                logger.debug("Cancelled! Shutting down coordinator...")
                 break
             except Exception as e:
                 logger.exception("Error while reading from NATS queue: ", e)
 
-            await asyncio.sleep(next_tick(last_tick=last_tick))
-
     async def connect(self):
         """Connect to get task completion notifications."""
         self.completions_queue = NATSQueue(
@@ -81,32 +125,113 @@ class Coordinator:
 
         await self.scheduler.connect()
 
-    async def _handle_task_completion(self, task_json: str) -> bool:
-        # TODO too long - refactor!!
+    async def _handle_task_completions(self, msgs: typ.Sequence[Msg]):
+        """Handle a batch of task completion notifications.
 
+        Groups completions by state, handles each state once, and commits all the changes in one transaction. Then
+        acks the completions that were handled, and naks those of states that failed so they're redelivered.
+        """
+        completions = defaultdict(list)
+        state_msgs = defaultdict(list)
+        for msg in msgs:
+            try:
+                logger.debug(f"Handling message: `{msg.data}`")
+                assignment = decode_model(msg, TaskAssignment)
+            except ValueError as e:
+                # (includes pydantic `ValidationError`s)
+                logger.error(f"Skipping invalid task `{msg.data}`: {e}")
+                # (never redeliver it)
+                await msg.term()
+                continue
+            completions[assignment.state_instance_id].append(assignment)
+            state_msgs[assignment.state_instance_id].append(msg)
+
+        failed = set()
         try:
-            logger.debug(f"Handling message: `{task_json}`")
-            assignment = TaskAssignment.model_validate_json(task_json)
-        except ValidationError as e:
-            logger.error(f"Skipping invalid task `{task_json}`: {e}")
-            return True
-
-        # # Get corresponding Task from DB
-        # task = get_task_instance_from_assignment(self.db, assignment)
-        # if task is None:
-        #     logger.error(f"No such task: skipping `{assignment}`")
-        #     return True
+            for state_instance_id, assignments in completions.items():
+                try:
+                    # Roll back just this state's changes on failure
+                    async with self.db.begin_nested():
+                        await self._handle_state_completions(
+                            state_instance_id, assignments
+                        )
+                except Exception as e:
+                    logger.exception(
+                        f"Error while handling completions for state `{state_instance_id}`: {e}"
+                    )
+                    failed.add(state_instance_id)
+            await self.db.commit()
+        except BaseException:
+            # (Including cancellation: nothing was committed)
+            failed = set(state_msgs)
+            await self.db.rollback()
+            raise
+        finally:
+            for state_instance_id, handled in state_msgs.items():
+                for msg in handled:
+                    if state_instance_id in failed:
+                        await msg.nak(delay=self.redelivery_delay)
+                    else:
+                        await msg.ack()
+
+    async def _handle_state_completions(
+        self, state_instance_id: UUID, assignments: typ.Sequence[TaskAssignment]
+    ):
+        """Update a state, and schedule its next phase or transition, after some of its tasks completed.
+
+        Note: Does not commit.
+        """
+        # TODO too long - refactor!!
+        logger.debug(
+            f"Handling {len(assignments)} completions for state `{state_instance_id}`"
+        )
+
+        state_instance = None
+        if any(assignment.phase_index is None for assignment in assignments):
+            # Assignments in states scheduled by dependencies don't have a phase
+            state_instance = await aget_state(
+                self.db, state_instance_id, join_tasks=False
+            )
+            if state_instance is None:
+                logger.error(f"Skipping invalid state_instance `{state_instance_id}`")
+                return
+            if state_instance.is_dag_scheduled:
+                await self._handle_dag_completions(
+                    state_instance_id, self._current_assignments(state_instance, assignments)
+                )
+                return
+
+        # Count the completions in the state's current phase
+        phase_complete = False
+        for assignment in assignments:
+            phase_index = assignment.phase_index
+            if phase_index is None:
+                phase_index = state_instance.phase_index_of(assignment.name)
+                if phase_index is None:
+                    continue
+            remaining = await arecord_task_completion(
+                self.db,
+                state_instance_id,
+                phase_index,
+                assignment.name,
+                epoch=assignment.epoch,
+            )
+            if remaining is None:
+                logger.debug(f"Already counted (or stale) completion of {assignment.name}. Skipping...")
+                continue
+            # Only the completion that brings the count to 0 gets to move on
+            if remaining == 0:
+                phase_complete = True
+
+        if not phase_complete:
+            # More tasks remaining in this state phase, so don't do anything
+            return
 
         # Get corresponding State from DB
-        state_instance = get_state(self.db, assignment.state_instance_id)
+        state_instance = await aget_state(self.db, state_instance_id)
         if state_instance is None:
-            logger.error(f"Skipping invalid state_instance `{assignment.state_instance_id}`")
+            logger.error(f"Skipping invalid state_instance `{state_instance_id}`")
             return
-        
-        # Is current phase still incomplete?
-        if not state_instance.current_phase_complete:
-            # More tasks remaining in this state phase, so don't do anything
-            return True
     
         # Are there unscheduled phases remaining in this state?
         if not state_instance.all_phases_complete:
@@ -114,23 +239,92 @@ class Coordinator:
             # Enqueue next phase and return
             state_instance.next_phase()
             await self._enqueue_state_phase(state_instance)
-            return True
+            if self.speculative and state_instance.in_final_phase:
+                # (Only the transition conditions are left)
+                await self._speculate(state_instance)
+            return
 
+        await self._complete_state(state_instance)
 
+    async def _handle_dag_completions(
+        self, state_instance_id: UUID, assignments: typ.Sequence[TaskAssignment]
+    ):
+        """Release the children of completed tasks in a state scheduled by dependencies, and enqueue the ones that
+        are ready (or transition if all the state's tasks are complete.)
+
+        Note: Does not commit.
+        """
+        ready_task_names = set()
+        state_complete = False
+        for assignment in assignments:
+            released = await arelease_task_dependents(
+                self.db, state_instance_id, assignment.name
+            )
+            if released is None:
+                logger.debug(f"Already handled completion of {assignment.name}. Skipping...")
+                continue
+            ready_task_names.update(released)
+            remaining = await arecord_dag_task_completion(self.db, state_instance_id)
+            # Only the completion that brings the count to 0 gets to move on
+            if remaining == 0:
+                state_complete = True
+
+        if not state_complete and not ready_task_names:
+            return
+
+        # Get corresponding State (and its tasks) from DB
+        state_instance = await aget_state(self.db, state_instance_id)
+        if state_instance is None:
+            logger.error(f"Skipping invalid state_instance `{state_instance_id}`")
+            return
+
+        if state_complete:
+            await self._complete_state(state_instance)
+            return
+
+        logger.debug(f"Queuing ready tasks in state {state_instance.name}: {ready_task_names}")
+        ready_tasks = [
+            t for t in state_instance.task_instances if t.name in ready_task_names
+        ]
+        await self.scheduler.enqueue_tasks(
+            ready_tasks, outputs=state_outputs(state_instance), state=state_instance
+        )
+        if (
+            self.speculative
+            and state_instance.transitions
+            and ready_task_names <= set(state_instance.transitions)
+        ):
+            # (Only the transition conditions are left)
+            await self._speculate(state_instance)
+
+    async def _complete_state(self, state_instance: StateInstance):
+        """Mark a state with all its tasks complete as completed, and transition to the next state (or complete the
+        workflow run.)
+
+        Note: Does not commit.
+        """
         # All tasks in state's tasks DAG are complete!
         logger.debug(f"State {state_instance.name} completed!")
         if state_instance.state == StateInstanceStateEnum.completed:
             logger.debug(f"Looks like {state_instance.name} was already marked as completed. Skipping...")
             return
+        if state_instance.speculative:
+            # (Transition once the previous state confirms it's the next state)
+            logger.debug(f"Speculatively entered state {state_instance.name} completed before it was confirmed")
+            return
         
         
 
         # Get workflow run
-        workflow_run = get_workflow_run(self.db, state_instance.workflow_run_id)
+        workflow_run = await aget_workflow_run(self.db, state_instance.workflow_run_id)
 
         # Figure out transition to next state
         # (Uses condition evaluation results from DB)
         next_state_name = state_instance.next_state()
+
+        # Keep the next state if it was entered speculatively, and discard any other speculation
+        speculated = self._resolve_speculation(workflow_run, next_state_name)
+
         if next_state_name is None:
             # Update workflow run state and finish
             
@@ -150,7 +344,6 @@ class Coordinator:
             # Update state instance state
             state_instance.state = StateInstanceStateEnum.completed
             self.db.add(state_instance)
-            self.db.commit()
             
             return
 
@@ -160,22 +353,6 @@ class Coordinator:
         # get next state instance
         next_state_instance = workflow_run.state_instance_by_name(next_state_name)
 
-        # Get combined output from prev state for next state's input
-        next_state_input = state_instance.state_output()
-        # print(next_state_input)
-    
-        # TODO refactor
-        # store input to first phase tasks
-        nq = NATSQueue(
-            connection=self.nc,
-            stream="jobs",
-            subject=f"jobs.{next_state_instance.id}.from_start.to_descendant",
-        )
-        await nq.connect()
-        msg = Message(source="start", payload=next_state_input)
-        await nq.enqueue(msg.model_dump_json())
-        #
-
         # Update state instance state
         state_instance.state = StateInstanceStateEnum.completed
         self.db.add(state_instance)
@@ -183,15 +360,121 @@ class Coordinator:
         # Transition workflow run to next state
         workflow_run.current_state = next_state_instance
         self.db.add(workflow_run)
-        self.db.commit()
 
-        # Enqueue the first phase in new state
-        await self._enqueue_state_phase(next_state_instance)
+        if speculated is not None:
+            logger.debug(f"Keeping speculatively entered state {next_state_name}")
+            if speculated.tasks_complete:
+                await self._complete_state(speculated)
+            return
+
+        # (Enter it from the start, even if it was run before)
+        await self._enter_state(next_state_instance, state_instance.state_output())
+
+    async def _enter_state(self, state_instance: StateInstance, state_input: dict):
+        """Publish the state's input, and enqueue its first phase (or root tasks.)
+
+        Note: Does not commit.
+        """
+        # store input to first phase tasks
+        nq = await self.subscriptions.publisher(
+            stream="jobs",
+            subject=f"jobs.{state_instance.id}.from_start.to_descendant",
+        )
+        msg = Message(source="start", payload=state_input)
+        # (Publish just a reference to large inputs)
+        msg = await self.claim_check.offload(
+            msg, name=f"{state_instance.id}.start.{uuid4().hex}"
+        )
+        await nq.enqueue(msg)
+
+        state_instance.state = StateInstanceStateEnum.queued
+        state_instance.start()
 
+        # Enqueue the first phase (or root tasks) in new state
+        await self.scheduler.enqueue_state(state_instance, start_output=state_input)
+        self.db.add(state_instance)
+
+    async def _speculate(self, state_instance: StateInstance):
+        """Enter the likely next state while the state's transition conditions are still being evaluated.
+
+        Note: Does not commit.
+        """
+        # (Only speculate one state ahead)
+        if state_instance.speculative:
+            return
+        next_state_name = state_instance.likely_next_state()
+        # (Don't restart a state that's still running)
+        if next_state_name is None or next_state_name == state_instance.name:
+            return
+
+        workflow_run = await aget_workflow_run(self.db, state_instance.workflow_run_id)
+        next_state_instance = workflow_run.state_instance_by_name(next_state_name)
+        if next_state_instance is None or next_state_instance.speculative:
+            return
+        if next_state_instance.state in (
+            StateInstanceStateEnum.queued,
+            StateInstanceStateEnum.in_progress,
+        ):
+            return
 
-    async def _enqueue_state_phase(self, state: StateInstance):
+        logger.debug(
+            f"Speculatively entering {next_state_name} while evaluating {state_instance.name}'s transitions"
+        )
+        next_state_instance.begin_speculation()
+        # (The state's output is already final, since only the conditions are left)
+        await self._enter_state(next_state_instance, state_instance.state_output())
+
+    def _resolve_speculation(
+        self, workflow_run: WorkflowRun, next_state_name: typ.Optional[str]
+    ) -> typ.Optional[StateInstance]:
+        """Confirm the speculatively entered state if it's the next state, and discard any others.
+
+        Returns the confirmed state, if any.
+
+        Note: Does not commit.
+        """
+        confirmed = None
+        for state_instance in workflow_run.state_instances:
+            if not state_instance.speculative:
+                continue
+            if state_instance.name == next_state_name:
+                state_instance.confirm_speculation()
+                confirmed = state_instance
+            else:
+                logger.info(
+                    f"Discarding speculatively entered state {state_instance.name}: transitioning to {next_state_name}"
+                )
+                state_instance.discard_speculation()
+            self.db.add(state_instance)
+        return confirmed
+
+    @staticmethod
+    def _current_assignments(
+        state_instance: StateInstance, assignments: typ.Sequence[TaskAssignment]
+    ) -> list[TaskAssignment]:
+        """Filter out assignments from the state's earlier epochs (e.g. a discarded speculation.)"""
+        current = []
+        for assignment in assignments:
+            if assignment.epoch is not None and assignment.epoch != state_instance.epoch:
+                logger.debug(
+                    f"Ignoring completion of {assignment.name} from an earlier epoch of state {state_instance.name}"
+                )
+                continue
+            current.append(assignment)
+        return current
+
+    async def _enqueue_state_phase(
+        self, state: StateInstance, start_output: typ.Optional[dict] = None
+    ):
         # Enter next phase in state
-        await self.scheduler.enqueue_tasks(state.phase_tasks)
+        # (Pass on outputs so small inputs can be inlined in assignments,
+        # and publish all the phase's assignments in one batch)
+        outputs = state_outputs(state, start_output=start_output)
+        await self.scheduler.enqueue_tasks(
+            state.phase_tasks,
+            outputs=outputs,
+            phase_index=state.current_phase_index,
+            state=state,
+        )
         # update state instance
-        self.db.add(state)
-        self.db.commit()
\ No newline at end of file
+        self.db.add(state)
\ No newline at end of file
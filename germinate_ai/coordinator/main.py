@@ -1,7 +1,10 @@
 import asyncio
 
-from germinate_ai.data.database import get_db_session
-from germinate_ai.message_bus import nats
+from germinate_ai.config import settings
+from germinate_ai.data.database import get_async_db_session
+from germinate_ai.message_bus import nats, SubscriptionCache
+from germinate_ai.message_bus.codecs import check_codec
+from germinate_ai.message_bus.compression import check_compression
 
 from .coordinator import Coordinator
 from .scheduler import Scheduler
@@ -9,12 +12,22 @@ from .scheduler import Scheduler
 
 async def run_coordinator():
     loop = asyncio.get_running_loop()
-    Session = get_db_session()
-    with Session() as db_session:
+    Session = get_async_db_session()
+    async with Session() as db_session:
         async with nats.nats_connection() as nc:
             scheduler = Scheduler(nc=nc)
 
-            coordinator = Coordinator(nc=nc, db=db_session, scheduler=scheduler)
+            coordinator = Coordinator(
+                nc=nc,
+                db=db_session,
+                scheduler=scheduler,
+                batch_size=settings.coordinator_batch_size,
+                poll_timeout=settings.coordinator_poll_timeout,
+                speculative=settings.coordinator_speculative_transitions,
+                subscriptions=SubscriptionCache(
+                    connection=nc, max_size=settings.subscription_cache_size
+                ),
+            )
             coordinator_task = loop.create_task(coordinator.run())
 
             tasks = [coordinator_task]
@@ -23,4 +36,6 @@ async def run_coordinator():
 
 
 def start_coordinator():
+    check_codec(settings.message_codec)
+    check_compression(settings.message_compression)
     asyncio.run(run_coordinator())
@@ -1,8 +1,11 @@
+import json
 import typing as typ
 
 import attr
 from loguru import logger
 
+from germinate_ai.config import settings
+from germinate_ai.core.exceptions import MessagePublishException
 from germinate_ai.data.models import StateInstance, TaskInstance
 from germinate_ai.data.schemas import TaskAssignment
 from germinate_ai.message_bus import nats
@@ -11,15 +14,33 @@ from germinate_ai.message_bus.message_queue import NATSQueue
 
 @attr.define(init=False)
 class Scheduler:
-    """Enqueue tasks ready to be assigned to workers."""
+    """Enqueue tasks ready to be assigned to workers.
+
+    Parent task outputs up to `inline_max_bytes` (when serialized to JSON, `settings.inline_task_outputs_max_bytes` by
+    default) are carried inside the task assignments, so workers don't need to read them from the message bus. Set
+    `inline_max_bytes` to 0 to disable.
+
+    Assignments are published concurrently, with up to `max_in_flight` publishes awaiting acks at once.
+    """
 
     nc: nats.NatsConnection
     connected: bool
+    inline_max_bytes: int
+    max_in_flight: int
     assignments_queue: NATSQueue
 
-    def __init__(self, nc: nats.NatsConnection):
+    def __init__(
+        self,
+        nc: nats.NatsConnection,
+        inline_max_bytes: int = None,
+        max_in_flight: int = 256,
+    ):
         self.nc = nc
         self.connected = False
+        if inline_max_bytes is None:
+            inline_max_bytes = settings.inline_task_outputs_max_bytes
+        self.inline_max_bytes = inline_max_bytes
+        self.max_in_flight = max_in_flight
 
     async def connect(self):
         """Connect to task assignments queue."""
@@ -31,30 +52,84 @@ class Scheduler:
             subject="jobs.task_assignments",
             connection=self.nc,
         )
-        await self.assignments_queue.connect()
+        await self.assignments_queue.connect(subscribe=False)
         self.connected = True
 
-    async def enqueue_tasks(self, tasks: typ.Sequence[TaskInstance]):
+    async def enqueue_tasks(
+        self,
+        tasks: typ.Sequence[TaskInstance],
+        outputs: typ.Optional[typ.Mapping[str, dict]] = None,
+        phase_index: typ.Optional[int] = None,
+        state: typ.Optional[StateInstance] = None,
+    ):
         """Enqueue a sequence of tasks.
         
         Creates `TaskAssignment`s for each task and adds it to the distributed queue.
+
+        `phase_index` is the index of the state phase the tasks belong to.
+
+        `outputs` maps names of completed tasks (or "start") to their outputs, and is used to inline small inputs
+        into the assignments.
+
+        `state` is the tasks' state, so that assignments carry its workflow run (to address the tasks' output streams)
+        and epoch.
+
+        All the assignments are published together. Raises `MessagePublishException` (after the rest are published)
+        if any of them failed.
         """
         if not self.connected:
             await self.connect()
 
+        inlineable = self._inlineable_outputs(outputs or {})
+
+        tasks = list(tasks)
+        assignments = []
         for task in tasks:
             logger.debug(f"Queueing {task.name}")
-            # create assignment and add it to the queue
+            # create assignment
             assignment = TaskAssignment(
-                state_instance_id=task.state_instance_id, name=task.name
+                state_instance_id=task.state_instance_id,
+                name=task.name,
+                workflow_run_id=state.workflow_run_id if state is not None else None,
+                state_name=state.name if state is not None else None,
+                epoch=state.epoch if state is not None else None,
+                phase_index=phase_index,
+                inputs={
+                    dep: inlineable[dep]
+                    for dep in task.depends_on
+                    if dep in inlineable
+                },
             )
-            await self.assignments_queue.enqueue(assignment.model_dump_json())
+            assignments.append(assignment)
 
-    async def enqueue_state(self, state: StateInstance):
+        # add them all to the queue
+        errors = await self.assignments_queue.enqueue_many(
+            assignments, max_in_flight=self.max_in_flight
+        )
+        failures = {ix: error for ix, error in enumerate(errors) if error is not None}
+        for ix, error in failures.items():
+            logger.error(f"Failed to queue {tasks[ix].name}: {error!r}")
+        if failures:
+            raise MessagePublishException(
+                f"Failed to queue {len(failures)} of {len(tasks)} tasks: {[tasks[ix].name for ix in failures]}",
+                failures=failures,
+            )
+
+    async def enqueue_state(
+        self, state: StateInstance, start_output: typ.Optional[dict] = None
+    ):
         """Enqueue the next phase (tasks that can be run in parallel) of the given state.
+
+        If the state is scheduled by dependencies, enqueues the state's root tasks instead, and the rest are enqueued
+        as their parents complete.
         
         Note: Assumes all the related task instances are accessible in `state`.
         """
+        outputs = state_outputs(state, start_output=start_output)
+        if state.is_dag_scheduled:
+            await self.enqueue_tasks(state.root_tasks, outputs=outputs, state=state)
+            return
+
         # sanity check
         if state.current_phase_index > len(state.sorted_tasks_phases) - 1:
             raise IndexError(f"State {state.name}'s current phase {state.current_phase_index} out of bounds")
@@ -63,4 +138,29 @@ class Scheduler:
         # filter out corresponding tasks 
         tasks = [task for task in state.task_instances if task.name in task_names]
         # enqueue the tasks
-        await self.enqueue_tasks(tasks)
+        await self.enqueue_tasks(
+            tasks,
+            outputs=outputs,
+            phase_index=state.current_phase_index,
+            state=state,
+        )
+
+    def _inlineable_outputs(self, outputs: typ.Mapping[str, dict]) -> dict[str, dict]:
+        """Filter out outputs too large to inline in assignments."""
+        if self.inline_max_bytes <= 0:
+            return {}
+        return {
+            name: output
+            for name, output in outputs.items()
+            if len(json.dumps(output)) <= self.inline_max_bytes
+        }
+
+
+def state_outputs(
+    state: StateInstance, start_output: typ.Optional[dict] = None
+) -> dict[str, dict]:
+    """Outputs of a state's completed tasks by task name, plus the state's input as "start", if given."""
+    outputs = state.completed_task_outputs()
+    if start_output is not None:
+        outputs["start"] = start_output
+    return outputs
@@ -27,6 +27,17 @@ class MessageBusUnavailableException(GerminateAIException):
     pass
 
 
+class MessagePublishException(GerminateAIException):
+    """Failed to publish some messages to the message bus.
+
+    `failures` maps the indices of the messages that failed to their errors.
+    """
+
+    def __init__(self, message: str, failures: dict[int, BaseException]):
+        super().__init__(message)
+        self.failures = failures
+
+
 class DatabaseUnavailableException(GerminateAIException):
     """Database backend in not reachable."""
 
@@ -36,9 +36,13 @@ class State:
         self._phases = []
 
     # Return a task executor/task def type
-    def task(self, namespace: str = "agent") -> typ.Callable:
-        """Decorator that adds a task to the state's task DAG."""
-        decorate = task_decorator_factory(namespace=namespace, state=self)
+    def task(self, namespace: str = "agent", cache: bool = True) -> typ.Callable:
+        """Decorator that adds a task to the state's task DAG.
+
+        Set `cache=False` for tasks whose output doesn't only depend on their input (e.g. tasks with side effects),
+        so their outputs are never cached by workers' result cache.
+        """
+        decorate = task_decorator_factory(namespace=namespace, state=self, cache=cache)
         return decorate
 
     def add_task(self, task: "TaskDefinition"):
@@ -15,9 +15,12 @@ if typ.TYPE_CHECKING:
 
 
 def task_decorator_factory(
-    namespace: str, state: "State"
+    namespace: str, state: "State", cache: bool = True
 ) -> typ.Callable[[typ.Callable], typ.Callable]:
-    """Creates a decorator that registers a task execution in the given namespace."""
+    """Creates a decorator that registers a task execution in the given namespace.
+
+    `cache` is whether workers may cache the task's output (see `germinate_ai.worker.result_cache`.)
+    """
 
     def decorate(func: typ.Callable):
         # Get IO Schemas
@@ -38,6 +41,7 @@ def task_decorator_factory(
             input_schema=input_schema,
             output_schema=output_schema,
             callable=wrapper,
+            cache=cache,
         )
 
         # Wrap executor in a task definition
@@ -6,6 +6,7 @@ from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from germinate_ai.toolbox.chains import abatch_chain, ainvoke_chain, astream_chain
 from germinate_ai.utils.llms import get_llm
 
 from .base import BaseTaskExecutor
@@ -19,6 +20,18 @@ class LCChainExecutor(BaseTaskExecutor):
         output = self.chain.invoke(kwargs)
         return output
 
+    async def arun(self, **kwargs) -> typ.Any:
+        """Run the chain without blocking the event loop (in a thread if it isn't natively async.)"""
+        return await ainvoke_chain(self.chain, kwargs)
+
+    async def abatch(self, inputs: list[dict]) -> list[typ.Any]:
+        """Run the chain on a batch of inputs without blocking the event loop."""
+        return await abatch_chain(self.chain, inputs)
+
+    async def astream_run(self, **kwargs) -> typ.Any:
+        """Run the chain streaming its output on the current task's stream, and return the whole output."""
+        return await astream_chain(self.chain, kwargs)
+
 
 @attr.define(init=False, frozen=False)
 class LCSimplePromptChainExecutor(LCChainExecutor):
@@ -26,6 +26,7 @@ class TaskExecutor(BaseTaskExecutor):
     output_schema: BaseModel
 
     callable: TaskExecutorCallable
+    cache: bool
     _callable_sig: inspect.Signature
 
     def __init__(
@@ -36,6 +37,7 @@ class TaskExecutor(BaseTaskExecutor):
         input_schema: BaseModel = None,
         output_schema: BaseModel = None,
         namespace: str = "custom_tasks",
+        cache: bool = True,
     ):
         self.namespace = namespace
         self.name = name
@@ -43,6 +45,8 @@ class TaskExecutor(BaseTaskExecutor):
         self.output_schema = output_schema
 
         self.callable = callable
+        # Can outputs be cached by input (i.e. is the task a pure function of its input)?
+        self.cache = cache
         self._callable_sig = None
 
     def __call__(self, *args: typ.Any, **kwargs: typ.Any) -> BaseModel:
@@ -25,6 +25,11 @@ class TaskRegistry:
         # TODO check if overwrites
         cls._tasks[k] = executor
 
+    @classmethod
+    def executors(cls) -> list[TaskExecutor]:
+        """Get all registered task executors."""
+        return list(cls._tasks.values())
+
     @classmethod
     def get_executor(cls, executor_name: str) -> TaskExecutor:
         namespace, name = executor_name.split(sep=".", maxsplit=1)
@@ -1,21 +1,93 @@
-from typing import Any, Literal
+import threading
+import time
+from typing import Any, Literal, Optional
 
+import attr
 from loguru import logger
-from sqlalchemy import JSON, create_engine, select
+from sqlalchemy import JSON, Engine, create_engine, select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from germinate_ai.config import settings
 
-DB_URL = settings.database_url
 
+@attr.define
+class PoolStats:
+    """Connection pool checkout counters."""
 
-def create_db_engine(db_url=DB_URL):
-    """Create a SQLAlchemy engine."""
-    engine = create_engine(db_url)
+    checkouts: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    _lock: threading.Lock = attr.field(factory=threading.Lock, repr=False)
+
+    def record(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    @property
+    def mean_wait(self) -> float:
+        if self.checkouts == 0:
+            return 0.0
+        return self.total_wait / self.checkouts
+
+    def __str__(self) -> str:
+        return (
+            f"checkouts={self.checkouts} mean_wait={self.mean_wait * 1000:.1f}ms "
+            f"max_wait={self.max_wait * 1000:.1f}ms"
+        )
+
+
+class _TimedPoolMixin:
+    """Records how long each connection checkout waits (including connecting, if needed) in `stats`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.stats.record(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    """`QueuePool` that records checkout wait times."""
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    """`AsyncAdaptedQueuePool` that records checkout wait times."""
+
+
+def _pool_options() -> dict[str, Any]:
+    """Connection pool options from settings."""
+    return dict(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+def pool_stats(engine: Engine | AsyncEngine) -> Optional[PoolStats]:
+    """Get checkout wait time counters for the engine's connection pool, if tracked."""
+    return getattr(engine.pool, "stats", None)
+
+
+def create_db_engine(db_url: str = None):
+    """Create a SQLAlchemy engine (for the configured database, by default.)"""
+    if db_url is None:
+        db_url = settings.database_url
+    engine = create_engine(db_url, poolclass=TimedQueuePool, **_pool_options())
     return engine
 
 
-def get_db_session(engine=None, db_url: str = DB_URL):
+def get_db_session(engine=None, db_url: str = None):
     """Create a SQLAlchemy session factory."""
     if engine is None:
         engine = create_db_engine(db_url)
@@ -23,6 +95,46 @@ def get_db_session(engine=None, db_url: str = DB_URL):
     return Session
 
 
+def create_async_db_engine(db_url: str = None) -> AsyncEngine:
+    """Create an `asyncio` SQLAlchemy engine (for the configured database, by default.)"""
+    if db_url is None:
+        db_url = settings.database_url
+    engine = create_async_engine(
+        db_url, poolclass=TimedAsyncAdaptedQueuePool, **_pool_options()
+    )
+    return engine
+
+
+_async_engines: dict[str, AsyncEngine] = {}
+
+
+def get_async_db_engine(db_url: str = None) -> AsyncEngine:
+    """Get this process's shared `asyncio` engine (and so connection pool) for `db_url`."""
+    if db_url is None:
+        db_url = settings.database_url
+    if db_url not in _async_engines:
+        _async_engines[db_url] = create_async_db_engine(db_url)
+    return _async_engines[db_url]
+
+
+def get_async_db_session(engine: AsyncEngine = None, db_url: str = None):
+    """Create an `asyncio` SQLAlchemy session factory.
+
+    Uses the process's shared engine unless `db_share_engine` is turned off in the settings.
+
+    Note: Objects aren't expired on commit, since expired attributes can't be lazy loaded with `asyncio`.
+    """
+    if engine is None:
+        if settings.db_share_engine:
+            engine = get_async_db_engine(db_url)
+        else:
+            engine = create_async_db_engine(db_url)
+    AsyncSession = async_sessionmaker(
+        autoflush=False, expire_on_commit=False, bind=engine
+    )
+    return AsyncSession
+
+
 class Base(DeclarativeBase):
     type_annotation_map = {dict[str, Any]: JSON}
 
@@ -30,7 +142,7 @@ class Base(DeclarativeBase):
 def create_tables(engine=None):
     """Create all defined tables -- DEV ONLY."""
     if engine is None:
-        engine = create_db_engine(db_url=DB_URL)
+        engine = create_db_engine()
     logger.info("Creating all tables...")
     Base.metadata.create_all(bind=engine)
 
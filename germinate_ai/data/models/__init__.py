@@ -1,4 +1,9 @@
-from .enums import StateInstanceStateEnum, TaskInstanceStateEnum, WorkflowRunStateEnum
+from .enums import (
+    SchedulingModeEnum,
+    StateInstanceStateEnum,
+    TaskInstanceStateEnum,
+    WorkflowRunStateEnum,
+)
 from .states import StateInstance
 from .tasks import TaskInstance
 from .workflow_runs import WorkflowRun
@@ -7,6 +12,7 @@ __all__ = [
     "WorkflowRunStateEnum",
     "StateInstanceStateEnum",
     "TaskInstanceStateEnum",
+    "SchedulingModeEnum",
     "TaskInstance",
     "StateInstance",
     "WorkflowRun",
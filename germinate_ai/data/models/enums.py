@@ -35,3 +35,12 @@ class TaskInstanceStateEnum(str, enum.Enum):
     completed = "Completed"
     failed = "Failed"
     canceled = "Canceled"
+
+
+class SchedulingModeEnum(str, enum.Enum):
+    """How a state's tasks are released to workers."""
+
+    # Run the tasks DAG one topologically sorted generation at a time
+    phases = "Phases"
+    # Run each task as soon as all of its parents complete
+    dag = "Dag"
@@ -10,6 +10,7 @@ from sqlalchemy import (
     Enum,
     ForeignKey,
     String,
+    false,
     func,
     text,
 )
@@ -18,7 +19,7 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from germinate_ai.core.states.conditions import ConditionOutputSchema
 from germinate_ai.data.database import Base
 
-from .enums import StateInstanceStateEnum, TaskInstanceStateEnum
+from .enums import SchedulingModeEnum, StateInstanceStateEnum, TaskInstanceStateEnum
 
 if typ.TYPE_CHECKING:
     from .tasks import TaskInstance
@@ -41,10 +42,30 @@ class StateInstance(Base):
         Enum(StateInstanceStateEnum), default=StateInstanceStateEnum.created
     )
 
+    scheduling_mode: Mapped[SchedulingModeEnum] = mapped_column(
+        Enum(SchedulingModeEnum), default=SchedulingModeEnum.phases
+    )
+
     # Store sorted DAG generations i.e. array of (array of tasks that can be run in parallel)
     sorted_tasks_phases: Mapped[list[list[str]]] = mapped_column(JSON)
     # index of current running phase
     current_phase_index: Mapped[int] = mapped_column(default=0)
+    # number of completed/remaining tasks in the current phase
+    # (updated atomically as tasks complete, see `record_task_completion`)
+    current_phase_completed: Mapped[int] = mapped_column(default=0, server_default="0")
+    current_phase_remaining: Mapped[int] = mapped_column(default=0, server_default="0")
+    # number of tasks not completed yet, when scheduling by dependencies
+    # (updated atomically as tasks complete, see `record_dag_task_completion`)
+    tasks_remaining: Mapped[int] = mapped_column(default=0, server_default="0")
+    # incremented every time the state is (re-)entered, so that completions of tasks assigned before are ignored
+    epoch: Mapped[int] = mapped_column(default=0, server_default="0")
+    # entered before the previous state completed, on the assumption it's the likely next state
+    # (see `Coordinator`'s speculative transitions)
+    speculative: Mapped[bool] = mapped_column(default=False, server_default=false())
+    # state before it was entered speculatively, restored if the speculation is discarded
+    state_before_speculation: Mapped[typ.Optional[StateInstanceStateEnum]] = mapped_column(
+        Enum(StateInstanceStateEnum), default=None
+    )
 
     transitions: Mapped[dict[str, Any]] = mapped_column(default={}, server_default="{}")
 
@@ -75,6 +96,11 @@ class StateInstance(Base):
     def __repr__(self) -> str:
         return f"<State Instance: {self.name}>"
 
+    @property
+    def is_dag_scheduled(self) -> bool:
+        """Are tasks released as soon as their parents complete (instead of a phase at a time)?"""
+        return self.scheduling_mode == SchedulingModeEnum.dag
+
     @property
     def phase_task_names(self):
         """Get the names of all the tasks in the current phase."""
@@ -84,15 +110,7 @@ class StateInstance(Base):
     @property
     def current_phase_complete(self):
         """Are all the tasks in the current phase complete?"""
-        # TODO rewrite this part
-        phase_tasks = self.phase_task_names
-        completed_tasks = {
-            t.name
-            for t in self.task_instances
-            if t.state == TaskInstanceStateEnum.completed
-        }
-        remaining = phase_tasks.difference(completed_tasks)
-        return len(remaining) == 0
+        return self.current_phase_remaining <= 0
 
     @property
     def all_phases_complete(self):
@@ -102,6 +120,18 @@ class StateInstance(Base):
             and self.current_phase_index >= len(self.sorted_tasks_phases) - 1
         )
 
+    @property
+    def tasks_complete(self) -> bool:
+        """Are all the state's tasks complete?"""
+        if self.is_dag_scheduled:
+            return self.tasks_remaining <= 0
+        return self.all_phases_complete
+
+    @property
+    def in_final_phase(self) -> bool:
+        """Has the state's final phase (e.g. its transition conditions) been entered?"""
+        return self.current_phase_index >= len(self.sorted_tasks_phases) - 1
+
     @property
     def phase_tasks(self) -> set["TaskInstance"]:
         """Return a set of tasks in the current phase."""
@@ -111,19 +141,70 @@ class StateInstance(Base):
         }
         return tasks
 
+    @property
+    def root_tasks(self) -> set["TaskInstance"]:
+        """Return a set of tasks that don't depend on any other task in the state."""
+        return {t for t in self.task_instances if not t.parent_names}
+
+    def start(self):
+        """(Re-)enter the state from its first phase, or its root tasks when scheduling by dependencies.
+
+        Starts a new epoch, so that completions of tasks assigned before are ignored.
+
+        Note: Commit to persist the change.
+        """
+        self.epoch = (self.epoch or 0) + 1
+        if self.is_dag_scheduled:
+            self.start_dag()
+        else:
+            self.start_phase(0)
+
+    def start_dag(self):
+        """Reset the task counters, so that each task is released once all its parents complete.
+
+        Note: Commit to persist the change.
+        """
+        self.tasks_remaining = len(self.task_instances)
+        for task in self.task_instances:
+            task.pending_dependencies = len(task.parent_names)
+            task.dependents_released = False
+
+    def start_phase(self, phase_index: int = 0):
+        """Enter the phase at `phase_index`, and reset the phase's task counters.
+
+        Note: Commit to persist the change.
+        """
+        # sanity check
+        if not 0 <= phase_index < len(self.sorted_tasks_phases):
+            raise IndexError(f"State {self.name} has no phase {phase_index}")
+
+        self.current_phase_index = phase_index
+        self.current_phase_completed = 0
+        self.current_phase_remaining = len(self.sorted_tasks_phases[phase_index])
+        phase_task_names = set(self.sorted_tasks_phases[phase_index])
+        for task in self.task_instances:
+            if task.name in phase_task_names:
+                task.phase_completion_counted = False
+
     def next_phase(self) -> typ.Set["TaskInstance"]:
         """Enter next phase by incrementing the phase index and returning all the tasks in the new phase.
         
         Note: Commit to persist the change.
         """
-        self.current_phase_index += 1
-
         # sanity check
-        if self.all_phases_complete:
-            self.current_phase_index -= 1
+        if self.current_phase_index >= len(self.sorted_tasks_phases) - 1:
             raise IndexError(f"All phases in state {self.name} already complete")
 
+        self.start_phase(self.current_phase_index + 1)
+
         return self.phase_tasks
+
+    def phase_index_of(self, task_name: str) -> typ.Optional[int]:
+        """Index of the phase containing the named task, if any."""
+        for ix, phase in enumerate(self.sorted_tasks_phases):
+            if task_name in phase:
+                return ix
+        return None
     
     def final_phase(self) -> typ.Set["TaskInstance"]:
         """Return the "final" phase of tasks in the state.
@@ -145,11 +226,51 @@ class StateInstance(Base):
         }
         return tasks
     
+    def completed_task_outputs(self) -> dict[str, dict]:
+        """Returns the outputs of completed tasks by task name."""
+        return {
+            t.name: t.output
+            for t in self.task_instances
+            if t.state == TaskInstanceStateEnum.completed
+        }
+
     def state_output(self) -> dict:
         """Returns the merged output from the final phase of tasks (see `final_phase`)."""
         outputs = dict(ChainMap(*(t.output for t in self.final_phase())))
         return outputs
 
+    def likely_next_state(self) -> typ.Optional[str]:
+        """Guess the next state before the transition conditions are evaluated: the first transition's target."""
+        return next(iter(self.transitions.values()), None)
+
+    def begin_speculation(self):
+        """Mark the state as entered speculatively (before entering it), remembering its state to restore if the
+        speculation is discarded.
+
+        Note: Commit to persist the change.
+        """
+        self.speculative = True
+        self.state_before_speculation = self.state
+
+    def confirm_speculation(self):
+        """Keep a speculatively entered state's progress (its previous state transitioned into it.)
+
+        Note: Commit to persist the change.
+        """
+        self.speculative = False
+        self.state_before_speculation = None
+
+    def discard_speculation(self):
+        """Discard a speculatively entered state's progress, ignoring completions of any tasks still running, and
+        restore its state from before the speculation (e.g. completed, if it was already run earlier in a loop.)
+
+        Note: Commit to persist the change.
+        """
+        self.speculative = False
+        self.state = self.state_before_speculation or StateInstanceStateEnum.created
+        self.state_before_speculation = None
+        self.epoch = (self.epoch or 0) + 1
+
     def next_state(self) -> str:
         """Figure out the next state to transition to."""
         # Get tasks corresponding to transition tas
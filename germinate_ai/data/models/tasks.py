@@ -2,7 +2,18 @@ from datetime import datetime
 from typing import Any, List
 from uuid import UUID
 
-from sqlalchemy import ARRAY, DateTime, Enum, ForeignKey, String, func, text, PickleType
+from sqlalchemy import (
+    ARRAY,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    String,
+    false,
+    func,
+    text,
+    PickleType,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import cloudpickle
 
@@ -17,6 +28,14 @@ class TaskInstance(Base):
     """An instance of a task."""
 
     __tablename__ = "task_instances"
+    __table_args__ = (
+        # Look up a state's tasks by name (e.g. from task assignments)
+        Index("ix_task_instances_state_instance_id_name", "state_instance_id", "name"),
+        # Look up a state's tasks by progress (e.g. completed tasks)
+        Index(
+            "ix_task_instances_state_instance_id_state", "state_instance_id", "state"
+        ),
+    )
 
     id: Mapped[UUID] = mapped_column(
         primary_key=True, server_default=text("gen_random_uuid()")
@@ -27,6 +46,18 @@ class TaskInstance(Base):
     # Just need the names to build subject and get parent tasks' outputs
     depends_on: Mapped[List[str]] = mapped_column(ARRAY(String), default=[])
 
+    # number of parents not completed yet, and whether this task's completion was counted against its children
+    # (only used when scheduling by dependencies, see `release_task_dependents`)
+    pending_dependencies: Mapped[int] = mapped_column(default=0, server_default="0")
+    dependents_released: Mapped[bool] = mapped_column(
+        default=False, server_default=false()
+    )
+    # whether this task's completion was counted in its state's current phase (only used when scheduling by phases,
+    # see `record_task_completion`)
+    phase_completion_counted: Mapped[bool] = mapped_column(
+        default=False, server_default=false()
+    )
+
     state: Mapped[TaskInstanceStateEnum] = mapped_column(
         Enum(TaskInstanceStateEnum), default=TaskInstanceStateEnum.created
     )
@@ -59,3 +90,8 @@ class TaskInstance(Base):
 
     def __repr__(self) -> str:
         return f"<Task Instance: {self.name}>"
+
+    @property
+    def parent_names(self) -> list[str]:
+        """Names of the tasks in the same state that this task depends on (i.e. without the "start" input.)"""
+        return [dep for dep in self.depends_on if dep != "start"]
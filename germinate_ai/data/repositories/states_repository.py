@@ -1,15 +1,143 @@
+import typing as typ
 from uuid import UUID
 
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-# from sqlalchemy import update
+from sqlalchemy import exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
 from ..models.states import StateInstance
+from ..models.tasks import TaskInstance
 
 
-def get_state(db: Session, uuid: UUID, join_tasks=True) -> StateInstance:
-    """Get State from DB."""
+def _get_state_stmt(uuid: UUID, join_tasks: bool):
     stmt = select(StateInstance).where(StateInstance.id == uuid)
     if join_tasks:
-        stmt = stmt.join(StateInstance.task_instances)
+        stmt = stmt.options(selectinload(StateInstance.task_instances))
+    return stmt
+
+
+def _get_state_epoch_stmt(uuid: UUID):
+    return select(StateInstance.epoch).where(StateInstance.id == uuid)
+
+
+def _record_task_completion_stmt(
+    uuid: UUID, phase_index: int, name: str, epoch: typ.Optional[int] = None
+):
+    in_phase = [
+        StateInstance.id == uuid,
+        StateInstance.current_phase_index == phase_index,
+        StateInstance.current_phase_remaining > 0,
+    ]
+    if epoch is not None:
+        in_phase.append(StateInstance.epoch == epoch)
+    # Flip the task's flag (if the state is still in that phase), so that each task is counted once per phase
+    counted = (
+        update(TaskInstance)
+        .where(TaskInstance.state_instance_id == uuid)
+        .where(TaskInstance.name == name)
+        .where(TaskInstance.phase_completion_counted.is_(False))
+        .where(exists(select(StateInstance.id).where(*in_phase)))
+        .values(phase_completion_counted=True)
+        .returning(TaskInstance.id)
+        .cte("counted")
+    )
+    return (
+        update(StateInstance)
+        .where(*in_phase)
+        .where(exists(select(counted.c.id)))
+        .values(
+            current_phase_completed=StateInstance.current_phase_completed + 1,
+            current_phase_remaining=StateInstance.current_phase_remaining - 1,
+        )
+        .returning(StateInstance.current_phase_remaining)
+    )
+
+
+def _record_dag_task_completion_stmt(uuid: UUID):
+    return (
+        update(StateInstance)
+        .where(StateInstance.id == uuid)
+        .values(tasks_remaining=StateInstance.tasks_remaining - 1)
+        .returning(StateInstance.tasks_remaining)
+    )
+
+
+def get_state(db: Session, uuid: UUID, join_tasks=True) -> StateInstance:
+    """Get State from DB.
+    
+    If `join_tasks`, eagerly loads all the state's tasks too (in a single extra `SELECT ... IN` query) so that
+    iterating over `task_instances` doesn't trigger lazy loads.
+    """
+    stmt = _get_state_stmt(uuid, join_tasks)
     return db.scalars(stmt).first()
+
+
+async def aget_state(db: AsyncSession, uuid: UUID, join_tasks=True) -> StateInstance:
+    """Get State from DB (`asyncio` version.)
+
+    Always refreshes the state (and its tasks) if they are already in the session, since `asyncio` sessions don't
+    expire objects on commit.
+    """
+    stmt = _get_state_stmt(uuid, join_tasks).execution_options(populate_existing=True)
+    return (await db.scalars(stmt)).first()
+
+
+def get_state_epoch(db: Session, uuid: UUID) -> typ.Optional[int]:
+    """Get the state's current epoch (see `StateInstance.start`), without loading the state."""
+    return db.execute(_get_state_epoch_stmt(uuid)).scalar_one_or_none()
+
+
+async def aget_state_epoch(db: AsyncSession, uuid: UUID) -> typ.Optional[int]:
+    """Get the state's current epoch (`asyncio` version, see `get_state_epoch`.)"""
+    return (await db.execute(_get_state_epoch_stmt(uuid))).scalar_one_or_none()
+
+
+def record_task_completion(
+    db: Session,
+    uuid: UUID,
+    phase_index: int,
+    name: str,
+    epoch: typ.Optional[int] = None,
+) -> typ.Optional[int]:
+    """Count the named task's completion in phase `phase_index` of the state, and return the number of tasks
+    remaining in it.
+
+    Uses a single atomic `UPDATE ... RETURNING` (which also flips the task's `phase_completion_counted` flag), so each
+    task is counted once per phase even if its completion is delivered more than once, and concurrent coordinators
+    never count the same phase as done twice: only the completion that brings the count to 0 sees 0.
+
+    Returns `None` if the task was already counted, if the state isn't in that phase (anymore), or (if given) isn't
+    in `epoch` anymore i.e. the task was assigned before the state was re-entered.
+    """
+    stmt = _record_task_completion_stmt(uuid, phase_index, name, epoch)
+    return db.execute(stmt).scalar_one_or_none()
+
+
+async def arecord_task_completion(
+    db: AsyncSession,
+    uuid: UUID,
+    phase_index: int,
+    name: str,
+    epoch: typ.Optional[int] = None,
+) -> typ.Optional[int]:
+    """Count the task's completion in the state's phase (`asyncio` version, see `record_task_completion`.)"""
+    stmt = _record_task_completion_stmt(uuid, phase_index, name, epoch)
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+def record_dag_task_completion(db: Session, uuid: UUID) -> typ.Optional[int]:
+    """Count a completed task in a state scheduled by dependencies, and return the number of tasks remaining in it.
+
+    Like `record_task_completion`, only the completion that brings the count to 0 sees 0. Callers should count each
+    task once (see `release_task_dependents`.)
+    """
+    stmt = _record_dag_task_completion_stmt(uuid)
+    return db.execute(stmt).scalar_one_or_none()
+
+
+async def arecord_dag_task_completion(
+    db: AsyncSession, uuid: UUID
+) -> typ.Optional[int]:
+    """Count a completed task in the state (`asyncio` version, see `record_dag_task_completion`.)"""
+    stmt = _record_dag_task_completion_stmt(uuid)
+    return (await db.execute(stmt)).scalar_one_or_none()
@@ -1,4 +1,8 @@
-from sqlalchemy import select
+import typing as typ
+from uuid import UUID
+
+from sqlalchemy import any_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..models.tasks import TaskInstance
@@ -6,14 +10,76 @@ from ..schemas.tasks import TaskAssignment
 from ..schemas.tasks import TaskSchema as TaskSchema
 
 
-def get_task_instance_from_assignment(
-    db: Session, assignment: TaskAssignment
-) -> TaskInstance:
-    """Get Task instance from DB from the given assignment."""
-    stmt = (
+def _task_instance_from_assignment_stmt(assignment: TaskAssignment):
+    return (
         select(TaskInstance)
         .where(TaskInstance.state_instance_id == assignment.state_instance_id)
         .where(TaskInstance.name == assignment.name)
     )
+
+
+def _mark_dependents_released_stmt(state_instance_id: UUID, name: str):
+    return (
+        update(TaskInstance)
+        .where(TaskInstance.state_instance_id == state_instance_id)
+        .where(TaskInstance.name == name)
+        .where(TaskInstance.dependents_released.is_(False))
+        .values(dependents_released=True)
+        .returning(TaskInstance.id)
+    )
+
+
+def _decrement_dependents_stmt(state_instance_id: UUID, name: str):
+    return (
+        update(TaskInstance)
+        .where(TaskInstance.state_instance_id == state_instance_id)
+        .where(name == any_(TaskInstance.depends_on))
+        .values(pending_dependencies=TaskInstance.pending_dependencies - 1)
+        .returning(TaskInstance.name, TaskInstance.pending_dependencies)
+    )
+
+
+def get_task_instance_from_assignment(
+    db: Session, assignment: TaskAssignment
+) -> TaskInstance:
+    """Get Task instance from DB from the given assignment."""
+    stmt = _task_instance_from_assignment_stmt(assignment)
     task = db.scalars(stmt).first()
     return task
+
+
+async def aget_task_instance_from_assignment(
+    db: AsyncSession, assignment: TaskAssignment
+) -> TaskInstance:
+    """Get Task instance from DB from the given assignment (`asyncio` version.)"""
+    stmt = _task_instance_from_assignment_stmt(assignment)
+    task = (await db.scalars(stmt)).first()
+    return task
+
+
+def release_task_dependents(
+    db: Session, state_instance_id: UUID, name: str
+) -> typ.Optional[list[str]]:
+    """Count the named (completed) task against its children's pending dependencies, and return the names of the
+    children that have no pending dependencies left i.e. are ready to run.
+
+    Uses atomic `UPDATE ... RETURNING`s, so each child is released by exactly one of its parents' completions.
+
+    Returns `None` if the task's completion was already counted (e.g. for duplicate completion notifications.)
+    """
+    if db.execute(_mark_dependents_released_stmt(state_instance_id, name)).first() is None:
+        return None
+    rows = db.execute(_decrement_dependents_stmt(state_instance_id, name)).all()
+    return [child for child, pending in rows if pending == 0]
+
+
+async def arelease_task_dependents(
+    db: AsyncSession, state_instance_id: UUID, name: str
+) -> typ.Optional[list[str]]:
+    """Count the completed task against its children (`asyncio` version, see `release_task_dependents`.)"""
+    stmt = _mark_dependents_released_stmt(state_instance_id, name)
+    if (await db.execute(stmt)).first() is None:
+        return None
+    stmt = _decrement_dependents_stmt(state_instance_id, name)
+    rows = (await db.execute(stmt)).all()
+    return [child for child, pending in rows if pending == 0]
@@ -1,22 +1,50 @@
 from uuid import UUID
 
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
 from germinate_ai.core.workflows import Workflow
 
 from ..models.enums import WorkflowRunStateEnum
+from ..models.states import StateInstance
 from ..models.workflow_runs import WorkflowRun
 
 
-def get_workflow_run(db: Session, uuid: UUID, join_states=True) -> WorkflowRun:
-    """Get WorkflowRun from the DB."""
+def _get_workflow_run_stmt(uuid: UUID, join_states: bool):
     stmt = select(WorkflowRun).where(WorkflowRun.id == uuid)
     if join_states:
-        stmt = stmt.join(WorkflowRun.state_instances)
+        stmt = stmt.options(
+            selectinload(WorkflowRun.state_instances).selectinload(
+                StateInstance.task_instances
+            )
+        )
+    return stmt
+
+
+def get_workflow_run(db: Session, uuid: UUID, join_states=True) -> WorkflowRun:
+    """Get WorkflowRun from the DB.
+    
+    If `join_states`, eagerly loads all the run's states and their tasks too.
+    """
+    stmt = _get_workflow_run_stmt(uuid, join_states)
     return db.scalars(stmt).first()
 
 
+async def aget_workflow_run(
+    db: AsyncSession, uuid: UUID, join_states=True
+) -> WorkflowRun:
+    """Get WorkflowRun from the DB (`asyncio` version.)
+
+    Always refreshes the run (and its states and tasks) if they are already in the session, since `asyncio`
+    sessions don't expire objects on commit.
+    """
+    stmt = _get_workflow_run_stmt(uuid, join_states).execution_options(
+        populate_existing=True
+    )
+    return (await db.scalars(stmt)).first()
+
+
 def create_run_from_workflow(db: Session, workflow: Workflow) -> WorkflowRun:
     """Create a WorkflowRun model from a Workflow specification."""
     workflow_run = WorkflowRun(
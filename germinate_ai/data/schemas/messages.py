@@ -9,3 +9,8 @@ class Message(BaseModel):
 
     content: Optional[str] = ""
     payload: Optional[dict] = {}
+
+    payload_ref: Optional[str] = None
+    """Name of the object holding the payload, if it was too large to send in the message.
+    
+    See `germinate_ai.memory.claim_check`."""
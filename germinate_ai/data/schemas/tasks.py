@@ -51,6 +51,21 @@ class TaskAssignment(BaseModel):
     # task_id: UUID
     name: str
 
+    workflow_run_id: Optional[UUID] = None
+    state_name: Optional[str] = None
+    """Workflow run and state the task belongs to (used to address the task's output stream.)"""
+
+    phase_index: Optional[int] = None
+    """Index of the state phase the task was scheduled in."""
+
+    epoch: Optional[int] = None
+    """Epoch of the state the task was scheduled in (completions from earlier epochs are ignored.)"""
+
+    inputs: dict[str, dict] = {}
+    """Inlined outputs of (small) dependencies by task name.
+    
+    Outputs of dependencies missing here are read from the message bus."""
+
 
 class TaskSchema(TaskBase):
     state: TaskStateEnum
@@ -0,0 +1,69 @@
+"""Claim-check offloading of large message payloads.
+
+Payloads too large to publish comfortably on the message bus (e.g. whole code files) are stored in an object store
+bucket, and the message only carries the object's name in `payload_ref`. Readers resolve the reference when they
+actually need the payload.
+
+Offloaded payloads expire after `settings.payload_ttl` seconds, so the bucket doesn't grow forever.
+"""
+
+import json
+import uuid
+
+from loguru import logger
+
+from germinate_ai.config import settings
+from germinate_ai.data.schemas.messages import Message
+from germinate_ai.message_bus.nats import NatsConnection
+
+from .object_store import ObjectStore
+
+
+class ClaimCheck:
+    """Offloads message payloads of at least `min_bytes` (as JSON) to `store`. Set `min_bytes` to 0 to disable."""
+
+    def __init__(
+        self,
+        store: ObjectStore = None,
+        min_bytes: int = None,
+        connection: NatsConnection = None,
+    ):
+        if store is None:
+            store = ObjectStore(
+                settings.payload_bucket,
+                connection=connection,
+                ttl=settings.payload_ttl or None,
+            )
+        self.store = store
+        if min_bytes is None:
+            min_bytes = settings.payload_offload_min_bytes
+        self.min_bytes = min_bytes
+
+    async def offload(self, message: Message, name: str = None) -> Message:
+        """Store the message's payload in the object store if it's too large, and return a message referencing it.
+
+        Returns `message` as is if the payload is small enough.
+        """
+        if self.min_bytes <= 0 or message.payload is None:
+            return message
+        data = json.dumps(message.payload).encode()
+        if len(data) < self.min_bytes:
+            return message
+
+        if name is None:
+            name = f"{message.source}.{uuid.uuid4().hex}"
+        if not self.store.connected:
+            await self.store.connect()
+        logger.debug(f"Offloading {len(data)} byte payload from {message.source} to `{name}`")
+        await self.store.put(name, data)
+        return message.model_copy(update={"payload": {}, "payload_ref": name})
+
+    async def resolve(self, message: Message) -> dict:
+        """Get the message's payload, reading it from the object store if it was offloaded."""
+        if message.payload_ref is None:
+            return message.payload
+        if not self.store.connected:
+            await self.store.connect()
+        # (The whole payload is parsed into memory anyway, so read it directly)
+        data = await self.store.get(message.payload_ref)
+        return json.loads(data)
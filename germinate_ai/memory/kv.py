@@ -9,8 +9,12 @@ class KeyValueStore:
     connected: bool = False
     kv: _KeyValue = None
 
-    def __init__(self, bucket_name: str, connection: NatsConnection = None):
+    def __init__(
+        self, bucket_name: str, connection: NatsConnection = None, ttl: float = None
+    ):
         self.bucket_name = bucket_name
+        # Max age of values in seconds (only applies when creating the bucket)
+        self.ttl = ttl
         if connection is None:
             connection = NatsConnection()
         self.connection = connection
@@ -20,7 +24,10 @@ class KeyValueStore:
         """Connect to NATS cluster."""
         if not self.connection.is_connected:
             await self.connection.connect()
-        self.kv = await self.connection.jetstream.create_key_value(bucket=self.bucket_name)
+        params = {} if self.ttl is None else {"ttl": self.ttl}
+        self.kv = await self.connection.jetstream.create_key_value(
+            bucket=self.bucket_name, **params
+        )
         self.connected = True
 
     async def get(self, key: str) -> str:
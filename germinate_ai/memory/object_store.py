@@ -0,0 +1,62 @@
+import asyncio
+import io
+
+from nats.js.api import ObjectInfo, ObjectStoreConfig
+from nats.js.object_store import ObjectStore as _ObjectStore
+
+from germinate_ai.message_bus.nats import NatsConnection
+
+
+class ObjectStore:
+    """NATS Object Store, for values too large to send as messages.
+
+    Objects are chunked by the server, so they aren't limited by JetStream's max message size.
+    """
+
+    connected: bool = False
+    obj: _ObjectStore = None
+
+    def __init__(
+        self, bucket_name: str, connection: NatsConnection = None, ttl: float = None
+    ):
+        self.bucket_name = bucket_name
+        # Max age of objects in seconds (only applies when creating the bucket)
+        self.ttl = ttl
+        if connection is None:
+            connection = NatsConnection()
+        self.connection = connection
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self):
+        """Connect to NATS cluster (once, even if called concurrently.)"""
+        async with self._connect_lock:
+            if self.connected:
+                return
+            if not self.connection.is_connected:
+                await self.connection.connect()
+            config = ObjectStoreConfig(bucket=self.bucket_name, ttl=self.ttl)
+            self.obj = await self.connection.jetstream.create_object_store(
+                config=config
+            )
+            self.connected = True
+
+    async def get(self, name: str) -> bytes:
+        """Get the named object."""
+        result = await self.obj.get(name)
+        return result.data
+
+    async def put(self, name: str, value: bytes | io.BufferedIOBase) -> ObjectInfo:
+        """Store an object under `name`."""
+        return await self.obj.put(name, value)
+
+    async def delete(self, name: str):
+        """Delete the named object."""
+        await self.obj.delete(name)
+
+
+def object_store_factory(
+    *, bucket_name: str, connection: NatsConnection = None, ttl: float = None
+):
+    """Creates an object store."""
+    store = ObjectStore(bucket_name, connection=connection, ttl=ttl)
+    return store
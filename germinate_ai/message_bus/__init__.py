@@ -1,5 +1,6 @@
 from .nats import NatsConnection, nats_connection
 from .message_queue import NATSQueue
+from .subscriptions import SubscriptionCache
 from .message_channels import ROMessageChannel, WOMessageChannel, RWMessageChannel
 from .factories import (
     ro_message_channel_factory,
@@ -11,6 +12,7 @@ __all__ = [
     "NatsConnection",
     "nats_connection",
     "NATSQueue",
+    "SubscriptionCache",
     "ROMessageChannel",
     "WOMessageChannel",
     "RWMessageChannel",
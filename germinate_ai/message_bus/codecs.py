@@ -0,0 +1,176 @@
+"""Pluggable (de)serialization of messages published on the message bus.
+
+Publishers encode messages with their configured codec and tag them with a `Content-Type` header, and subscribers
+decode each message with the codec matching its header. So nodes configured with different codecs can share a
+cluster. Messages without the header (e.g. from older nodes) are assumed to be JSON.
+
+Note: Nodes that predate the header only understand JSON, so upgrade every node before switching to a binary codec.
+
+JSON is the default and has no extra dependencies. `orjson` and `msgpack` codecs need the corresponding packages
+installed (the `orjson` and `msgpack` extras.)
+"""
+
+import json
+import typing as typ
+from abc import ABC, abstractmethod
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+CONTENT_TYPE_HEADER = "Content-Type"
+
+M = typ.TypeVar("M", bound=BaseModel)
+
+
+class Codec(ABC):
+    """Encodes (pydantic models or plain data) to bytes, and back."""
+
+    name: str
+    content_type: str
+
+    @abstractmethod
+    def encode(self, item: typ.Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, data: bytes | str) -> typ.Any:
+        pass
+
+    def decode_model(self, data: bytes | str, model: type[M]) -> M:
+        """Decode and validate data into a `model` instance."""
+        return model.model_validate(self.decode(data))
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {CONTENT_TYPE_HEADER: self.content_type}
+
+
+class JSONCodec(Codec):
+    """JSON with pydantic's own (de)serializer for models."""
+
+    name = "json"
+    content_type = "application/json"
+
+    def encode(self, item: typ.Any) -> bytes:
+        if isinstance(item, BaseModel):
+            return item.model_dump_json().encode()
+        return json.dumps(item).encode()
+
+    def decode(self, data: bytes | str) -> typ.Any:
+        return json.loads(data)
+
+    def decode_model(self, data: bytes | str, model: type[M]) -> M:
+        # Validate straight from JSON, without building an intermediate dict
+        return model.model_validate_json(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """JSON with `orjson`. Produces plain JSON, so any JSON subscriber can decode it."""
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError(
+                "Install `orjson` (the `germinate-ai[orjson]` extra) to use the orjson codec"
+            )
+
+    def encode(self, item: typ.Any) -> bytes:
+        if isinstance(item, BaseModel):
+            item = item.model_dump()
+        return orjson.dumps(item)
+
+    def decode(self, data: bytes | str) -> typ.Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """Compact binary encoding with `msgpack`."""
+
+    name = "msgpack"
+    content_type = "application/msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError(
+                "Install `msgpack` (the `germinate-ai[msgpack]` extra) to use the msgpack codec"
+            )
+
+    def encode(self, item: typ.Any) -> bytes:
+        if isinstance(item, BaseModel):
+            # (msgpack can't pack UUIDs, datetimes etc. natively)
+            item = item.model_dump(mode="json")
+        return msgpack.packb(item)
+
+    def decode(self, data: bytes) -> typ.Any:
+        return msgpack.unpackb(data)
+
+
+CODECS: dict[str, type[Codec]] = {
+    codec.name: codec for codec in (JSONCodec, OrjsonCodec, MsgpackCodec)
+}
+
+# Codecs used to decode each content type
+_decoders: dict[str, Codec] = {}
+
+
+def get_codec(name: str = "json") -> Codec:
+    """Get a codec by name."""
+    try:
+        return CODECS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown codec `{name}`: expected one of {list(CODECS.keys())}"
+        )
+
+
+def check_codec(name: str):
+    """Check that the named codec can be used, so nodes fail at startup instead of on their first message.
+
+    Raises `ValueError` if it's unknown, or `ImportError` if its package isn't installed.
+    """
+    get_codec(name)
+
+
+def codec_for_content_type(content_type: typ.Optional[str]) -> Codec:
+    """Get the codec to decode messages with the given content type (defaults to JSON.)"""
+    if content_type is None:
+        content_type = JSONCodec.content_type
+    if content_type not in _decoders:
+        if content_type == MsgpackCodec.content_type:
+            _decoders[content_type] = MsgpackCodec()
+        elif content_type == JSONCodec.content_type:
+            _decoders[content_type] = JSONCodec()
+        else:
+            raise ValueError(f"Unsupported message content type `{content_type}`")
+    return _decoders[content_type]
+
+
+def content_type_of(msg) -> typ.Optional[str]:
+    """Get the content type header of a NATS message, if any."""
+    headers = getattr(msg, "headers", None) or {}
+    return headers.get(CONTENT_TYPE_HEADER)
+
+
+def is_text(content_type: typ.Optional[str]) -> bool:
+    """Are messages of this content type text (i.e. should their data be decoded to `str`)?"""
+    return content_type is None or content_type == JSONCodec.content_type
+
+
+def decode_model(msg, model: type[M]) -> M:
+    """Decode and validate a received NATS message's data into a `model` instance, according to its content type.
+
+    Accepts messages whose (text) data has already been decoded to `str` by the message queue.
+    """
+    codec = codec_for_content_type(content_type_of(msg))
+    return codec.decode_model(msg.data, model)
@@ -0,0 +1,143 @@
+"""Opt-in compression of large messages published on the message bus.
+
+Publishers compress encoded messages of at least `min_bytes` (if that makes them smaller), and mark them with a
+`Content-Encoding` header naming the compressor. Subscribers decompress any message with the header before decoding
+it, so nodes with compression turned off can still read compressed messages (as long as the compressor's package is
+installed.)
+
+`zlib` is always available. `zstd` and `lz4` need the `zstandard` and `lz4` packages (the `zstd` and `lz4` extras.)
+"""
+
+import typing as typ
+import zlib
+from abc import ABC, abstractmethod
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+
+CONTENT_ENCODING_HEADER = "Content-Encoding"
+
+
+class Compressor(ABC):
+    """Compresses bytes, and back."""
+
+    name: str
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+
+class ZlibCompressor(Compressor):
+    name = "zlib"
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    name = "zstd"
+
+    def __init__(self):
+        if zstandard is None:
+            raise ImportError(
+                "Install `zstandard` (the `germinate-ai[zstd]` extra) to use zstd compression"
+            )
+        self._compressor = zstandard.ZstdCompressor()
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+class LZ4Compressor(Compressor):
+    name = "lz4"
+
+    def __init__(self):
+        if lz4 is None:
+            raise ImportError(
+                "Install `lz4` (the `germinate-ai[lz4]` extra) to use lz4 compression"
+            )
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4.frame.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4.frame.decompress(data)
+
+
+COMPRESSORS: dict[str, type[Compressor]] = {
+    compressor.name: compressor
+    for compressor in (ZlibCompressor, ZstdCompressor, LZ4Compressor)
+}
+
+_compressors: dict[str, Compressor] = {}
+
+
+def get_compressor(name: str) -> Compressor:
+    """Get a (shared) compressor by name."""
+    if name not in _compressors:
+        try:
+            _compressors[name] = COMPRESSORS[name]()
+        except KeyError:
+            raise ValueError(
+                f"Unknown compressor `{name}`: expected one of {list(COMPRESSORS.keys())}"
+            )
+    return _compressors[name]
+
+
+def check_compression(compression: typ.Optional[str]):
+    """Check that the named compressor (if any) can be used, so nodes fail at startup instead of on their first large
+    message.
+
+    Raises `ValueError` if it's unknown, or `ImportError` if its package isn't installed.
+    """
+    if compression not in (None, "none"):
+        get_compressor(compression)
+
+
+def compress(
+    data: bytes,
+    headers: typ.Optional[dict[str, str]],
+    compression: typ.Optional[str],
+    min_bytes: int,
+) -> tuple[bytes, typ.Optional[dict[str, str]]]:
+    """Compress message data with the named compressor if it's at least `min_bytes` long, and mark it in the
+    message headers.
+
+    Returns the data and headers unchanged if `compression` is `None` (or "none"), the data is too short, or
+    compressing doesn't make it any smaller.
+    """
+    if compression in (None, "none") or len(data) < min_bytes:
+        return data, headers
+    compressor = get_compressor(compression)
+    compressed = compressor.compress(data)
+    if len(compressed) >= len(data):
+        return data, headers
+    return compressed, {**(headers or {}), CONTENT_ENCODING_HEADER: compressor.name}
+
+
+def decompress_msg(msg):
+    """Decompress a received NATS message's data in place, if it's marked as compressed."""
+    headers = getattr(msg, "headers", None) or {}
+    encoding = headers.get(CONTENT_ENCODING_HEADER)
+    if encoding is not None:
+        msg.data = get_compressor(encoding).decompress(msg.data)
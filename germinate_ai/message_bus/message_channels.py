@@ -3,6 +3,10 @@ import typing as typ
 from nats.aio.msg import Msg
 from nats.js import JetStreamContext
 
+from germinate_ai.config import settings
+
+from .codecs import content_type_of, is_text
+from .compression import compress, decompress_msg
 from .nats.connection import NatsConnection
 
 
@@ -59,7 +63,9 @@ class ROMessageChannel(AbstractMessageChannel):
             await self.connect()
         msgs = await self.consumer.fetch(batch=batch)
         for msg in msgs:
-            msg.data = msg.data.decode()
+            decompress_msg(msg)
+            if is_text(content_type_of(msg)):
+                msg.data = msg.data.decode()
         return msgs
 
 
@@ -84,8 +90,17 @@ class WOMessageChannel(AbstractMessageChannel):
         self.durable_consumer = durable_consumer
 
     async def write(self, msg: str):
-        """Write the string `msg` into the message bus."""
-        await self.connection.jetstream.publish(self.subject, msg.encode())
+        """Write the string `msg` into the message bus.
+
+        Large messages are compressed as configured in the settings (see `germinate_ai.message_bus.compression`.)
+        """
+        data, headers = compress(
+            msg.encode(),
+            None,
+            settings.message_compression,
+            settings.message_compression_min_bytes,
+        )
+        await self.connection.jetstream.publish(self.subject, data, headers=headers)
 
 
 class RWMessageChannel(WOMessageChannel, ROMessageChannel):
@@ -1,8 +1,14 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import TypeVar, Generic, AsyncGenerator
+from typing import Any, Optional, Sequence, TypeVar, Generic, AsyncGenerator
 
 from nats.aio.msg import Msg
+from nats.js.api import RawStreamMsg
 
+from germinate_ai.config import settings
+
+from .codecs import Codec, content_type_of, get_codec, is_text
+from .compression import compress, decompress_msg
 from .nats import NatsConnection
 
 
@@ -21,8 +27,22 @@ class AbstractMessageQueue(Generic[T], ABC):
         pass
 
 
+def _decode_data(msg: Msg | RawStreamMsg):
+    """Decompress message data, and decode text (e.g. JSON) data to `str` in place, leaving binary data as is."""
+    decompress_msg(msg)
+    if is_text(content_type_of(msg)):
+        msg.data = msg.data.decode()
+
+
 class NATSQueue(AbstractMessageQueue[Generic[T]], ABC):
-    """A distributed message queue on top of NATS Jetstream."""
+    """A distributed message queue on top of NATS Jetstream.
+
+    Items other than strings (e.g. pydantic models) are encoded with `codec` (by default, the codec named in the
+    `message_codec` setting.) Decode received messages with `codecs.decode_model`.
+
+    Encoded items of at least `compression_min_bytes` are compressed with `compression` (by default, as configured
+    in the settings.) Received messages are decompressed automatically.
+    """
 
     def __init__(
         self,
@@ -30,6 +50,9 @@ class NATSQueue(AbstractMessageQueue[Generic[T]], ABC):
         subject: str,
         durable_consumer: str = None,
         connection: NatsConnection = None,
+        codec: Codec = None,
+        compression: Optional[str] = None,
+        compression_min_bytes: Optional[int] = None,
     ):
         if connection is None:
             connection = NatsConnection()
@@ -38,10 +61,26 @@ class NATSQueue(AbstractMessageQueue[Generic[T]], ABC):
         self.subject = subject
         self.durable_consumer = durable_consumer
         self.consumer = None
+        if codec is None:
+            codec = get_codec(settings.message_codec)
+        self.codec = codec
+        if compression is None:
+            compression = settings.message_compression
+        self.compression = compression
+        if compression_min_bytes is None:
+            compression_min_bytes = settings.message_compression_min_bytes
+        self.compression_min_bytes = compression_min_bytes
+
+    async def connect(self, subscribe: bool = True):
+        """Connect to the message bus.
 
-    async def connect(self):
+        Pass `subscribe=False` for queues that are only written to (or read with `last`), to avoid creating a
+        consumer on the server.
+        """
         if not self.connection.is_connected:
             await self.connection.connect()
+        if not subscribe:
+            return
         # if self.durable_consumer is not None:
         self.consumer = await self.connection.jetstream.pull_subscribe(
             stream=self.stream,
@@ -49,20 +88,79 @@ class NATSQueue(AbstractMessageQueue[Generic[T]], ABC):
             durable=self.durable_consumer,
         )
 
-    async def enqueue(self, item: T):
-        await self.connection.jetstream.publish(self.subject, item.encode())
+    async def unsubscribe(self):
+        """Unsubscribe, and delete this queue's consumer from the server unless it is durable."""
+        if self.consumer is None:
+            return
+        consumer, self.consumer = self.consumer, None
+        if self.durable_consumer is None:
+            info = await consumer.consumer_info()
+            await self.connection.jetstream.delete_consumer(self.stream, info.name)
+        await consumer.unsubscribe()
+
+    async def enqueue(self, item: T | Any):
+        """Publish an item: strings are published as is, anything else is encoded with the queue's codec."""
+        if isinstance(item, str):
+            data, headers = item.encode(), None
+        else:
+            data, headers = self.codec.encode(item), self.codec.headers
+        data, headers = compress(
+            data, headers, self.compression, self.compression_min_bytes
+        )
+        await self.connection.jetstream.publish(self.subject, data, headers=headers)
+
+    async def enqueue_many(
+        self, items: Sequence[T | Any], max_in_flight: int = 256
+    ) -> list[Optional[BaseException]]:
+        """Publish many items concurrently, and wait for all their acks together.
+
+        Keeps up to `max_in_flight` publishes waiting for acks at a time, instead of paying a round trip per item.
+
+        Returns the error for each item (in order), or `None` if it was published.
+        """
+        limit = asyncio.Semaphore(max_in_flight)
+
+        async def publish(item: T | Any):
+            async with limit:
+                await self.enqueue(item)
+
+        results = await asyncio.gather(
+            *(publish(item) for item in items), return_exceptions=True
+        )
+        return [result if isinstance(result, BaseException) else None for result in results]
 
     async def dequeue(self) -> Msg:
         # Callers are responsible for acknowledging with `await msg.ack()` call!!
         msgs = await self.consumer.fetch(batch=1)
         for msg in msgs:
-            msg.data = msg.data.decode()
+            _decode_data(msg)
             return msg
 
+    async def dequeue_batch(self, batch: int = 1, timeout: float = 5) -> list[Msg]:
+        """Long poll for up to `batch` messages.
+
+        Returns as soon as at least one message is available, or raises `TimeoutError`
+        if the queue stays empty for `timeout` seconds.
+        """
+        # Callers are responsible for acknowledging with `await msg.ack()` call!!
+        msgs = await self.consumer.fetch(batch=batch, timeout=timeout)
+        for msg in msgs:
+            _decode_data(msg)
+        return msgs
+
+    async def last(self) -> RawStreamMsg:
+        """Get the last message published on this queue's subject directly from the stream.
+
+        Doesn't need (or advance) a consumer, so any number of readers can read the same message.
+        """
+        msg = await self.connection.jetstream.get_last_msg(self.stream, self.subject)
+        _decode_data(msg)
+        return msg
+
     async def aiter_dequeue(self) -> AsyncGenerator[T, None]:
         msgs = await self.consumer.fetch(batch=1)
         for msg in msgs:
             # bytes -> str
-            msg.data = msg.data.decode()
+            _decode_data(msg)
             yield msg
             await msg.ack()
@@ -5,21 +5,23 @@ from loguru import logger
 
 from germinate_ai.config import settings
 
-NATS_URL = settings.nats_url
-
 
 class NatsConnection:
     """NATS connection singleton class."""
 
     _instance: "NatsConnection" = None
 
-    def __new__(cls, nats_url=NATS_URL) -> "NatsConnection":
+    def __new__(cls, nats_url: str = None) -> "NatsConnection":
         if cls._instance is None:
-            logger.debug(f"Creating a new NATS connection to cluster: `{nats_url}`...")
+            logger.debug(
+                f"Creating a new NATS connection to cluster: `{nats_url or settings.nats_url}`..."
+            )
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, nats_url=NATS_URL):
+    def __init__(self, nats_url: str = None):
+        if nats_url is None:
+            nats_url = settings.nats_url
         self.nats_url = nats_url
         self.nc = None
         self.jetstream = None
@@ -43,7 +45,7 @@ class NatsConnection:
 
 
 @asynccontextmanager
-async def nats_connection(nats_url=NATS_URL):
+async def nats_connection(nats_url: str = None):
     """NATS connection context manager that opens and closes the connection for you."""
     nc = NatsConnection(nats_url=nats_url)
     await nc.connect()
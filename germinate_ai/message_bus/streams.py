@@ -0,0 +1,78 @@
+"""Streaming of running tasks' incremental output (e.g. LLM tokens.)
+
+While a task runs, its chunks are published with core NATS (they aren't persisted) on
+`streams.<workflow run id>.<state name>.<task name>`, followed by a final "done" event once the task completes. Anyone
+interested (e.g. `germinate tail <run>`) can subscribe to a run's `streams.<workflow run id>.>` subjects.
+
+The `TaskDispatcher` sets the current task's stream (`current_task_stream`) while running an (async) executor, so
+helpers like `germinate_ai.toolbox.chains.astream_chain` publish to it without tasks having to know about it.
+"""
+
+import contextlib
+import json
+import typing as typ
+from contextvars import ContextVar
+from uuid import UUID
+
+from .nats import NatsConnection
+
+STREAMS_SUBJECT = "streams"
+
+
+def stream_subject(
+    workflow_run_id: UUID | str, state_name: str = "*", task_name: str = "*"
+) -> str:
+    """Subject of a task's stream. Use the default wildcards to subscribe to several tasks' streams."""
+    return f"{STREAMS_SUBJECT}.{workflow_run_id}.{state_name}.{task_name}"
+
+
+class TaskStream:
+    """Publishes a task's output chunks as JSON events: `{"seq": 0, "chunk": "..."}`, and finally
+    `{"seq": n, "done": true, "error": null}`."""
+
+    def __init__(
+        self,
+        connection: NatsConnection,
+        workflow_run_id: UUID | str,
+        state_name: str,
+        task_name: str,
+    ):
+        self.connection = connection
+        self.subject = stream_subject(workflow_run_id, state_name, task_name)
+        self.seq = 0
+
+    async def _publish(self, event: dict):
+        event = {"seq": self.seq, **event}
+        self.seq += 1
+        # (Core NATS publishes are buffered, and don't wait for acks)
+        await self.connection.nc.publish(self.subject, json.dumps(event).encode())
+
+    async def write(self, chunk: str):
+        """Publish an output chunk."""
+        if not chunk:
+            return
+        await self._publish({"chunk": chunk})
+
+    async def end(self, error: typ.Optional[str] = None):
+        """Publish the end of the stream (with the task's error if it failed.)"""
+        await self._publish({"done": True, "error": error})
+
+
+_current_task_stream: ContextVar[typ.Optional[TaskStream]] = ContextVar(
+    "current_task_stream", default=None
+)
+
+
+def current_task_stream() -> typ.Optional[TaskStream]:
+    """The stream of the task running in the current context, if it's streamed."""
+    return _current_task_stream.get()
+
+
+@contextlib.contextmanager
+def task_stream(stream: typ.Optional[TaskStream]):
+    """Set the current task's stream within the context."""
+    token = _current_task_stream.set(stream)
+    try:
+        yield stream
+    finally:
+        _current_task_stream.reset(token)
@@ -0,0 +1,92 @@
+import typing as typ
+from collections import OrderedDict
+
+from loguru import logger
+
+from .message_queue import NATSQueue
+from .nats import NatsConnection
+
+
+SubscriptionKey = typ.Tuple[str, str, typ.Optional[str], bool]
+
+
+class SubscriptionCache:
+    """LRU cache of connected `NATSQueue`s keyed by stream and subject.
+
+    Creating a JetStream pull subscription is a round trip to the server, and each one leaves a consumer behind
+    until it is removed. Hot paths look queues up here instead, so each subject is connected to once per process.
+
+    When the cache is full, the least recently used queue is evicted and its consumer is removed.
+    """
+
+    def __init__(self, connection: NatsConnection = None, max_size: int = 128):
+        if connection is None:
+            connection = NatsConnection()
+        self.connection = connection
+        self.max_size = max_size
+        self._queues: OrderedDict[SubscriptionKey, NATSQueue] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    async def subscriber(
+        self, stream: str, subject: str, durable_consumer: str = None
+    ) -> NATSQueue:
+        """Get a queue with a pull subscription to `subject`."""
+        return await self._get(stream, subject, durable_consumer, subscribe=True)
+
+    async def publisher(self, stream: str, subject: str) -> NATSQueue:
+        """Get a write only queue for `subject` i.e. a queue without a consumer."""
+        return await self._get(stream, subject, None, subscribe=False)
+
+    async def reader(self, stream: str, subject: str) -> NATSQueue:
+        """Get a queue for reading the last message on `subject` with `NATSQueue.last`.
+
+        Shares the (consumer-less) queue with `publisher`.
+        """
+        return await self._get(stream, subject, None, subscribe=False)
+
+    async def unsubscribe(
+        self, stream: str, subject: str, durable_consumer: str = None
+    ):
+        """Remove the cached subscription to `subject`, if any, and its consumer."""
+        queue = self._queues.pop((stream, subject, durable_consumer, True), None)
+        if queue is not None:
+            await queue.unsubscribe()
+
+    async def close(self):
+        """Unsubscribe from everything and empty the cache."""
+        queues = list(self._queues.values())
+        self._queues.clear()
+        for queue in queues:
+            await self._unsubscribe(queue)
+
+    async def _get(
+        self, stream: str, subject: str, durable_consumer: str, subscribe: bool
+    ) -> NATSQueue:
+        key = (stream, subject, durable_consumer, subscribe)
+        queue = self._queues.get(key)
+        if queue is not None:
+            self._queues.move_to_end(key)
+            return queue
+
+        queue = NATSQueue(
+            stream=stream,
+            subject=subject,
+            durable_consumer=durable_consumer,
+            connection=self.connection,
+        )
+        await queue.connect(subscribe=subscribe)
+        self._queues[key] = queue
+
+        while len(self._queues) > self.max_size:
+            _, evicted = self._queues.popitem(last=False)
+            await self._unsubscribe(evicted)
+
+        return queue
+
+    async def _unsubscribe(self, queue: NATSQueue):
+        try:
+            await queue.unsubscribe()
+        except Exception as e:
+            logger.warning(f"Failed to unsubscribe from `{queue.subject}`: {e}")
@@ -1,23 +1,33 @@
+import asyncio
+import functools
 import re
 import typing as typ
+from concurrent.futures import ThreadPoolExecutor
 
+from langchain_core.language_models import BaseLanguageModel
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import BaseOutputParser, StrOutputParser
+from langchain_core.prompts import BasePromptTemplate, PromptTemplate
 from langchain_core.runnables import Runnable as LCRunnable
+from langchain_core.runnables import RunnableSequence
+from loguru import logger
 
+from germinate_ai.config import settings
+from germinate_ai.message_bus.streams import current_task_stream
 from germinate_ai.utils.llms import get_llm as _get_llm
 
 
 def lc_prompt_chain_factory(
     llm_code: str = None,
     get_llm: typ.Callable[[], BaseChatModel] = None,
+    **llm_params: typ.Any,
 ) -> LCRunnable:
-    """Create a simple Langchain prompt chain from the prompt, and LLM (specified via a code or a getter function.)"""
+    """Create a simple Langchain prompt chain from the prompt, and LLM (specified via a code and params, or a getter
+    function.)"""
     if get_llm:
         llm = get_llm()
     else:
-        llm = _get_llm(llm_code=llm_code)
+        llm = _get_llm(llm_code=llm_code, **llm_params)
 
     def factory(prompt: str):
         prompt = PromptTemplate.from_template(prompt)
@@ -29,6 +39,104 @@ def lc_prompt_chain_factory(
     return factory
 
 
+# Methods that language models implement to support async requests natively
+# (the defaults in `langchain_core` run the sync methods in a thread pool)
+_LM_ASYNC_METHODS = ("_agenerate", "_acall", "_astream")
+
+
+def _implements_natively(obj: typ.Any, method_names: typ.Sequence[str]) -> bool:
+    """Is any of the methods implemented outside of `langchain_core`?"""
+    for name in method_names:
+        for klass in type(obj).__mro__:
+            if name in klass.__dict__:
+                if not klass.__module__.startswith("langchain_core."):
+                    return True
+                break
+    return False
+
+
+def has_native_async(runnable: LCRunnable) -> bool:
+    """Does the chain (or runnable) support `ainvoke` without blocking a thread on I/O at any step?
+
+    Prompt templates and output parsers don't do any I/O, so only count the language models (and any other custom
+    runnables) in the chain.
+    """
+    if isinstance(runnable, RunnableSequence):
+        return all(has_native_async(step) for step in runnable.steps)
+    if isinstance(runnable, (BasePromptTemplate, BaseOutputParser)):
+        return True
+    if isinstance(runnable, BaseLanguageModel):
+        return _implements_natively(runnable, _LM_ASYNC_METHODS)
+    # Wrappers (e.g. `CachedLLM`, `ConcurrencyLimitedLLM`) are as async as the model they wrap
+    inner = getattr(runnable, "llm", None)
+    if isinstance(inner, LCRunnable):
+        return has_native_async(inner)
+    return _implements_natively(runnable, ("ainvoke",))
+
+
+@functools.cache
+def get_chain_thread_pool() -> ThreadPoolExecutor:
+    """Get the process-wide thread pool for blocking chain calls (`settings.llm_thread_pool_size` threads.)
+
+    It's separate from the event loop's default executor (used by `asyncio` itself, e.g. for DNS lookups) and the
+    worker's task slots, so long LLM calls don't starve either.
+    """
+    return ThreadPoolExecutor(
+        max_workers=settings.llm_thread_pool_size, thread_name_prefix="llm-chain"
+    )
+
+
+async def ainvoke_chain(
+    chain: LCRunnable, input: typ.Any, config: typ.Optional[dict] = None
+) -> typ.Any:
+    """Invoke the chain without blocking the event loop.
+
+    Uses the chain's `ainvoke` if all its steps are natively async, or else runs the blocking `invoke` in a thread
+    pool (see `get_chain_thread_pool`), so several LLM calls can still overlap in one process.
+    """
+    if has_native_async(chain):
+        return await chain.ainvoke(input, config)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_chain_thread_pool(), functools.partial(chain.invoke, input, config)
+    )
+
+
+async def abatch_chain(
+    chain: LCRunnable, inputs: list[typ.Any], config: typ.Optional[dict] = None
+) -> list[typ.Any]:
+    """Invoke the chain on a batch of inputs without blocking the event loop (see `ainvoke_chain`.)"""
+    if has_native_async(chain):
+        return await chain.abatch(inputs, config)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_chain_thread_pool(), functools.partial(chain.batch, inputs, config)
+    )
+
+
+async def astream_chain(
+    chain: LCRunnable, input: typ.Any, config: typ.Optional[dict] = None
+) -> typ.Any:
+    """Run the chain with `astream`, publishing output chunks on the current task's stream (if any) as they arrive,
+    and return the whole (consolidated) output.
+
+    If publishing a chunk fails, the rest of the output isn't published, but the chain still runs to completion.
+    """
+    stream = current_task_stream()
+    output = None
+    async for chunk in chain.astream(input, config):
+        output = chunk if output is None else output + chunk
+        if stream is not None:
+            # (e.g. message chunks when there's no output parser)
+            text = getattr(chunk, "content", chunk)
+            try:
+                await stream.write(text if isinstance(text, str) else str(text))
+            except Exception as e:
+                logger.warning(f"Failed to write to task stream `{stream.subject}`: {e!r}")
+                stream = None
+    return output
+
+
 def extract_tagged_strings(text: str, tagname: str) -> typ.List[str]:
     """Extracts strings from a string where the relevant is embedded between ```<tagname> and ``` tags.
 
@@ -7,23 +7,38 @@ import inspect
 from pydantic import BaseModel
 
 
-# TODO key deps by name, args, type etc instead of just callable name
 class Depends:
-    """Simple Dependency injection implementation similar to FastAPI."""
+    """Simple Dependency injection implementation similar to FastAPI.
 
-    _cache: dict[Callable, typ.Any] = {}
+    Resolved dependencies are cached per process by the dependency and its arguments, so e.g.
+    `Depends(kv_story_factory, bucket_name="a")` and `Depends(kv_story_factory, bucket_name="b")` resolve to
+    different values.
+    """
+
+    _cache: dict[typ.Hashable, typ.Any] = {}
 
     def __init__(self, dependency: Callable, *args: typ.Any, **kwargs: typ.Any):
         self.dependency = dependency
         self.args = args
         self.kwargs = kwargs
 
+    @property
+    def cache_key(self) -> typ.Hashable:
+        key = (self.dependency, self.args, tuple(sorted(self.kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            # (e.g. list arguments)
+            key = (self.dependency, repr(self.args), repr(sorted(self.kwargs.items())))
+        return key
+
     def __call__(self) -> typ.Any:
-        if self.dependency in Depends._cache:
-            return Depends._cache[self.dependency]
+        key = self.cache_key
+        if key in Depends._cache:
+            return Depends._cache[key]
 
         result = self.dependency(*self.args, **self.kwargs)
-        Depends._cache[self.dependency] = result
+        Depends._cache[key] = result
         return result
 
 
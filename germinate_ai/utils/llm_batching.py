@@ -0,0 +1,164 @@
+"""Micro-batching of concurrent LLM requests.
+
+`BatchingLLM` wraps a (pooled) LLM or chat model, and collects the async requests (`ainvoke`) made to it within a short
+window, e.g. by sibling tasks of a phase, into a single `abatch` call. LLMs (e.g. Ollama) then generate all the batch's
+prompts in one call, occupying a single slot of the model's concurrency limit (see `germinate_ai.utils.llm_pool`.)
+
+Sync and streaming requests aren't batched.
+"""
+
+import asyncio
+import threading
+import typing as typ
+
+import attr
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+@attr.define
+class BatchStats:
+    """Batch size counters of a model."""
+
+    batches: int = 0
+    requests: int = 0
+    largest: int = 0
+    full: int = 0
+    """Batches sent as soon as they reached the max batch size (instead of at the end of the window.)"""
+    _lock: threading.Lock = attr.field(factory=threading.Lock, repr=False, eq=False)
+
+    def record(self, size: int, full: bool = False):
+        with self._lock:
+            self.batches += 1
+            self.requests += size
+            self.largest = max(self.largest, size)
+            self.full += full
+
+    @property
+    def mean_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"batches={self.batches} requests={self.requests} "
+            f"mean_size={self.mean_size:.1f} largest={self.largest} full={self.full}"
+        )
+
+
+class _PendingBatch:
+    """Requests (with the same kwargs) collected during a batching window."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, kwargs: dict[str, typ.Any]):
+        self.loop = loop
+        self.kwargs = kwargs
+        self.inputs: list[typ.Any] = []
+        self.configs: list[typ.Optional[RunnableConfig]] = []
+        self.futures: list[asyncio.Future] = []
+        self.timer: typ.Optional[asyncio.TimerHandle] = None
+
+    def add(self, input: typ.Any, config: typ.Optional[RunnableConfig]) -> asyncio.Future:
+        future = self.loop.create_future()
+        self.inputs.append(input)
+        self.configs.append(config)
+        self.futures.append(future)
+        return future
+
+    def __len__(self) -> int:
+        return len(self.inputs)
+
+
+class BatchingLLM(Runnable):
+    """Wraps an LLM or chat model so that async requests made within `window` seconds of each other are sent as a
+    single batch of up to `max_size` requests."""
+
+    def __init__(
+        self,
+        llm: Runnable,
+        window: float,
+        max_size: int,
+        stats: typ.Optional[BatchStats] = None,
+    ):
+        self.llm = llm
+        self.window = window
+        self.max_size = max_size
+        self.stats = stats if stats is not None else BatchStats()
+        # Batches being collected, by the requests' kwargs (only requests with the same kwargs can be batched)
+        self._pending: dict[str, _PendingBatch] = {}
+        # (Keep references to the batches being sent so they aren't garbage collected)
+        self._sending: set[asyncio.Task] = set()
+
+    @property
+    def InputType(self) -> typ.Any:
+        return self.llm.InputType
+
+    @property
+    def OutputType(self) -> typ.Any:
+        return self.llm.OutputType
+
+    @property
+    def _identifying_params(self) -> dict[str, typ.Any]:
+        return getattr(self.llm, "_identifying_params", {})
+
+    def invoke(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.Any:
+        return self.llm.invoke(input, config, **kwargs)
+
+    async def ainvoke(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.Any:
+        loop = asyncio.get_running_loop()
+        key = repr(sorted(kwargs.items()))
+        batch = self._pending.get(key)
+        if batch is None or batch.loop is not loop:
+            batch = self._pending[key] = _PendingBatch(loop, kwargs)
+            batch.timer = loop.call_later(self.window, self._send, key, batch)
+        future = batch.add(input, config)
+        if len(batch) >= self.max_size:
+            batch.timer.cancel()
+            self._send(key, batch, full=True)
+        return await future
+
+    async def astream(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.AsyncIterator[typ.Any]:
+        async for chunk in self.llm.astream(input, config, **kwargs):
+            yield chunk
+
+    def _send(self, key: str, batch: _PendingBatch, full: bool = False):
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        task = batch.loop.create_task(self._asend(batch, full))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _asend(self, batch: _PendingBatch, full: bool):
+        # Drop the requests whose callers have given up (e.g. timed out tasks)
+        requests = [
+            (input, config, future)
+            for input, config, future in zip(batch.inputs, batch.configs, batch.futures)
+            if not future.done()
+        ]
+        if not requests:
+            return
+        inputs, configs, futures = zip(*requests)
+        self.stats.record(len(inputs), full=full)
+        try:
+            outputs = await self.llm.abatch(
+                list(inputs), list(configs), return_exceptions=True, **batch.kwargs
+            )
+        except Exception as e:
+            outputs = [e] * len(futures)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        for future, output in zip(futures, outputs):
+            if future.done():
+                continue
+            if isinstance(output, BaseException):
+                future.set_exception(output)
+            else:
+                future.set_result(output)
+
+    def __repr__(self) -> str:
+        return f"<BatchingLLM: {self.llm!r} (window={self.window}s max_size={self.max_size})>"
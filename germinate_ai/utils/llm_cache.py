@@ -0,0 +1,400 @@
+"""Caching of LLM responses, and deduplication of identical in-flight LLM requests.
+
+`CachedLLM` wraps a LangChain LLM or chat model (as returned by `get_llm`), and caches responses by the model's code
+and parameters, and the prompt. Responses are cached in memory (an LRU cache), and optionally persisted to an SQLite
+database so that they survive restarts (and are shared by worker processes on the same host.)
+
+Identical requests made while one is already in flight wait for its response instead of calling the provider again
+("single-flight"), whether they're made from threads or `asyncio` tasks.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import typing as typ
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+import attr
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig
+
+# Rough number of characters per token, to estimate the tokens saved by cache hits
+_CHARS_PER_TOKEN = 4
+
+
+@attr.define
+class LLMCacheStats:
+    """Cache hit/miss counters, and estimates of the tokens and time saved by hits."""
+
+    hits: int = 0
+    misses: int = 0
+    deduplicated: int = 0
+    """Requests that waited for an identical in-flight request instead of calling the provider."""
+    saved_tokens: int = 0
+    """Estimated (from the prompts' and responses' lengths.)"""
+    saved_seconds: float = 0.0
+    _lock: threading.Lock = attr.field(factory=threading.Lock, repr=False, eq=False)
+
+    def record_hit(self, tokens: int, seconds: float, deduplicated: bool = False):
+        with self._lock:
+            self.hits += 1
+            self.deduplicated += deduplicated
+            self.saved_tokens += tokens
+            self.saved_seconds += seconds
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"hits={self.hits} misses={self.misses} ({self.hit_ratio:.0%}) "
+            f"deduplicated={self.deduplicated} saved_tokens~{self.saved_tokens} "
+            f"saved={self.saved_seconds:.1f}s"
+        )
+
+
+class LLMCacheBackend(ABC):
+    """Stores serialized LLM responses by key."""
+
+    @abstractmethod
+    def lookup(self, key: str) -> typ.Optional[str]:
+        pass
+
+    @abstractmethod
+    def update(self, key: str, value: str):
+        pass
+
+
+class InMemoryLLMCache(LLMCacheBackend):
+    """In-process cache of up to `max_size` responses, evicting the least recently used."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str) -> typ.Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def update(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteLLMCache(LLMCacheBackend):
+    """Responses persisted in an SQLite database at `path`."""
+
+    def __init__(self, path: str | Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def lookup(self, key: str) -> typ.Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def update(self, key: str, value: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class LLMCache:
+    """Two-level response cache: `memory` in front of an optional `persistent` backend, with in-flight request
+    tracking for single-flight."""
+
+    def __init__(
+        self,
+        memory: InMemoryLLMCache = None,
+        persistent: typ.Optional[LLMCacheBackend] = None,
+    ):
+        if memory is None:
+            memory = InMemoryLLMCache()
+        self.memory = memory
+        self.persistent = persistent
+        self.stats = LLMCacheStats()
+        # key -> Future of the serialized response, for requests in flight
+        self._in_flight: dict[str, Future] = {}
+        # key -> seconds the provider took to respond (to estimate time saved by hits)
+        self._latencies: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str) -> typ.Optional[str]:
+        value = self.memory.lookup(key)
+        if value is None and self.persistent is not None:
+            value = self.persistent.lookup(key)
+            if value is not None:
+                self.memory.update(key, value)
+        return value
+
+    async def alookup(self, key: str) -> typ.Optional[str]:
+        """Like `lookup`, but without blocking the event loop on the persistent backend."""
+        value = self.memory.lookup(key)
+        if value is None and self.persistent is not None:
+            value = await asyncio.to_thread(self.persistent.lookup, key)
+            if value is not None:
+                self.memory.update(key, value)
+        return value
+
+    def update(self, key: str, value: str):
+        self.memory.update(key, value)
+        if self.persistent is not None:
+            self.persistent.update(key, value)
+
+    def begin(self, key: str) -> tuple[Future, bool]:
+        """Get the future of the in-flight request for `key`, and whether the caller should make the request itself
+        (i.e. no identical request is in flight.)
+
+        The future is already done if the response was cached since the caller looked it up.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future, False
+            # (The previous leader may have finished since the caller's lookup: leaders cache their response before
+            # they're no longer in flight)
+            value = self.memory.lookup(key)
+            future = Future()
+            if value is not None:
+                future.set_result(value)
+                return future, False
+            self._in_flight[key] = future
+            return future, True
+
+    def _complete(
+        self,
+        key: str,
+        future: Future,
+        value: str = None,
+        latency: float = None,
+        exc: BaseException = None,
+    ):
+        """Cache the response in memory (unless the request failed), and resolve the in-flight request's future."""
+        if exc is None:
+            self.memory.update(key, value)
+        with self._lock:
+            if exc is None:
+                self._latencies[key] = latency
+                # (Forget the oldest latencies along with evicted responses)
+                while len(self._latencies) > self.memory.max_size:
+                    del self._latencies[next(iter(self._latencies))]
+            del self._in_flight[key]
+        if exc is None:
+            future.set_result(value)
+        else:
+            future.set_exception(exc)
+
+    def finish(
+        self,
+        key: str,
+        future: Future,
+        value: str = None,
+        latency: float = None,
+        exc: BaseException = None,
+    ):
+        """Complete the in-flight request for `key` (caching its response unless it failed.)"""
+        self._complete(key, future, value, latency, exc)
+        if exc is None and self.persistent is not None:
+            self.persistent.update(key, value)
+
+    async def afinish(
+        self,
+        key: str,
+        future: Future,
+        value: str = None,
+        latency: float = None,
+        exc: BaseException = None,
+    ):
+        """Like `finish`, but without blocking the event loop on the persistent backend."""
+        self._complete(key, future, value, latency, exc)
+        if exc is None and self.persistent is not None:
+            await asyncio.to_thread(self.persistent.update, key, value)
+
+    def record_hit(self, key: str, prompt: str, value: str, deduplicated: bool = False):
+        tokens = (len(prompt) + len(value)) // _CHARS_PER_TOKEN
+        self.stats.record_hit(
+            tokens, self._latencies.get(key, 0.0), deduplicated=deduplicated
+        )
+
+
+def dumps_response(response: typ.Any) -> str:
+    """Serialize a model's response (a message for chat models, or a string.)"""
+    if isinstance(response, BaseMessage):
+        return json.dumps({"message": message_to_dict(response)})
+    return json.dumps({"text": response})
+
+
+def loads_response(value: str) -> typ.Any:
+    data = json.loads(value)
+    if "message" in data:
+        (message,) = messages_from_dict([data["message"]])
+        return message
+    return data["text"]
+
+
+def prompt_text(input: typ.Any) -> str:
+    """Canonical text of a model input (prompt value, string or messages.)"""
+    if isinstance(input, PromptValue):
+        return json.dumps([message_to_dict(m) for m in input.to_messages()])
+    if isinstance(input, str):
+        return input
+    return json.dumps(
+        [message_to_dict(m) if isinstance(m, BaseMessage) else m for m in input],
+        default=str,
+    )
+
+
+class CachedLLM(Runnable):
+    """Wraps an LLM or chat model (`llm`) so its responses are cached in `cache`, and identical concurrent requests
+    result in a single call."""
+
+    def __init__(self, llm: Runnable, llm_code: str, cache: LLMCache):
+        self.llm = llm
+        self.llm_code = llm_code
+        self.cache = cache
+        params = getattr(llm, "_identifying_params", {})
+        self._llm_string = f"{llm_code}:{sorted(params.items())}"
+
+    @property
+    def InputType(self) -> typ.Any:
+        return self.llm.InputType
+
+    @property
+    def OutputType(self) -> typ.Any:
+        return self.llm.OutputType
+
+    def cache_key(self, prompt: str, **kwargs: typ.Any) -> str:
+        data = json.dumps([self._llm_string, prompt, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def invoke(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.Any:
+        prompt = prompt_text(input)
+        key = self.cache_key(prompt, **kwargs)
+        value = self.cache.lookup(key)
+        if value is not None:
+            self.cache.record_hit(key, prompt, value)
+            return loads_response(value)
+
+        future, leader = self.cache.begin(key)
+        if not leader:
+            deduplicated = not future.done()
+            value = future.result()
+            self.cache.record_hit(key, prompt, value, deduplicated=deduplicated)
+            return loads_response(value)
+
+        self.cache.stats.record_miss()
+        started_at = time.monotonic()
+        try:
+            response = self.llm.invoke(input, config, **kwargs)
+        except BaseException as e:
+            self.cache.finish(key, future, exc=e)
+            raise
+        value = dumps_response(response)
+        self.cache.finish(key, future, value, latency=time.monotonic() - started_at)
+        return response
+
+    async def ainvoke(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.Any:
+        prompt = prompt_text(input)
+        key = self.cache_key(prompt, **kwargs)
+        value = await self.cache.alookup(key)
+        if value is not None:
+            self.cache.record_hit(key, prompt, value)
+            return loads_response(value)
+
+        future, leader = self.cache.begin(key)
+        if not leader:
+            deduplicated = not future.done()
+            value = await asyncio.wrap_future(future)
+            self.cache.record_hit(key, prompt, value, deduplicated=deduplicated)
+            return loads_response(value)
+
+        self.cache.stats.record_miss()
+        started_at = time.monotonic()
+        try:
+            response = await self.llm.ainvoke(input, config, **kwargs)
+        except BaseException as e:
+            await self.cache.afinish(key, future, exc=e)
+            raise
+        value = dumps_response(response)
+        await self.cache.afinish(key, future, value, latency=time.monotonic() - started_at)
+        return response
+
+    async def astream(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.AsyncIterator[typ.Any]:
+        """Stream the response from the model, or yield the whole response at once if it's cached (or an identical
+        request is in flight.)"""
+        prompt = prompt_text(input)
+        key = self.cache_key(prompt, **kwargs)
+        value = await self.cache.alookup(key)
+        if value is not None:
+            self.cache.record_hit(key, prompt, value)
+            yield loads_response(value)
+            return
+
+        future, leader = self.cache.begin(key)
+        if not leader:
+            deduplicated = not future.done()
+            value = await asyncio.wrap_future(future)
+            self.cache.record_hit(key, prompt, value, deduplicated=deduplicated)
+            yield loads_response(value)
+            return
+
+        self.cache.stats.record_miss()
+        started_at = time.monotonic()
+        response = None
+        try:
+            async for chunk in self.llm.astream(input, config, **kwargs):
+                response = chunk if response is None else response + chunk
+                yield chunk
+        except BaseException as e:
+            await self.cache.afinish(key, future, exc=e)
+            raise
+        await self.cache.afinish(
+            key, future, dumps_response(response), latency=time.monotonic() - started_at
+        )
+
+    def __repr__(self) -> str:
+        return f"<CachedLLM: {self.llm_code}>"
@@ -0,0 +1,373 @@
+"""Process-wide pool of LLM clients, with per-model concurrency limits.
+
+LLM clients (and their HTTP sessions or gRPC channels) are created once per process for each provider, model and
+set of parameters, and reused by all tasks. Requests to each model are limited to a number of concurrent requests
+(shared by all its clients), whether they're made from threads or `asyncio` tasks.
+
+With `adaptive` limits, each model's limit is adjusted to the provider's feedback (see `AIMDController`.)
+"""
+
+import asyncio
+import contextlib
+import threading
+import time
+import typing as typ
+from collections import deque
+from concurrent.futures import Future
+
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from .llm_rate_limit import is_rate_limit_error
+
+ClientKey = tuple[str, str, tuple]
+
+
+class ConcurrencyLimiter:
+    """Semaphore that can be acquired both from threads (`acquire`) and `asyncio` tasks (`aacquire`), in FIFO order."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._waiters: deque[Future] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _try_acquire(self) -> typ.Optional[Future]:
+        """Acquire if possible and return `None`, or else return a future that's resolved once acquired."""
+        with self._lock:
+            if self.in_use < self.limit and not self._waiters:
+                self.in_use += 1
+                return None
+            waiter = Future()
+            self._waiters.append(waiter)
+            return waiter
+
+    def acquire(self):
+        waiter = self._try_acquire()
+        if waiter is not None:
+            waiter.result()
+
+    async def aacquire(self):
+        waiter = self._try_acquire()
+        if waiter is None:
+            return
+        try:
+            await asyncio.wrap_future(waiter)
+        except asyncio.CancelledError:
+            # Don't leak a slot handed over just as the waiting task was cancelled
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            # (Unless the limit was lowered below the slots in use)
+            if self.in_use <= self.limit:
+                while self._waiters:
+                    waiter = self._waiters.popleft()
+                    # Hand the slot over to the next (non cancelled) waiter
+                    if waiter.set_running_or_notify_cancel():
+                        waiter.set_result(None)
+                        return
+            self.in_use -= 1
+
+    def set_limit(self, limit: int):
+        """Change the limit, letting waiters in right away if it's raised."""
+        with self._lock:
+            self.limit = limit
+            while self.in_use < self.limit and self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    self.in_use += 1
+                    waiter.set_result(None)
+
+    def __str__(self) -> str:
+        return f"in_use={self.in_use}/{self.limit} waiting={self.waiting}"
+
+
+# Weight of new latencies in their moving average
+_LATENCY_EWMA_WEIGHT = 0.2
+# Rate at which the baseline latency follows the moving average when it's higher
+_BASELINE_DRIFT = 0.01
+# Min seconds between decreases of the limit (when there's no latency to go by yet)
+_MIN_DECREASE_INTERVAL = 1.0
+
+
+class AIMDController:
+    """Adjusts a limiter's limit between `min_limit` and `max_limit` (additive increase, multiplicative decrease.)
+
+    While requests succeed, the limit is raised by one for every `limit` requests. It's multiplied by
+    `decrease_factor` when a request is rate limited, but at most once per round trip, since requests in flight
+    together fail together.
+
+    With a `latency_tolerance`, it's also decreased when the (moving average of) latency rises above that multiple of
+    its baseline (the lowest latency seen recently.) Latency grows with the size of the output though, so only use it
+    when requests generate similarly sized outputs: otherwise a long generation after short ones looks like overload.
+    """
+
+    def __init__(
+        self,
+        limiter: ConcurrencyLimiter,
+        min_limit: int = 1,
+        max_limit: typ.Optional[int] = None,
+        decrease_factor: float = 0.5,
+        latency_tolerance: typ.Optional[float] = None,
+    ):
+        self.limiter = limiter
+        self.min_limit = min_limit
+        self.max_limit = max_limit if max_limit is not None else limiter.limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.latency: typ.Optional[float] = None
+        self.baseline: typ.Optional[float] = None
+        self.increases = 0
+        self.decreases = 0
+        self._credit = 0.0
+        self._decreased_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: float):
+        with self._lock:
+            if self.latency is None:
+                self.latency = self.baseline = latency
+            else:
+                self.latency += _LATENCY_EWMA_WEIGHT * (latency - self.latency)
+                self.baseline = min(
+                    self.latency,
+                    self.baseline + _BASELINE_DRIFT * (self.latency - self.baseline),
+                )
+            if (
+                self.latency_tolerance is not None
+                and self.latency > self.baseline * self.latency_tolerance
+            ):
+                self._decrease()
+                return
+            limit = self.limiter.limit
+            if limit >= self.max_limit:
+                return
+            self._credit += 1 / limit
+            if self._credit >= 1:
+                self._credit = 0.0
+                self.increases += 1
+                self.limiter.set_limit(limit + 1)
+
+    def record_error(self, e: BaseException):
+        if not is_rate_limit_error(e):
+            return
+        with self._lock:
+            self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._decreased_at < max(self.latency or 0, _MIN_DECREASE_INTERVAL):
+            return
+        self._decreased_at = now
+        self._credit = 0.0
+        limit = max(self.min_limit, int(self.limiter.limit * self.decrease_factor))
+        if limit < self.limiter.limit:
+            self.decreases += 1
+            self.limiter.set_limit(limit)
+
+    def __str__(self) -> str:
+        latency = f"{self.latency:.2f}s" if self.latency is not None else "-"
+        return f"latency={latency} increases={self.increases} decreases={self.decreases}"
+
+
+class ConcurrencyLimitedLLM(Runnable):
+    """Wraps an LLM or chat model so that at most `limiter.limit` requests to it are in flight at once.
+
+    Requests' latencies and errors are reported to `controller` (if any) to adjust the limit.
+    """
+
+    def __init__(
+        self,
+        llm: Runnable,
+        limiter: ConcurrencyLimiter,
+        controller: typ.Optional[AIMDController] = None,
+    ):
+        self.llm = llm
+        self.limiter = limiter
+        self.controller = controller
+
+    @property
+    def InputType(self) -> typ.Any:
+        return self.llm.InputType
+
+    @property
+    def OutputType(self) -> typ.Any:
+        return self.llm.OutputType
+
+    @property
+    def _identifying_params(self) -> dict[str, typ.Any]:
+        return getattr(self.llm, "_identifying_params", {})
+
+    @contextlib.contextmanager
+    def _feedback(self):
+        """Report the latency or error of the request made within the context to the controller."""
+        started_at = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if self.controller is not None:
+                self.controller.record_error(e)
+            raise
+        if self.controller is not None:
+            self.controller.record_success(time.monotonic() - started_at)
+
+    def invoke(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.Any:
+        self.limiter.acquire()
+        try:
+            with self._feedback():
+                return self.llm.invoke(input, config, **kwargs)
+        finally:
+            self.limiter.release()
+
+    async def ainvoke(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.Any:
+        await self.limiter.aacquire()
+        try:
+            with self._feedback():
+                return await self.llm.ainvoke(input, config, **kwargs)
+        finally:
+            self.limiter.release()
+
+    async def abatch(
+        self,
+        inputs: list[typ.Any],
+        config: RunnableConfig | list[RunnableConfig] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: typ.Any,
+    ) -> list[typ.Any]:
+        if not isinstance(self.llm, BaseLLM):
+            # (Chat models make a request per input, each limited by `ainvoke`)
+            return await super().abatch(
+                inputs, config, return_exceptions=return_exceptions, **kwargs
+            )
+        # LLMs generate a batch's prompts in a single call
+        await self.limiter.aacquire()
+        try:
+            with self._feedback():
+                outputs = await self.llm.abatch(
+                    inputs, config, return_exceptions=return_exceptions, **kwargs
+                )
+        finally:
+            self.limiter.release()
+        if self.controller is not None:
+            for output in outputs:
+                if isinstance(output, Exception):
+                    self.controller.record_error(output)
+        return outputs
+
+    async def astream(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.AsyncIterator[typ.Any]:
+        await self.limiter.aacquire()
+        try:
+            with self._feedback():
+                async for chunk in self.llm.astream(input, config, **kwargs):
+                    yield chunk
+        finally:
+            self.limiter.release()
+
+    def __repr__(self) -> str:
+        return f"<ConcurrencyLimitedLLM: {self.llm!r} ({self.limiter})>"
+
+
+class LLMClientPool:
+    """Clients keyed by (provider, model, params), and a concurrency limiter per (provider, model).
+
+    With `adaptive` limits, each model's limit starts at its max and is adjusted between `min_limit` and its max.
+    """
+
+    def __init__(
+        self,
+        default_limit: int = 8,
+        limits: dict[str, int] = None,
+        adaptive: bool = False,
+        min_limit: int = 1,
+        latency_tolerance: typ.Optional[float] = None,
+    ):
+        self.default_limit = default_limit
+        # (Limits are keyed by LLM code, e.g. "google:gemini-pro")
+        self.limits = limits or {}
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.latency_tolerance = latency_tolerance
+        self._clients: dict[ClientKey, Runnable] = {}
+        self._limiters: dict[tuple[str, str], ConcurrencyLimiter] = {}
+        self._controllers: dict[tuple[str, str], AIMDController] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def client_key(provider: str, model: str, params: dict[str, typ.Any]) -> ClientKey:
+        return (provider, model, tuple(sorted((k, repr(v)) for k, v in params.items())))
+
+    def limiter(self, provider: str, model: str) -> ConcurrencyLimiter:
+        with self._lock:
+            if (provider, model) not in self._limiters:
+                limit = self.limits.get(f"{provider}:{model}", self.default_limit)
+                limiter = ConcurrencyLimiter(limit)
+                self._limiters[(provider, model)] = limiter
+                if self.adaptive:
+                    self._controllers[(provider, model)] = AIMDController(
+                        limiter,
+                        min_limit=min(self.min_limit, limit),
+                        latency_tolerance=self.latency_tolerance,
+                    )
+            return self._limiters[(provider, model)]
+
+    def controller(self, provider: str, model: str) -> typ.Optional[AIMDController]:
+        with self._lock:
+            self.limiter(provider, model)
+            return self._controllers.get((provider, model))
+
+    def get(
+        self,
+        provider: str,
+        model: str,
+        params: dict[str, typ.Any],
+        create: typ.Callable[[], Runnable],
+        wrap: typ.Optional[typ.Callable[[Runnable], Runnable]] = None,
+    ) -> Runnable:
+        """Get the pooled client for the provider, model and params, creating it with `create` if there's none.
+
+        New clients are wrapped with `wrap` (if any) after limiting their concurrency, e.g. to batch requests.
+        """
+        key = self.client_key(provider, model, params)
+        with self._lock:
+            if key not in self._clients:
+                client = ConcurrencyLimitedLLM(
+                    create(),
+                    self.limiter(provider, model),
+                    self.controller(provider, model),
+                )
+                self._clients[key] = wrap(client) if wrap is not None else client
+            return self._clients[key]
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._limiters.clear()
+            self._controllers.clear()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def __str__(self) -> str:
+        limiters = []
+        for (provider, model), limiter in self._limiters.items():
+            controller = self._controllers.get((provider, model))
+            limiters.append(
+                f"{provider}:{model} {limiter}"
+                + (f" {controller}" if controller is not None else "")
+            )
+        limiters = ", ".join(limiters)
+        return f"clients={len(self)} [{limiters}]"
@@ -0,0 +1,402 @@
+"""Rate limiting of LLM requests, and retries of rate limited requests.
+
+Requests to an LLM (by LLM code) are limited to a number per second by a token bucket. Once connected to NATS (see
+`LLMRateLimits.connect`), the bucket is shared by all worker processes and nodes: it's stored in a NATS KV entry, and
+updated atomically (compare-and-set on the entry's revision.) If NATS can't be reached, each process falls back to a
+local bucket, limited to a share of the rate (since every process has its own.)
+
+Requests reserve their tokens up front, and wait until the tokens would have been available, so requests are spread
+evenly over time instead of retrying together whenever tokens become available.
+
+`RateLimitedLLM` also retries requests that the provider rejected because of its rate limits (e.g. HTTP 429), with
+exponential backoff.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import typing as typ
+
+import attr
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import get_config_list
+from loguru import logger
+from nats.errors import Error as NatsError
+from nats.js.errors import KeyNotFoundError, KeyWrongLastSequenceError
+from nats.js.kv import KeyValue
+
+# Names of exceptions raised by LLM clients when rate limited (or overloaded)
+_RATE_LIMIT_ERRORS = (
+    "ResourceExhausted",  # Google (HTTP 429)
+    "TooManyRequests",
+    "RateLimitError",
+    "ServiceUnavailable",
+)
+_RATE_LIMIT_STATUS_CODES = (429, 503)
+# (e.g. Ollama's "Ollama call failed with status code 429.")
+_RATE_LIMIT_STATUS = re.compile(r"status code (429|503)\b")
+
+
+def is_rate_limit_error(e: BaseException) -> bool:
+    """Was the request rejected because of the provider's rate limits (or because it's overloaded)?"""
+    if type(e).__name__ in _RATE_LIMIT_ERRORS:
+        return True
+    code = getattr(e, "status_code", None) or getattr(e, "code", None)
+    if code in _RATE_LIMIT_STATUS_CODES:
+        return True
+    return bool(_RATE_LIMIT_STATUS.search(str(e)))
+
+
+def retry_delay(attempt: int, backoff: float, max_backoff: float = 60) -> float:
+    """Exponential backoff (with jitter) before retry number `attempt` (from 0.)"""
+    delay = min(max_backoff, backoff * 2**attempt)
+    return delay * random.uniform(0.5, 1)
+
+
+@attr.define
+class BucketState:
+    """Tokens in a bucket as of `updated` (a timestamp.)"""
+
+    tokens: float
+    updated: float
+
+    def reserve(self, tokens: float, now: float, rate: float, capacity: float) -> float:
+        """Take tokens from the bucket (refilled at `rate` tokens per second since last updated), and return the
+        seconds to wait until they'd have been available."""
+        # (Timestamps from other nodes' clocks can be ahead of ours)
+        now = max(now, self.updated)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        self.tokens -= tokens
+        return max(0.0, -self.tokens / rate)
+
+
+class TokenBucket:
+    """Local (per process) token bucket of `capacity` tokens refilled at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._state = BucketState(tokens=capacity, updated=time.monotonic())
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        with self._lock:
+            return self._state.reserve(
+                tokens, time.monotonic(), self.rate, self.capacity
+            )
+
+
+# Seconds before retrying to update the shared bucket after another process updated it (doubled for each further
+# conflict, up to `_MAX_CONFLICT_BACKOFF`, with jitter)
+_CONFLICT_BACKOFF = 0.005
+_MAX_CONFLICT_BACKOFF = 0.1
+
+
+@attr.define
+class RateLimiterStats:
+    requests: int = 0
+    waited_seconds: float = 0.0
+    fallbacks: int = 0
+    """Requests limited by the local bucket because the shared bucket couldn't be used."""
+    conflicts: int = 0
+    """Updates of the shared bucket retried because another process updated it concurrently."""
+
+    def __str__(self) -> str:
+        return (
+            f"requests={self.requests} waited={self.waited_seconds:.1f}s fallbacks={self.fallbacks} "
+            f"conflicts={self.conflicts}"
+        )
+
+
+class RateLimiter:
+    """Token bucket rate limiter of an LLM, shared through a NATS KV entry once connected, or else local.
+
+    The local bucket only allows `fallback_share` of the rate, since every process falls back to its own bucket when
+    the shared one can't be reached.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        rate: float,
+        capacity: float,
+        timeout: float = 1,
+        fallback_share: float = 1,
+    ):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        # Max seconds to wait for NATS (or for other processes' concurrent updates) before falling back to the local
+        # bucket
+        self.timeout = timeout
+        self.local = TokenBucket(
+            rate * fallback_share, max(1.0, capacity * fallback_share)
+        )
+        self.stats = RateLimiterStats()
+        self._kv: typ.Optional[KeyValue] = None
+        self._loop: typ.Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def is_shared(self) -> bool:
+        return self._kv is not None
+
+    def connect(self, kv: KeyValue, loop: asyncio.AbstractEventLoop):
+        """Share the bucket through the KV store (with requests made from threads reserving via `loop`.)"""
+        self._kv = kv
+        self._loop = loop
+
+    async def _kv_reserve(self, tokens: float) -> float:
+        """Reserve tokens from the shared bucket, retrying (until cancelled) whenever another process updated it
+        concurrently."""
+        for attempt in itertools.count():
+            try:
+                entry = await self._kv.get(self.key)
+                revision = entry.revision
+                state = BucketState(**json.loads(entry.value))
+            except KeyNotFoundError:
+                revision = None
+                state = BucketState(tokens=self.capacity, updated=time.time())
+            wait = state.reserve(tokens, time.time(), self.rate, self.capacity)
+            value = json.dumps(attr.asdict(state)).encode()
+            try:
+                if revision is None:
+                    await self._kv.create(self.key, value)
+                else:
+                    await self._kv.update(self.key, value, last=revision)
+                return wait
+            except KeyWrongLastSequenceError:
+                # Another process updated the bucket since we read it
+                self.stats.conflicts += 1
+                backoff = min(_MAX_CONFLICT_BACKOFF, _CONFLICT_BACKOFF * 2**attempt)
+                await asyncio.sleep(random.uniform(0, backoff))
+
+    async def _areserve(self, tokens: float) -> float:
+        if self._kv is None:
+            return self.local.reserve(tokens)
+        try:
+            return await asyncio.wait_for(self._kv_reserve(tokens), self.timeout)
+        except (NatsError, asyncio.TimeoutError) as e:
+            if not self.stats.fallbacks:
+                logger.warning(
+                    f"Rate limiter `{self.key}`: shared bucket unavailable, using local bucket ({e!r})"
+                )
+            self.stats.fallbacks += 1
+            return self.local.reserve(tokens)
+
+    def _record(self, wait: float):
+        self.stats.requests += 1
+        self.stats.waited_seconds += wait
+
+    async def aacquire(self, tokens: float = 1):
+        """Wait until the tokens are available."""
+        wait = await self._areserve(tokens)
+        self._record(wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire(self, tokens: float = 1):
+        """Wait (blocking the thread) until the tokens are available."""
+        if self._kv is not None and not _in_event_loop():
+            future = asyncio.run_coroutine_threadsafe(
+                self._areserve(tokens), self._loop
+            )
+            wait = future.result()
+        else:
+            wait = self.local.reserve(tokens)
+        self._record(wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    def __str__(self) -> str:
+        return f"{self.rate}/s {'shared' if self.is_shared else 'local'} {self.stats}"
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class LLMRateLimits:
+    """Rate limiters of the LLMs that have a rate limit (in requests per second), by LLM code.
+
+    Buckets hold up to `burst` seconds' worth of requests, that can be made at once after being idle. While the shared
+    buckets can't be reached, each process is limited to `fallback_share` of the rates.
+    """
+
+    def __init__(
+        self,
+        rates: dict[str, float] = None,
+        burst: float = 1,
+        fallback_share: float = 1,
+    ):
+        self.rates = rates or {}
+        self.burst = burst
+        self.fallback_share = fallback_share
+        self._limiters: dict[str, RateLimiter] = {}
+        self._kv: typ.Optional[KeyValue] = None
+        self._loop: typ.Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def bucket_key(llm_code: str) -> str:
+        # (KV keys can't contain ':')
+        return re.sub(r"[^-/_=.a-zA-Z0-9]", "_", llm_code)
+
+    def limiter(self, llm_code: str) -> typ.Optional[RateLimiter]:
+        rate = self.rates.get(llm_code)
+        if not rate:
+            return None
+        with self._lock:
+            if llm_code not in self._limiters:
+                limiter = RateLimiter(
+                    self.bucket_key(llm_code),
+                    rate,
+                    capacity=max(1.0, rate * self.burst),
+                    fallback_share=self.fallback_share,
+                )
+                if self._kv is not None:
+                    limiter.connect(self._kv, self._loop)
+                self._limiters[llm_code] = limiter
+            return self._limiters[llm_code]
+
+    async def connect(self, kv: KeyValue):
+        """Share the buckets with all processes through the KV store."""
+        with self._lock:
+            self._kv = kv
+            self._loop = asyncio.get_running_loop()
+            for limiter in self._limiters.values():
+                limiter.connect(self._kv, self._loop)
+
+    def __str__(self) -> str:
+        return ", ".join(
+            f"{llm_code} {limiter}" for llm_code, limiter in self._limiters.items()
+        )
+
+
+class RateLimitedLLM(Runnable):
+    """Wraps an LLM or chat model so its requests are rate limited by `rate_limiter` (if any), and rate limited
+    requests are retried up to `max_retries` times."""
+
+    def __init__(
+        self,
+        llm: Runnable,
+        rate_limiter: typ.Optional[RateLimiter] = None,
+        max_retries: int = 5,
+        backoff: float = 1,
+    ):
+        self.llm = llm
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    @property
+    def InputType(self) -> typ.Any:
+        return self.llm.InputType
+
+    @property
+    def OutputType(self) -> typ.Any:
+        return self.llm.OutputType
+
+    @property
+    def _identifying_params(self) -> dict[str, typ.Any]:
+        return getattr(self.llm, "_identifying_params", {})
+
+    def _should_retry(self, e: BaseException, attempt: int) -> bool:
+        if attempt >= self.max_retries or not is_rate_limit_error(e):
+            return False
+        logger.warning(
+            f"Rate limited by LLM provider (retry {attempt + 1}/{self.max_retries}): {e!r}"
+        )
+        return True
+
+    def invoke(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.Any:
+        for attempt in itertools.count():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                return self.llm.invoke(input, config, **kwargs)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            time.sleep(retry_delay(attempt, self.backoff))
+
+    async def ainvoke(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.Any:
+        for attempt in itertools.count():
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire()
+            try:
+                return await self.llm.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            await asyncio.sleep(retry_delay(attempt, self.backoff))
+
+    async def abatch(
+        self,
+        inputs: list[typ.Any],
+        config: RunnableConfig | list[RunnableConfig] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: typ.Any,
+    ) -> list[typ.Any]:
+        """Run the batch, retrying only the requests that were rate limited."""
+        configs = get_config_list(config, len(inputs))
+        outputs: list[typ.Any] = [None] * len(inputs)
+        pending = list(range(len(inputs)))
+        for attempt in itertools.count():
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire(len(pending))
+            results = await self.llm.abatch(
+                [inputs[i] for i in pending],
+                [configs[i] for i in pending],
+                return_exceptions=True,
+                **kwargs,
+            )
+            retry = []
+            for i, result in zip(pending, results):
+                outputs[i] = result
+                if isinstance(result, Exception) and is_rate_limit_error(result):
+                    retry.append(i)
+            if not retry or not self._should_retry(outputs[retry[0]], attempt):
+                break
+            pending = retry
+            await asyncio.sleep(retry_delay(attempt, self.backoff))
+
+        if not return_exceptions:
+            for output in outputs:
+                if isinstance(output, Exception):
+                    raise output
+        return outputs
+
+    async def astream(
+        self, input: typ.Any, config: RunnableConfig = None, **kwargs: typ.Any
+    ) -> typ.AsyncIterator[typ.Any]:
+        for attempt in itertools.count():
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire()
+            streamed = False
+            try:
+                async for chunk in self.llm.astream(input, config, **kwargs):
+                    streamed = True
+                    yield chunk
+                return
+            except Exception as e:
+                # (Can't retry once part of the output was streamed)
+                if streamed or not self._should_retry(e, attempt):
+                    raise
+            await asyncio.sleep(retry_delay(attempt, self.backoff))
+
+    def __repr__(self) -> str:
+        return f"<RateLimitedLLM: {self.llm!r}>"
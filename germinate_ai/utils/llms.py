@@ -1,40 +1,142 @@
+import functools
+import typing as typ
 
 from germinate_ai.config import settings
 
-GOOGLE_API_KEY = settings.google_ai_api_key
+if typ.TYPE_CHECKING:
+    from .llm_batching import BatchStats
+    from .llm_cache import LLMCache
+    from .llm_pool import LLMClientPool
+    from .llm_rate_limit import LLMRateLimits
 
 
-def get_ollama_llm(llm_code: str):
+def get_ollama_llm(llm_code: str, **params: typ.Any):
     """Get an Ollama LLM."""
     from langchain_community.llms import Ollama
 
-    llm = Ollama(model=llm_code)
+    llm = Ollama(model=llm_code, **params)
     return llm
 
 
-def get_google_llm(llm_code: str):
+def get_google_llm(llm_code: str, **params: typ.Any):
     """Get Google Generative AI chat model."""
     from langchain_google_genai import ChatGoogleGenerativeAI
 
-    llm = ChatGoogleGenerativeAI(model=llm_code, google_api_key=GOOGLE_API_KEY)
+    llm = ChatGoogleGenerativeAI(
+        model=llm_code, google_api_key=settings.google_ai_api_key, **params
+    )
     return llm
 
 
+@functools.cache
+def get_llm_pool() -> "LLMClientPool":
+    """Get the process-wide LLM client pool."""
+    from .llm_pool import LLMClientPool
+
+    return LLMClientPool(
+        default_limit=settings.llm_max_concurrency,
+        limits=settings.llm_concurrency_limits,
+        adaptive=settings.llm_adaptive_concurrency,
+        min_limit=settings.llm_min_concurrency,
+        latency_tolerance=settings.llm_latency_tolerance or None,
+    )
+
+
+@functools.cache
+def get_llm_rate_limits() -> "LLMRateLimits":
+    """Get the process-wide LLM rate limiters (shared with other processes once connected to NATS.)"""
+    from .llm_rate_limit import LLMRateLimits
+
+    return LLMRateLimits(
+        rates=settings.llm_rate_limits,
+        burst=settings.llm_rate_limit_burst,
+        fallback_share=settings.llm_rate_limit_fallback_share,
+    )
+
+
+@functools.cache
+def get_llm_batch_stats() -> dict[str, "BatchStats"]:
+    """Get the process-wide batch size counters, by LLM code."""
+    return {}
+
+
+def _client_wrapper(llm_code: str) -> typ.Callable:
+    """Get a function that wraps pooled clients of the LLM to rate limit (and retry) their requests, and to batch
+    them if batching is enabled."""
+    from .llm_batching import BatchingLLM, BatchStats
+    from .llm_rate_limit import RateLimitedLLM
+
+    rate_limiter = get_llm_rate_limits().limiter(llm_code)
+    window = settings.llm_batch_windows.get(llm_code, settings.llm_batch_window)
+    max_size = settings.llm_batch_max_sizes.get(llm_code, settings.llm_batch_max_size)
+
+    def wrap(llm):
+        llm = RateLimitedLLM(
+            llm,
+            rate_limiter=rate_limiter,
+            max_retries=settings.llm_rate_limit_retries,
+            backoff=settings.llm_rate_limit_backoff,
+        )
+        if window > 0:
+            stats = get_llm_batch_stats().setdefault(llm_code, BatchStats())
+            llm = BatchingLLM(llm, window=window, max_size=max_size, stats=stats)
+        return llm
+
+    return wrap
+
+
+@functools.cache
+def get_llm_cache() -> typ.Optional["LLMCache"]:
+    """Get the process-wide LLM response cache configured in settings, or `None` if caching is disabled."""
+    from .llm_cache import InMemoryLLMCache, LLMCache, SQLiteLLMCache
+
+    if settings.llm_cache == "none":
+        return None
+    persistent = None
+    if settings.llm_cache == "sqlite":
+        persistent = SQLiteLLMCache(settings.llm_cache_path)
+    return LLMCache(
+        memory=InMemoryLLMCache(max_size=settings.llm_cache_max_size),
+        persistent=persistent,
+    )
+
+
 DEFAULT_LLM = "google:gemini-pro"
 
-def get_llm(llm_code: str = None):
+def get_llm(llm_code: str = None, cache: bool = True, **params: typ.Any):
     """Get an LLM by code.
     
     E.g.
         - "ollama:gemma:7b": "gemma:7b" via Ollama
         - "google:gemini-pro": "gemini-pro" via Google Generative AI
+
+    Any `params` (e.g. `temperature`) are passed to the LLM client. Clients are pooled per process by provider, model
+    and params, and concurrent requests to each model are limited (see `get_llm_pool`.) Requests can also be rate
+    limited (see `get_llm_rate_limits`), and concurrent async requests batched (see `settings.llm_batch_window`.)
+
+    Responses are cached (see `get_llm_cache`), unless `cache` is `False`.
     """
     if llm_code is None:
         llm_code = DEFAULT_LLM
     if llm_code.startswith("ollama:"):
-        llm_code = llm_code.replace("ollama:", "")
-        return get_ollama_llm(llm_code)
+        provider, model = "ollama", llm_code.replace("ollama:", "")
+        create = functools.partial(get_ollama_llm, model, **params)
     else:
         # elif llm_code.startswith("google:"):
-        llm_code = llm_code.replace("google:", "")
-        return get_google_llm(llm_code)
+        provider, model = "google", llm_code.replace("google:", "")
+        create = functools.partial(get_google_llm, model, **params)
+    llm = get_llm_pool().get(
+        provider, model, params, create, wrap=_client_wrapper(llm_code)
+    )
+
+    llm_cache = get_llm_cache() if cache else None
+    if llm_cache is not None:
+        from .llm_cache import CachedLLM
+
+        llm = CachedLLM(llm, llm_code=llm_code, cache=llm_cache)
+    return llm
+
+
+def warm_up_llms(llm_codes: typ.Sequence[str]) -> list:
+    """Create pooled clients for the LLMs up front."""
+    return [get_llm(llm_code) for llm_code in llm_codes]
@@ -1,50 +1,170 @@
 import asyncio
 import os
-from concurrent.futures import ProcessPoolExecutor
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from loguru import logger
 
-from germinate_ai.message_bus import nats
-from germinate_ai.data.database import get_db_session
+from germinate_ai.config import settings
+from germinate_ai.message_bus import nats, SubscriptionCache
+from germinate_ai.message_bus.codecs import check_codec
+from germinate_ai.message_bus.compression import check_compression
+from germinate_ai.data.database import get_async_db_session, pool_stats
+from germinate_ai.memory.kv import KeyValueStore
+from germinate_ai.utils.llms import (
+    get_llm_batch_stats,
+    get_llm_cache,
+    get_llm_pool,
+    get_llm_rate_limits,
+    warm_up_llms,
+)
 
 from .worker import Worker
 from .task_dispatcher import TaskDispatcher
+from .result_cache import result_cache_factory
+from .prefork import fork_context, freeze_gc, memory_usage, preload_modules
+from .warmup import preload_workflows, warm_up_executors
 
 cpu_count = os.cpu_count()
 
 
-async def run_worker(ix: int):
-    """Start a single concurrent `Worker` instance."""
-    Session = get_db_session()
+async def connect_llm_rate_limits(nc: nats.NatsConnection):
+    """Share the LLM rate limiters with all workers through a NATS KV bucket (they stay local if it's unavailable.)"""
+    kv = KeyValueStore(settings.llm_rate_limit_bucket, connection=nc)
+    try:
+        await kv.connect()
+    except Exception as e:
+        logger.warning(f"Could not connect to LLM rate limits bucket, limiting per process: {e!r}")
+        return
+    await get_llm_rate_limits().connect(kv.kv)
+
+
+async def run_worker(ix: int, concurrency: int, started_at: float = None):
+    """Start a single concurrent `Worker` instance with `concurrency` task slots.
+
+    `started_at` is the (`time.monotonic()`) time the worker node started, to measure time to first task from.
+    """
+    Session = get_async_db_session()
     loop = asyncio.get_running_loop()
+    # Sync executors run here so they don't block the other task slots
+    thread_pool = ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix=f"worker-{ix}"
+    )
     async with nats.nats_connection() as nc:
-        task_dispatcher = TaskDispatcher(nc=nc, sessionmaker=Session)
-        worker = Worker(nc=nc, id=ix, task_dispatcher=task_dispatcher)
+        if settings.llm_rate_limits:
+            await connect_llm_rate_limits(nc)
+        subscriptions = SubscriptionCache(
+            connection=nc, max_size=settings.subscription_cache_size
+        )
+        task_dispatcher = TaskDispatcher(
+            nc=nc,
+            sessionmaker=Session,
+            thread_pool=thread_pool,
+            subscriptions=subscriptions,
+            result_cache=result_cache_factory(connection=nc),
+        )
+        worker = Worker(
+            nc=nc,
+            id=ix,
+            task_dispatcher=task_dispatcher,
+            tick_interval=settings.worker_tick_interval,
+            continuous=settings.worker_continuous,
+            concurrency=concurrency,
+            poll_timeout=settings.worker_poll_timeout,
+        )
+        worker.stats.db_pool = pool_stats(Session.kw["bind"])
+        worker.stats.result_cache = task_dispatcher.result_cache
+        llm_cache = get_llm_cache()
+        if llm_cache is not None:
+            worker.stats.llm_cache = llm_cache.stats
+        worker.stats.llm_batches = get_llm_batch_stats()
+        worker.stats.llm_pool = get_llm_pool()
+        if settings.llm_rate_limits:
+            worker.stats.llm_rate_limits = get_llm_rate_limits()
+        worker.stats.node_started_at = started_at
         worker_task = loop.create_task(worker.run())
-        await worker_task
+        try:
+            await worker_task
+        finally:
+            thread_pool.shutdown(wait=False, cancel_futures=True)
+            await subscriptions.close()
 
 
-def run_worker_proc(ix: int):
+def run_worker_proc(
+    ix: int, concurrency: int, workflows: list[str], started_at: float = None
+):
     """Run a single Worker in its own `asyncio` loop."""
-    logger.debug(f"Starting worker process #{ix}...")
-    # TODO create m async worker tasks
-    asyncio.run(run_worker(ix))
+    logger.debug(f"Starting worker process #{ix} with {concurrency} task slots...")
+    # (No-op if the workflows were already imported before forking)
+    preload_workflows(workflows)
+    # Create clients etc. in this process, since they might not survive forking
+    warm_up_executors()
+    try:
+        warm_up_llms(settings.worker_llms)
+    except Exception as e:
+        logger.warning(f"Could not warm up LLM clients: {e}")
+    logger.debug(f"Worker process #{ix} LLM clients: {get_llm_pool()}")
+    if started_at is not None:
+        logger.info(
+            f"Worker process #{ix} ready {time.monotonic() - started_at:.2f}s after starting ({memory_usage()})"
+        )
+    asyncio.run(run_worker(ix, concurrency, started_at=started_at))
 
 
-def start_worker_node(n_procs: int):
-    """Launch the worker node with `n_procs` processes."""
+def start_worker_node(
+    n_procs: int,
+    concurrency: int = None,
+    workflows: list[str] = None,
+    prefork: bool = None,
+):
+    """Launch the worker node with `n_procs` processes, each running up to `concurrency` tasks at once.
+
+    `workflows` (import paths) are imported once before starting the worker processes, so their tasks are registered
+    in every worker process.
+
+    With `prefork`, heavy modules are also imported up front, and worker processes are forked from this process so
+    they share its memory copy-on-write (see `prefork`.)
+    """
+    started_at = time.monotonic()
+    check_codec(settings.message_codec)
+    check_compression(settings.message_compression)
     if n_procs == -1:
         logger.debug(f"Launching cpu_count={cpu_count} worker processes...")
         n_procs = cpu_count
     if n_procs is None:
         n_procs = 2
+    if concurrency is None:
+        concurrency = settings.worker_concurrency
+    if not workflows:
+        workflows = settings.worker_workflows
+    if prefork is None:
+        prefork = settings.worker_prefork
+
+    # Import workflows before forking worker processes, so each one doesn't have to
+    for workflow in preload_workflows(workflows):
+        logger.info(f"Preloaded workflow: {workflow.name}")
+
+    mp_context = None
+    if prefork:
+        preload_modules(settings.worker_preload_modules)
+        if settings.worker_gc_freeze:
+            freeze_gc()
+        mp_context = fork_context()
+        logger.info(
+            f"Forking worker processes {time.monotonic() - started_at:.2f}s after starting ({memory_usage()})"
+        )
 
     loop = asyncio.new_event_loop()
-    with ProcessPoolExecutor(max_workers=n_procs) as pool:
+    with ProcessPoolExecutor(max_workers=n_procs, mp_context=mp_context) as pool:
         tasks = [
-            loop.run_in_executor(pool, run_worker_proc, ix) for ix in range(n_procs)
+            loop.run_in_executor(
+                pool, run_worker_proc, ix, concurrency, workflows, started_at
+            )
+            for ix in range(n_procs)
         ]
-        logger.info(f"Started {n_procs} worker processes...")
+        logger.info(
+            f"Started {n_procs} worker processes with {concurrency} task slots each..."
+        )
 
         try:
             loop.run_forever()
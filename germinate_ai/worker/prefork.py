@@ -0,0 +1,91 @@
+"""Pre-fork worker startup: import heavy modules once in the parent, then fork worker processes.
+
+Forked children share the parent's memory pages copy-on-write, so modules imported before forking are neither
+imported again nor duplicated in each child's memory (until written to.) Freezing the GC after importing keeps the
+collector from touching (and so copying) those objects in the children.
+"""
+
+import gc
+import importlib
+import multiprocessing
+import resource
+import sys
+import time
+import typing as typ
+from pathlib import Path
+
+import attr
+from loguru import logger
+
+
+def preload_modules(modules: typ.Sequence[str]):
+    """Import modules (e.g. LLM client libraries that are only imported when first used.)
+
+    Modules that can't be imported (e.g. optional dependencies) are skipped.
+    """
+    started = time.perf_counter()
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Could not preload `{module}`: {e}")
+    logger.debug(
+        f"Preloaded {len(modules)} modules in {time.perf_counter() - started:.2f}s"
+    )
+
+
+def freeze_gc():
+    """Move all objects allocated so far to the GC's permanent generation, so collections in forked processes don't
+    touch them."""
+    gc.collect()
+    gc.freeze()
+    logger.debug(f"Froze {gc.get_freeze_count()} objects")
+
+
+def fork_context() -> typ.Optional[multiprocessing.context.BaseContext]:
+    """Get the "fork" multiprocessing context, or `None` on platforms without `fork`."""
+    try:
+        return multiprocessing.get_context("fork")
+    except ValueError:
+        logger.warning("Can't fork worker processes on this platform")
+        return None
+
+
+@attr.define
+class MemoryUsage:
+    """Memory used by this process (in bytes.)
+
+    `pss` counts pages shared with other processes (e.g. the parent) proportionally, and `shared` is the size of
+    shared pages. They are only available on Linux.
+    """
+
+    rss: int
+    pss: typ.Optional[int] = None
+    shared: typ.Optional[int] = None
+
+    def __str__(self) -> str:
+        def mb(n: typ.Optional[int]) -> str:
+            return "?" if n is None else f"{n / 2**20:.1f}MB"
+
+        return f"rss={mb(self.rss)} pss={mb(self.pss)} shared={mb(self.shared)}"
+
+
+def memory_usage() -> MemoryUsage:
+    """Get this process's memory usage."""
+    smaps = Path("/proc/self/smaps_rollup")
+    if smaps.exists():
+        fields = {}
+        for line in smaps.read_text().splitlines()[1:]:
+            name, _, value = line.partition(":")
+            # e.g. "Rss:    123 kB"
+            fields[name] = int(value.split()[0]) * 1024
+        return MemoryUsage(
+            rss=fields["Rss"],
+            pss=fields.get("Pss"),
+            shared=fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        )
+    # Fall back to peak RSS (in bytes on macOS, KB elsewhere)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        max_rss *= 1024
+    return MemoryUsage(rss=max_rss)
@@ -0,0 +1,161 @@
+"""Opt-in cache of task outputs, keyed by task executor and input.
+
+Tasks are assumed to be pure functions of their (validated) input, so a task whose executor has already run with an
+equal input can reuse that output instead of running again (e.g. calling an LLM.) Tasks that aren't should opt out with
+`@state.task(cache=False)`.
+
+Outputs are cached in-process (`InMemoryResultCache`, an LRU cache), or shared by all workers in a NATS KV bucket
+(`KVResultCache`.) Entries expire after a TTL either way.
+"""
+
+import hashlib
+import json
+import time
+import typing as typ
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from loguru import logger
+from nats.js.errors import KeyNotFoundError
+from pydantic import BaseModel
+
+from germinate_ai.config import settings
+from germinate_ai.memory.kv import KeyValueStore
+from germinate_ai.message_bus.nats import NatsConnection
+
+
+def result_cache_key(executor_name: str, task_input: BaseModel) -> str:
+    """Key for the output of `executor_name` given `task_input`: the executor name and a hash of the canonical
+    (sorted keys, no whitespace) JSON of the input."""
+    canonical = json.dumps(
+        task_input.model_dump(mode="json"), sort_keys=True, separators=(",", ":")
+    )
+    digest = hashlib.sha256(canonical.encode()).hexdigest()
+    return f"{executor_name}.{digest}"
+
+
+class ResultCacheBackend(ABC):
+    """Stores task outputs (as JSON-able dicts) by key."""
+
+    @abstractmethod
+    async def get(self, key: str) -> typ.Optional[dict]:
+        """Get the cached output, or `None` if it isn't cached (or has expired.)"""
+        pass
+
+    @abstractmethod
+    async def put(self, key: str, output: dict):
+        pass
+
+
+class InMemoryResultCache(ResultCacheBackend):
+    """In-process cache of up to `max_size` outputs, evicting the least recently used, that expire after `ttl`
+    seconds."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        # key -> (expires at, output)
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    async def get(self, key: str) -> typ.Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, output = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return output
+
+    async def put(self, key: str, output: dict):
+        self._entries[key] = (time.monotonic() + self.ttl, output)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class KVResultCache(ResultCacheBackend):
+    """Cache shared by all workers in a NATS KV bucket, with values expiring after the bucket's TTL."""
+
+    def __init__(self, store: KeyValueStore):
+        self.store = store
+
+    async def get(self, key: str) -> typ.Optional[dict]:
+        if not self.store.connected:
+            await self.store.connect()
+        try:
+            value = await self.store.get(key)
+        except KeyNotFoundError:
+            return None
+        return json.loads(value)
+
+    async def put(self, key: str, output: dict):
+        if not self.store.connected:
+            await self.store.connect()
+        await self.store.put(key, json.dumps(output))
+
+
+class ResultCache:
+    """Caches task executors' outputs by their inputs in `backend`, and counts hits and misses."""
+
+    def __init__(self, backend: ResultCacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(
+        self, executor_name: str, task_input: BaseModel
+    ) -> typ.Optional[dict]:
+        """Get the executor's cached output for the input, if any."""
+        key = result_cache_key(executor_name, task_input)
+        try:
+            output = await self.backend.get(key)
+        except Exception as e:
+            # A broken cache shouldn't fail the task
+            logger.warning(f"Failed to read cached task output `{key}`: {e}")
+            output = None
+        if output is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return output
+
+    async def put(self, executor_name: str, task_input: BaseModel, output: dict):
+        """Cache the executor's output for the input."""
+        key = result_cache_key(executor_name, task_input)
+        try:
+            await self.backend.put(key, output)
+        except Exception as e:
+            logger.warning(f"Failed to cache task output `{key}`: {e}")
+
+    def __str__(self) -> str:
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0
+        return f"{self.hits} hits, {self.misses} misses ({ratio:.0%} hit ratio)"
+
+
+def result_cache_factory(
+    connection: NatsConnection = None,
+) -> typ.Optional[ResultCache]:
+    """Creates the result cache configured in settings, or `None` if caching is disabled."""
+    backend = settings.task_cache_backend
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return ResultCache(
+            InMemoryResultCache(
+                max_size=settings.task_cache_max_size, ttl=settings.task_cache_ttl
+            )
+        )
+    if backend == "kv":
+        store = KeyValueStore(
+            settings.task_cache_bucket,
+            connection=connection,
+            ttl=settings.task_cache_ttl,
+        )
+        return ResultCache(KVResultCache(store))
+    raise ValueError(f"Unknown task cache backend `{backend}`")
@@ -1,15 +1,31 @@
+import asyncio
+import functools
+import itertools
 import typing as typ
 from collections import ChainMap
+from concurrent.futures import Executor
 
 from loguru import logger
+from pydantic import BaseModel
 
+from germinate_ai.config import settings
 from germinate_ai.data.models import TaskInstance
 from germinate_ai.data.schemas.messages import Message
 from germinate_ai.data.schemas.tasks import TaskAssignment, TaskStateEnum
-from germinate_ai.data.repositories.tasks_repository import get_task_instance_from_assignment
+from germinate_ai.data.repositories.states_repository import aget_state_epoch
+from germinate_ai.data.repositories.tasks_repository import (
+    aget_task_instance_from_assignment,
+)
+from germinate_ai.memory.claim_check import ClaimCheck
 from germinate_ai.message_bus import nats
-from germinate_ai.message_bus.message_queue import NATSQueue
+from germinate_ai.message_bus.codecs import decode_model
+from germinate_ai.message_bus.streams import TaskStream, task_stream
+from germinate_ai.message_bus.subscriptions import SubscriptionCache
+from germinate_ai.core.tasks.executors import TaskExecutor
 from germinate_ai.core.tasks.registry import TaskRegistry
+from germinate_ai.utils.llm_rate_limit import is_rate_limit_error, retry_delay
+
+from .result_cache import ResultCache
 
 
 class TaskDispatcher:
@@ -20,11 +36,46 @@ class TaskDispatcher:
 
     TaskDispatcher also validates input and output schemas for the task, and updates the task's state before ("queued"),
     and after ("completed"/"failed") execution.
+
+    Sync executors are run in `thread_pool` (or the event loop's default executor) so that they don't block other
+    tasks running concurrently in the same event loop.
+
+    Queues for task input/output subjects are looked up in `subscriptions`, so each subject is connected to once.
+
+    Large task outputs are offloaded to an object store by `claim_check`, and only a reference is published.
+
+    With a `result_cache`, tasks whose executor already ran with an equal input reuse the cached output instead of
+    running again (unless the task opted out of caching.)
+
+    Async executors' incremental output (e.g. LLM tokens) is published on the task's stream while they run (see
+    `germinate_ai.message_bus.streams`.)
+
+    Tasks that fail because an LLM provider kept rate limiting their requests (even after the LLM client's own
+    retries) are run again after a backoff, up to `settings.task_rate_limit_retries` times.
+
+    `sessionmaker` should be an `asyncio` session factory (see `get_async_db_session`), so that DB I/O doesn't block
+    other tasks running in the same event loop.
     """
 
-    def __init__(self, nc: nats.NatsConnection, sessionmaker: typ.Callable):
+    def __init__(
+        self,
+        nc: nats.NatsConnection,
+        sessionmaker: typ.Callable,
+        thread_pool: typ.Optional[Executor] = None,
+        subscriptions: typ.Optional[SubscriptionCache] = None,
+        claim_check: typ.Optional[ClaimCheck] = None,
+        result_cache: typ.Optional[ResultCache] = None,
+    ):
         self.nc = nc
         self.sessionmaker = sessionmaker
+        self.thread_pool = thread_pool
+        if subscriptions is None:
+            subscriptions = SubscriptionCache(connection=nc)
+        self.subscriptions = subscriptions
+        if claim_check is None:
+            claim_check = ClaimCheck(connection=nc)
+        self.claim_check = claim_check
+        self.result_cache = result_cache
 
     async def execute(self, assignment: TaskAssignment) -> TaskInstance:
         """Execute the enqueued task.
@@ -35,9 +86,9 @@ class TaskDispatcher:
         Returns:
             TaskInstance: SQLAlchemy model representing persisted task state
         """
-        with self.sessionmaker() as db:
+        async with self.sessionmaker() as db:
             # Get corresponding task from DB
-            task = get_task_instance_from_assignment(db, assignment)
+            task = await aget_task_instance_from_assignment(db, assignment)
             if task is None:
                 logger.error(f"No such task: skipping `{assignment}`")
                 return None
@@ -46,7 +97,9 @@ class TaskDispatcher:
             executor = TaskRegistry.get_executor(task.task_executor_name)
 
             # Get task inputs from dependencies' outputs
-            task_input = await self._get_task_inputs(task)
+            task_input = await self._get_task_inputs(
+                task, inlined_inputs=assignment.inputs
+            )
 
             # Validate task input
             task_input = executor.input_schema.model_validate(task_input)
@@ -57,58 +110,160 @@ class TaskDispatcher:
             # Update task's state
             task.state = TaskStateEnum.queued
             db.add(task)
-            db.commit()
+            await db.commit()
 
-            # TODO Run task executor pre-exec hook, if any
+            use_cache = self.result_cache is not None and executor.cache
+            output = None
+            if use_cache:
+                output = await self.result_cache.get(
+                    task.task_executor_name, task_input
+                )
+            cached = output is not None
 
-            # Run the task with executor
-            # TODO handle failures
-            # TODO async tasks
-            logger.debug(
-                f"Executing task {task.name} with executor {task.task_executor_name}..."
-            )
-            if executor.is_async():
-                output = await executor(task_input)
+            if cached:
+                logger.debug(
+                    f"Using cached output of executor {task.task_executor_name} for task {task.name}"
+                )
             else:
-                output = executor(task_input)
+                # TODO Run task executor pre-exec hook, if any
+
+                # Run the task with executor
+                logger.debug(
+                    f"Executing task {task.name} with executor {task.task_executor_name}..."
+                )
+                output = await self._run_executor_with_retries(
+                    executor, task_input, assignment
+                )
 
             # Validate task output
             task_output = executor.output_schema.model_validate(output)
             task.output = task_output.model_dump()
 
+            if use_cache and not cached:
+                await self.result_cache.put(
+                    task.task_executor_name,
+                    task_input,
+                    task_output.model_dump(mode="json"),
+                )
+
             # TODO Run task executor post-exec hook, if any
 
+            # Don't overwrite outputs if the state was re-entered (e.g. a speculation was discarded) since the
+            # task was assigned
+            if assignment.epoch is not None:
+                epoch = await aget_state_epoch(db, assignment.state_instance_id)
+                if epoch != assignment.epoch:
+                    logger.debug(
+                        f"Discarding output of task {task.name} from an earlier epoch of its state"
+                    )
+                    await db.rollback()
+                    return task
+
             # Save task state
             logger.debug(f"Completed task {task.name}!")
             task.state = TaskStateEnum.completed
             db.add(task)
-            db.commit()
+            await db.commit()
 
             # Write output to message bus for children tasks
             await self._put_task_output(task)
 
             return task
 
-    async def _get_task_inputs(self, task: TaskInstance) -> dict:
-        """Get Task inputs (i.e. outputs from parent tasks) from message bus."""
+    async def _run_executor(
+        self,
+        executor: TaskExecutor,
+        task_input: BaseModel,
+        stream: typ.Optional[TaskStream] = None,
+    ) -> typ.Any:
+        """Run the executor on the task input.
+
+        Async executors can publish output chunks on the task's `stream` while they run (see `current_task_stream`.)
+        """
+        try:
+            if executor.is_async():
+                with task_stream(stream):
+                    output = await executor(task_input)
+            else:
+                loop = asyncio.get_running_loop()
+                output = await loop.run_in_executor(
+                    self.thread_pool, functools.partial(executor, task_input)
+                )
+        except Exception as e:
+            if stream is not None:
+                await self._end_stream(stream, error=repr(e))
+            raise
+        if stream is not None:
+            await self._end_stream(stream)
+        return output
+
+    async def _end_stream(self, stream: TaskStream, error: typ.Optional[str] = None):
+        """Publish the end of the task's stream. Streams are only for watching tasks, so failing to publish doesn't
+        fail the task (or hide its error.)"""
+        try:
+            await stream.end(error=error)
+        except Exception as e:
+            logger.warning(f"Failed to end task stream `{stream.subject}`: {e!r}")
+
+    async def _run_executor_with_retries(
+        self,
+        executor: TaskExecutor,
+        task_input: BaseModel,
+        assignment: TaskAssignment,
+    ) -> typ.Any:
+        """Run the executor, running it again (after a backoff) if it fails because of an LLM provider's rate limits."""
+        for attempt in itertools.count():
+            try:
+                return await self._run_executor(
+                    executor, task_input, stream=self._task_stream(assignment)
+                )
+            except Exception as e:
+                if attempt >= settings.task_rate_limit_retries or not is_rate_limit_error(e):
+                    raise
+                delay = retry_delay(attempt, settings.task_rate_limit_backoff, max_backoff=600)
+                logger.warning(
+                    f"Task {assignment.name} was rate limited, running it again in {delay:.0f}s: {e!r}"
+                )
+                await asyncio.sleep(delay)
+
+    def _task_stream(self, assignment: TaskAssignment) -> typ.Optional[TaskStream]:
+        """The stream for the assigned task's output chunks, if streaming is enabled."""
+        if not settings.task_streaming or assignment.workflow_run_id is None:
+            return None
+        return TaskStream(
+            self.nc,
+            workflow_run_id=assignment.workflow_run_id,
+            state_name=assignment.state_name,
+            task_name=assignment.name,
+        )
+
+    async def _get_task_inputs(
+        self, task: TaskInstance, inlined_inputs: typ.Optional[dict[str, dict]] = None
+    ) -> dict:
+        """Get Task inputs (i.e. outputs from parent tasks) from the assignment if inlined, or else from message bus."""
+        if inlined_inputs is None:
+            inlined_inputs = {}
 
-        # TODO nats interface refactor -- not clean here
         logger.debug(
             f"Getting task {task.name}'s dependencies' outputs: `{task.depends_on}`"
         )
 
         task_inputs = []
         for dep in task.depends_on:
-            input_queue = NATSQueue(
-                connection=self.nc,
+            if dep in inlined_inputs:
+                task_inputs.append(inlined_inputs[dep])
+                continue
+
+            input_queue = await self.subscriptions.reader(
                 stream="jobs",
                 subject=f"jobs.{task.state_instance_id}.from_{dep}.to_descendant",
             )
-            await input_queue.connect()
-            msg = await input_queue.dequeue()
-            message = Message.model_validate_json(msg.data)
-            task_inputs.append(message.payload)
-            await msg.ack()
+            # Read the latest output directly from the stream, instead of
+            # creating a consumer just to fetch one message
+            msg = await input_queue.last()
+            message = decode_model(msg, Message)
+            # (Large outputs are read from the object store)
+            task_inputs.append(await self.claim_check.resolve(message))
 
         # Merge all dicts
         input = dict(ChainMap(*task_inputs))
@@ -120,13 +275,14 @@ class TaskDispatcher:
 
         logger.debug(f"Writing task {task.name}'s output")
 
-        # TODO refactor
-        output_queue = NATSQueue(
-            connection=self.nc,
+        output_queue = await self.subscriptions.publisher(
             stream="jobs",
             subject=f"jobs.{task.state_instance_id}.from_{task.name}.to_descendant",
         )
-        await output_queue.connect()
 
         msg = Message(source=task.name, payload=task.output)
-        await output_queue.enqueue(msg.model_dump_json())
+        # Publish just a reference to large outputs
+        msg = await self.claim_check.offload(
+            msg, name=f"{task.state_instance_id}.{task.name}.{task.id}"
+        )
+        await output_queue.enqueue(msg)
@@ -0,0 +1,63 @@
+"""Worker startup: preload workflows and warm up task executors' dependencies.
+
+Workflows are imported in the worker node's parent process, so that forked worker processes inherit the imported
+modules (and registered task executors.) Dependencies like LLM clients aren't necessarily fork safe (e.g. gRPC
+channels), so they are resolved in each worker process instead, before it takes its first task.
+"""
+
+import inspect
+import time
+import typing as typ
+
+from loguru import logger
+
+from germinate_ai.core.loader import import_workflow
+from germinate_ai.core.tasks.registry import TaskRegistry
+from germinate_ai.core.workflows import Workflow
+from germinate_ai.utils.di import Depends
+
+
+def preload_workflows(
+    import_paths: typ.Sequence[str], *, working_dir: typ.Optional[str] = None
+) -> list[Workflow]:
+    """Import workflows (e.g. "germinate_ai.workflows.metagpt.main:workflow"), registering their task executors.
+
+    Modules are only imported once per process, so this is cheap to call again after forking.
+    """
+    workflows = []
+    for import_path in import_paths:
+        started = time.perf_counter()
+        workflow = import_workflow(import_path, working_dir=working_dir)
+        logger.debug(
+            f"Preloaded workflow {workflow.name} from `{import_path}` in {time.perf_counter() - started:.2f}s"
+        )
+        workflows.append(workflow)
+    return workflows
+
+
+def warm_up_executors() -> int:
+    """Resolve the `Depends` defaults (e.g. LLM clients, chain factories) of all registered task executors, so the
+    first task using them doesn't pay for creating them.
+
+    Returns the number of dependencies resolved. Failures are logged, and the dependency is resolved when first used
+    instead.
+    """
+    started = time.perf_counter()
+    resolved = 0
+    for executor in TaskRegistry.executors():
+        # (Get the task function from its dependency resolving wrapper)
+        func = inspect.unwrap(executor.callable)
+        for param in inspect.signature(func).parameters.values():
+            if not isinstance(param.default, Depends):
+                continue
+            try:
+                param.default()
+                resolved += 1
+            except Exception as e:
+                logger.warning(
+                    f"Could not warm up `{param.name}` for {executor.registered_name}: {e}"
+                )
+    logger.debug(
+        f"Warmed up {resolved} task dependencies in {time.perf_counter() - started:.2f}s"
+    )
+    return resolved
@@ -5,22 +5,113 @@ listeners on task completions via the message bus.
 
 import asyncio
 import time
+import typing as typ
 
+import attr
 from loguru import logger
-from pydantic import ValidationError
+from nats.aio.msg import Msg
 
+from germinate_ai.data.database import PoolStats
 from germinate_ai.data.schemas.tasks import TaskAssignment
 from germinate_ai.message_bus import nats
+from germinate_ai.message_bus.codecs import decode_model
 from germinate_ai.message_bus.message_queue import NATSQueue
+from germinate_ai.utils.llm_batching import BatchStats
+from germinate_ai.utils.llm_cache import LLMCacheStats
+from germinate_ai.utils.llm_pool import LLMClientPool
+from germinate_ai.utils.llm_rate_limit import LLMRateLimits
 
 # from germinate_ai.tasks.executors.agent_task_executor import AgentTaskExecutor, pm_agent_strategy
 from germinate_ai.utils.helpers import get_next_tick
 
+from .prefork import memory_usage
+from .result_cache import ResultCache
 from .task_dispatcher import TaskDispatcher
 
 
+@attr.define
+class WorkerStats:
+    """Throughput and idle counters for a single worker.
+
+    `started_at` is the `time.monotonic()` timestamp of when the worker started, and `node_started_at` (if any) of when
+    its worker node started (e.g. before importing workflows and forking worker processes.) Time to first task is
+    measured from the node's start, and throughput from the worker's.
+    """
+
+    started_at: float = attr.field(factory=time.monotonic)
+    node_started_at: typ.Optional[float] = None
+    polls: int = 0
+    idle_polls: int = 0
+    idle_seconds: float = 0.0
+    tasks_completed: int = 0
+    tasks_failed: int = 0
+    time_to_first_task: typ.Optional[float] = None
+    db_pool: typ.Optional[PoolStats] = None
+    result_cache: typ.Optional[ResultCache] = None
+    llm_cache: typ.Optional[LLMCacheStats] = None
+    llm_batches: dict[str, BatchStats] = attr.field(factory=dict)
+    """Batch size counters, by LLM code."""
+    llm_pool: typ.Optional[LLMClientPool] = None
+    llm_rate_limits: typ.Optional[LLMRateLimits] = None
+
+    @property
+    def uptime(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def since_node_started(self) -> float:
+        started_at = self.started_at if self.node_started_at is None else self.node_started_at
+        return time.monotonic() - started_at
+
+    @property
+    def throughput(self) -> float:
+        """Completed tasks per second since the worker started."""
+        uptime = self.uptime
+        if uptime <= 0:
+            return 0.0
+        return self.tasks_completed / uptime
+
+    def __str__(self) -> str:
+        return (
+            f"completed={self.tasks_completed} failed={self.tasks_failed} "
+            f"throughput={self.throughput:.3f}/s polls={self.polls} "
+            f"idle_polls={self.idle_polls} idle={self.idle_seconds:.1f}s "
+            f"uptime={self.uptime:.1f}s memory=({memory_usage()})"
+            + (
+                f" first_task={self.time_to_first_task:.2f}s"
+                if self.time_to_first_task is not None
+                else ""
+            )
+            + (f" db_pool=({self.db_pool})" if self.db_pool is not None else "")
+            + (
+                f" result_cache=({self.result_cache})"
+                if self.result_cache is not None
+                else ""
+            )
+            + (f" llm_cache=({self.llm_cache})" if self.llm_cache is not None else "")
+            + "".join(
+                f" llm_batches[{llm_code}]=({stats})"
+                for llm_code, stats in self.llm_batches.items()
+            )
+            + (f" llm_pool=({self.llm_pool})" if self.llm_pool is not None else "")
+            + (
+                f" llm_rate_limits=({self.llm_rate_limits})"
+                if self.llm_rate_limits is not None
+                else ""
+            )
+        )
+
+
 class Worker:
-    """Polls and processes tasks from the assignments queue."""
+    """Polls and processes tasks from the assignments queue.
+
+    By default the worker consumes continuously: each worker has `concurrency` task slots, and it long polls the
+    assignments queue for as many assignments as there are free slots. Each assignment runs in its own `asyncio` task,
+    and frees its slot as soon as it completes, so the worker never waits on a whole batch.
+    It only waits when the queue is empty (for at most `poll_timeout` seconds per poll) or all slots are busy.
+
+    Set `continuous=False` to fall back to taking a single assignment every `tick_interval` seconds.
+    """
 
     def __init__(
         self,
@@ -28,39 +119,113 @@ class Worker:
         task_dispatcher: TaskDispatcher,
         id: int = 0,
         tick_interval: int = 10,
+        *,
+        continuous: bool = True,
+        concurrency: int = 1,
+        poll_timeout: float = 5,
+        stats_interval: float = 60,
     ):
         self.nc = nc
         self.id = id
         self.tick_interval = tick_interval
         self.task_dispatcher = task_dispatcher
+        self.continuous = continuous
+        self.concurrency = max(1, concurrency)
+        self.poll_timeout = poll_timeout
+        self.stats_interval = stats_interval
+        self.stats = WorkerStats()
+        self._last_stats_report = time.monotonic()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._in_flight: set[asyncio.Task] = set()
 
     async def run(self):
         """Connect to messaging bus, wait for assignments, and execute them."""
-        next_tick = get_next_tick(self.tick_interval)
-
         await self.connect()
         logger.success(f"Worker #{self.id}: connected to cluster! Waiting for tasks...")
 
+        try:
+            if self.continuous:
+                await self._run_continuous()
+            else:
+                await self._run_ticks()
+        finally:
+            logger.info(f"Worker #{self.id}: {self.stats}")
+
+    async def _run_continuous(self):
+        """Long poll for assignments whenever there are free task slots, and run them as soon as they arrive."""
+        try:
+            while True:
+                free_slots = await self._acquire_free_slots()
+                poll_started = time.monotonic()
+                msgs = []
+                try:
+                    self.stats.polls += 1
+                    msgs = await self.assignments_queue.dequeue_batch(
+                        batch=free_slots, timeout=self.poll_timeout
+                    )
+                except TimeoutError:
+                    # Queue is empty
+                    self.stats.idle_polls += 1
+                    self.stats.idle_seconds += time.monotonic() - poll_started
+                except Exception as e:
+                    logger.exception("Error while reading from NATS queue: ", e)
+                finally:
+                    # Give back slots we didn't get assignments for
+                    for _ in range(free_slots - len(msgs)):
+                        self._slots.release()
+
+                for msg in msgs:
+                    task = asyncio.create_task(self._run_in_slot(msg))
+                    self._in_flight.add(task)
+                    task.add_done_callback(self._in_flight.discard)
+
+                self._report_stats()
+        except asyncio.CancelledError:
+            logger.debug(f"Worker #{self.id}: Cancelled! Shutting down worker...")
+            for task in self._in_flight:
+                task.cancel()
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def _acquire_free_slots(self) -> int:
+        """Wait until at least one task slot is free, then claim every free slot."""
+        await self._slots.acquire()
+        free_slots = 1
+        while free_slots < self.concurrency and not self._slots.locked():
+            await self._slots.acquire()
+            free_slots += 1
+        return free_slots
+
+    async def _run_in_slot(self, msg: Msg):
+        """Handle an assignment and free up its task slot when done."""
+        try:
+            await self._handle_message(msg)
+        finally:
+            self._slots.release()
+
+    async def _run_ticks(self):
+        """Take one assignment every `tick_interval` seconds."""
+        next_tick = get_next_tick(self.tick_interval)
+
         while True:
             last_tick = time.time()
 
             try:
+                self.stats.polls += 1
                 msg = await self.assignments_queue.dequeue()
-                task_json = msg.data
-                # acknowledge message so we don't see it again
-                await msg.ack()
-                success = await self._run_task(task_json)
-                if not success:
-                    logger.exception("Task execution failure", task_json)
+                await self._handle_message(msg)
             except TimeoutError:
-                pass
+                self.stats.idle_polls += 1
             except asyncio.CancelledError:
                 logger.debug(f"Worker #{self.id}: Cancelled! Shutting down worker...")
                 break
             except Exception as e:
                 logger.exception("Error while reading from NATS queue: ", e)
 
-            await asyncio.sleep(next_tick(last_tick=last_tick))
+            self._report_stats()
+
+            sleep_for = next_tick(last_tick=last_tick)
+            self.stats.idle_seconds += max(sleep_for, 0)
+            await asyncio.sleep(sleep_for)
 
     async def connect(self):
         """Connect to task assignments and completions queue so we can get assignments/send task completion notifications via the message bus."""
@@ -71,26 +236,58 @@ class Worker:
             connection=self.nc,
         )
         await self.assignments_queue.connect()
-        # TODO write only:
         self.completions_queue = NATSQueue(
             connection=self.nc, stream="jobs", subject="jobs.task_completions"
         )
-        await self.completions_queue.connect()
+        await self.completions_queue.connect(subscribe=False)
+
+    async def _handle_message(self, msg: Msg):
+        """Acknowledge an assignment message and run the task."""
+        # acknowledge message so we don't see it again
+        await msg.ack()
+        try:
+            success = await self._run_task(msg)
+        except Exception as e:
+            logger.exception(f"Worker #{self.id}: Task execution failure: {e}")
+            success = False
+        if success:
+            self.stats.tasks_completed += 1
+            if self.stats.time_to_first_task is None:
+                self.stats.time_to_first_task = self.stats.since_node_started
+                logger.info(
+                    f"Worker #{self.id}: First task completed {self.stats.time_to_first_task:.2f}s after starting "
+                    f"({memory_usage()})"
+                )
+        else:
+            self.stats.tasks_failed += 1
+            logger.error(f"Worker #{self.id}: Task execution failure `{msg.data}`")
+
+    def _report_stats(self):
+        """Periodically log throughput/idle counters."""
+        now = time.monotonic()
+        if now - self._last_stats_report < self.stats_interval:
+            return
+        self._last_stats_report = now
+        logger.info(f"Worker #{self.id}: {self.stats}")
 
-    async def _run_task(self, task_json: str) -> bool:
+    async def _run_task(self, msg: Msg) -> bool:
         """Validate task assignment data, delegate execution to TaskDispatcher, and notify listeners on completion via the messaging bus."""
         try:
-            assignment = TaskAssignment.model_validate_json(task_json)
-        except ValidationError as e:
-            logger.error(f"Worker #{self.id}: Skipping invalid task `{task_json}`: {e}")
+            assignment = decode_model(msg, TaskAssignment)
+        except ValueError as e:
+            # (includes pydantic `ValidationError`s)
+            logger.error(f"Worker #{self.id}: Skipping invalid task `{msg.data}`: {e}")
             return
 
         logger.info(f"Worker #{self.id}: Starting task {assignment.name}")
         task = await self.task_dispatcher.execute(assignment=assignment)
+        if task is None:
+            return False
 
         # Queue task completed message
         logger.debug(f"Queueing completed message {task.name}")
-        await self.completions_queue.enqueue(assignment.model_dump_json())
+        # (Inlined inputs aren't needed in completion notifications)
+        await self.completions_queue.enqueue(assignment.model_copy(update={"inputs": {}}))
 
         # return True => mark task as completed
         # TODO handle failures
@@ -6,7 +6,11 @@ from pydantic import BaseModel
 
 from germinate_ai.core import State
 from germinate_ai.utils.di import Depends
-from germinate_ai.toolbox.chains import lc_prompt_chain_factory, extract_python_code_string
+from germinate_ai.toolbox.chains import (
+    astream_chain,
+    extract_python_code_string,
+    lc_prompt_chain_factory,
+)
 from germinate_ai.message_bus import ro_message_channel_factory, ROMessageChannel
 from germinate_ai.memory.kv import KeyValueStore, kv_story_factory
 
@@ -55,7 +59,9 @@ ENGINEER_PROMPT = dedent("""
 """)
 
 @coding_state.task(
-    namespace="agent"
+    namespace="agent",
+    # Also reads messages from the coders channel
+    cache=False,
 )
 async def eng_task(
     input: EngInputSchema,
@@ -80,7 +86,7 @@ async def eng_task(
 
     vars = dict(**input.model_dump(), coder_chan_messages=coder_chan_messages)
 
-    output_str = chain.invoke(vars)
+    output_str = await astream_chain(chain, vars)
 
     code = extract_python_code_string(output_str)
 
@@ -6,7 +6,11 @@ from pydantic import BaseModel
 
 from germinate_ai.core import State
 from germinate_ai.utils.di import Depends
-from germinate_ai.toolbox.chains import lc_prompt_chain_factory, extract_json_string
+from germinate_ai.toolbox.chains import (
+    astream_chain,
+    extract_json_string,
+    lc_prompt_chain_factory,
+)
 from germinate_ai.message_bus import wo_message_channel_factory, WOMessageChannel
 from germinate_ai.memory.kv import KeyValueStore, kv_story_factory
 
@@ -68,13 +72,13 @@ PRODUCT_MANAGER_PROMPT = dedent("""
 )
 # Auto validates schemas
 # Fills in nc and db dependencies if asked for
-def pm_task(
+async def pm_task(
     input: PMInputSchema,
     chain_factory=Depends(lc_prompt_chain_factory),
 ) -> PMOutputSchema:
     chain = chain_factory(prompt=PRODUCT_MANAGER_PROMPT)
 
-    output_str = chain.invoke(input.product_requirements)
+    output_str = await astream_chain(chain, input.product_requirements)
 
     print("design task output")
     from pprint import pprint
@@ -151,6 +155,8 @@ SYSTEM_ARCHITECT_PROMPT = dedent("""
 
 @design_state.task(
     namespace="agent",
+    # Writes to the coders channel and KV store
+    cache=False,
 )
 async def sa_task(
     input: SAInputSchema,
@@ -160,7 +166,7 @@ async def sa_task(
 ) -> SAOutputSchema:
     chain = chain_factory(prompt=SYSTEM_ARCHITECT_PROMPT)
 
-    output_str = chain.invoke(input.prd_document)
+    output_str = await astream_chain(chain, input.prd_document)
 
     print("sa task output")
     from pprint import pprint
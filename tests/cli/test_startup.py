@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ["sqlalchemy", "nats", "langchain_core", "cloudpickle", "pydantic_settings"]
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    """Run code in a fresh interpreter, without any settings in the environment."""
+    env = {
+        k: v
+        for k, v in os.environ.items()
+        if k not in ("DATABASE_URL", "NATS_URL", "GOOGLE_AI_API_KEY")
+    }
+    return subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True
+    )
+
+
+def test_cli_import_defers_heavy_modules():
+    result = run_python(
+        "import sys, germinate_ai.cli.cli; print(' '.join(sys.modules))"
+    )
+    imported = set(result.stdout.split())
+
+    assert [m for m in HEAVY_MODULES if m in imported] == []
+
+
+def test_cli_help_does_not_need_settings():
+    result = run_python(
+        "from germinate_ai.cli.cli import cli; cli(['--help'], standalone_mode=False)"
+    )
+
+    assert "worker" in result.stdout
@@ -0,0 +1,88 @@
+import contextlib
+
+import pytest
+
+from germinate_ai.coordinator.coordinator import Coordinator
+from germinate_ai.coordinator.scheduler import Scheduler
+
+
+class FakeQueue:
+    """Records published items."""
+
+    def __init__(self):
+        self.items = []
+
+    async def enqueue(self, item):
+        self.items.append(item)
+
+    async def enqueue_many(self, items, max_in_flight=None):
+        self.items.extend(items)
+        return [None] * len(items)
+
+
+class FakeSubscriptions:
+    def __init__(self):
+        self.queue = FakeQueue()
+
+    async def publisher(self, stream, subject):
+        return self.queue
+
+
+class FakeClaimCheck:
+    async def offload(self, message, name=None):
+        return message
+
+
+class FakeSession:
+    """DB session that tracks commits and rollbacks (and fails to commit with `fail_commit`.)"""
+
+    def __init__(self):
+        self.fail_commit = False
+        self.committed = False
+        self.rolled_back = False
+
+    def add(self, obj):
+        pass
+
+    @contextlib.asynccontextmanager
+    async def begin_nested(self):
+        yield
+
+    async def commit(self):
+        if self.fail_commit:
+            raise ConnectionError("commit failed")
+        self.committed = True
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+@pytest.fixture
+def db_session() -> FakeSession:
+    return FakeSession()
+
+
+@pytest.fixture
+def fake_scheduler() -> Scheduler:
+    """Scheduler that records enqueued assignments in `assignments_queue.items`."""
+    scheduler = Scheduler(nc=None)
+    scheduler.assignments_queue = FakeQueue()
+    scheduler.connected = True
+    return scheduler
+
+
+@pytest.fixture
+def make_coordinator(db_session, fake_scheduler):
+    """Make a coordinator (of class `cls`) with fake DB session, scheduler and message bus clients."""
+
+    def make(cls: type[Coordinator] = Coordinator, **kwargs) -> Coordinator:
+        return cls(
+            nc=None,
+            db=db_session,
+            scheduler=fake_scheduler,
+            subscriptions=FakeSubscriptions(),
+            claim_check=FakeClaimCheck(),
+            **kwargs,
+        )
+
+    return make
@@ -0,0 +1,75 @@
+import uuid
+
+import pytest
+
+from germinate_ai.coordinator.coordinator import Coordinator
+from germinate_ai.data.schemas import TaskAssignment
+
+
+class FakeMsg:
+    def __init__(self, data: str):
+        self.data = data
+        self.headers = None
+        self.outcome = None
+
+    async def ack(self):
+        self.outcome = "ack"
+
+    async def nak(self, delay=None):
+        self.outcome = "nak"
+
+    async def term(self):
+        self.outcome = "term"
+
+
+class StubCoordinator(Coordinator):
+    """Records the completions it handles, and fails to handle those of `failing` states."""
+
+    def __init__(self, failing=(), **kwargs):
+        super().__init__(**kwargs)
+        self.failing = set(failing)
+        self.handled = {}
+
+    async def _handle_state_completions(self, state_instance_id, assignments):
+        if state_instance_id in self.failing:
+            raise RuntimeError("boom")
+        self.handled[state_instance_id] = [a.name for a in assignments]
+
+
+def completion(state_instance_id, name) -> FakeMsg:
+    return FakeMsg(
+        TaskAssignment(state_instance_id=state_instance_id, name=name).model_dump_json()
+    )
+
+
+@pytest.mark.asyncio
+async def test_failing_state_does_not_drop_other_states_completions(
+    make_coordinator, db_session
+):
+    ok, failing = uuid.uuid4(), uuid.uuid4()
+    msgs = [
+        completion(ok, "a"),
+        completion(failing, "x"),
+        completion(ok, "b"),
+        FakeMsg("not an assignment"),
+    ]
+    coordinator = make_coordinator(StubCoordinator, failing=[failing])
+
+    await coordinator._handle_task_completions(msgs)
+
+    assert db_session.committed
+    assert coordinator.handled == {ok: ["a", "b"]}
+    # (the failing state's completion is redelivered, the invalid one never is)
+    assert [msg.outcome for msg in msgs] == ["ack", "nak", "ack", "term"]
+
+
+@pytest.mark.asyncio
+async def test_completions_are_not_acked_if_commit_fails(make_coordinator, db_session):
+    msgs = [completion(uuid.uuid4(), "a"), completion(uuid.uuid4(), "b")]
+    db_session.fail_commit = True
+
+    with pytest.raises(ConnectionError):
+        await make_coordinator(StubCoordinator)._handle_task_completions(msgs)
+
+    assert db_session.rolled_back
+    assert [msg.outcome for msg in msgs] == ["nak", "nak"]
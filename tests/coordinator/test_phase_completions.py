@@ -0,0 +1,151 @@
+import uuid
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from germinate_ai.coordinator import coordinator as coordinator_module
+from germinate_ai.coordinator.coordinator import Coordinator
+from germinate_ai.data.models import (
+    SchedulingModeEnum,
+    StateInstance,
+    StateInstanceStateEnum,
+    TaskInstance,
+    WorkflowRun,
+)
+from germinate_ai.data.models.enums import TaskInstanceStateEnum
+from germinate_ai.data.repositories.states_repository import (
+    _record_task_completion_stmt,
+)
+from germinate_ai.data.schemas import TaskAssignment
+
+
+def fake_record_task_completion(state: StateInstance):
+    """In-memory `arecord_task_completion` (see `_record_task_completion_stmt`.)"""
+
+    async def arecord_task_completion(db, uuid, phase_index, name, epoch=None):
+        (task,) = [t for t in state.task_instances if t.name == name]
+        if (
+            state.current_phase_index != phase_index
+            or state.current_phase_remaining <= 0
+            or (epoch is not None and state.epoch != epoch)
+            or task.phase_completion_counted
+        ):
+            return None
+        task.phase_completion_counted = True
+        state.current_phase_completed += 1
+        state.current_phase_remaining -= 1
+        return state.current_phase_remaining
+
+    return arecord_task_completion
+
+
+@pytest.fixture
+def state():
+    """(a, b) -> c"""
+    run = WorkflowRun(id=uuid.uuid4(), workflow_name="w", workflow_version="1")
+    state = StateInstance(
+        id=uuid.uuid4(),
+        name="s",
+        workflow_run=run,
+        workflow_run_id=run.id,
+        scheduling_mode=SchedulingModeEnum.phases,
+        transitions={},
+    )
+    state.sorted_tasks_phases = [["a", "b"], ["c"]]
+    for name, depends_on in [("a", ["start"]), ("b", ["start"]), ("c", ["a", "b"])]:
+        TaskInstance(
+            name=name,
+            depends_on=depends_on,
+            state_instance=state,
+            state_instance_id=state.id,
+            output={},
+        )
+    state.state = StateInstanceStateEnum.in_progress
+    state.start()
+    return state
+
+
+@pytest.fixture
+def coordinator(state, monkeypatch, make_coordinator):
+    async def aget_state(db, uuid, join_tasks=True):
+        return state
+
+    async def aget_workflow_run(db, uuid):
+        return state.workflow_run
+
+    monkeypatch.setattr(coordinator_module, "aget_state", aget_state)
+    monkeypatch.setattr(coordinator_module, "aget_workflow_run", aget_workflow_run)
+    monkeypatch.setattr(
+        coordinator_module,
+        "arecord_task_completion",
+        fake_record_task_completion(state),
+    )
+    return make_coordinator()
+
+
+async def complete(coordinator: Coordinator, state: StateInstance, *names, phase_index=None):
+    assignments = []
+    for name in names:
+        task = next(t for t in state.task_instances if t.name == name)
+        task.state = TaskInstanceStateEnum.completed
+        ix = state.phase_index_of(name) if phase_index is None else phase_index
+        assignments.append(
+            TaskAssignment(
+                state_instance_id=state.id, name=name, phase_index=ix, epoch=state.epoch
+            )
+        )
+    await coordinator._handle_state_completions(state.id, assignments)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_completions_are_counted_once(coordinator, state):
+    await complete(coordinator, state, "a", "a")
+    await complete(coordinator, state, "a")
+
+    # (b is still running)
+    assert (state.current_phase_index, state.current_phase_remaining) == (0, 1)
+    assert coordinator.scheduler.assignments_queue.items == []
+
+    await complete(coordinator, state, "b")
+    assert state.current_phase_index == 1
+    assert [a.name for a in coordinator.scheduler.assignments_queue.items] == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_out_of_phase_completions_are_ignored(coordinator, state):
+    await complete(coordinator, state, "a", "b")
+    assert state.current_phase_index == 1
+
+    # (redelivered completions of the previous phase)
+    await complete(coordinator, state, "a", "b", phase_index=0)
+    # (a completion of the current phase's task reported for the wrong phase)
+    await complete(coordinator, state, "c", phase_index=0)
+
+    assert (state.current_phase_index, state.current_phase_remaining) == (1, 1)
+
+    await complete(coordinator, state, "c", "c")
+    assert state.current_phase_remaining == 0
+    assert state.state == StateInstanceStateEnum.completed
+
+
+def test_re_entering_a_phase_resets_counted_flags(state):
+    for task in state.task_instances:
+        task.phase_completion_counted = True
+
+    state.start()
+
+    counted = {t.name: t.phase_completion_counted for t in state.task_instances}
+    assert counted == {"a": False, "b": False, "c": True}
+
+
+def test_record_task_completion_stmt_counts_each_task_once():
+    stmt = _record_task_completion_stmt(uuid.uuid4(), 1, "a", epoch=2)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    # (the task's flag is flipped in the same statement, and only while the state is in that phase and epoch)
+    assert sql.startswith("WITH counted AS \n(UPDATE task_instances SET phase_completion_counted")
+    assert "task_instances.phase_completion_counted IS false" in sql
+    assert "EXISTS (SELECT counted.id" in sql
+    assert sql.count("state_instances.current_phase_index = ") == 2
+    assert sql.count("state_instances.epoch = ") == 2
+    assert sql.count("state_instances.current_phase_remaining > ") == 2
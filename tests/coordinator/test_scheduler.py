@@ -0,0 +1,119 @@
+import uuid
+
+import pytest
+
+from germinate_ai.config import settings
+from germinate_ai.core.exceptions import MessagePublishException
+from germinate_ai.coordinator.scheduler import Scheduler
+from germinate_ai.data.models import SchedulingModeEnum, StateInstance, TaskInstance
+from germinate_ai.data.schemas import TaskAssignment
+from germinate_ai.message_bus.message_queue import NATSQueue
+
+
+class FakeQueue(NATSQueue):
+    """Records published assignments, and fails to publish those in `fail`."""
+
+    def __init__(self, fail=()):
+        super().__init__(stream="jobs", subject="jobs.task_assignments", connection=object())
+        self.items = []
+        self.fail = set(fail)
+
+    async def enqueue(self, item: str):
+        assignment = self.codec.decode_model(self.codec.encode(item), TaskAssignment)
+        if assignment.name in self.fail:
+            raise ConnectionError(assignment.name)
+        self.items.append(assignment)
+
+
+def make_state(scheduling_mode: SchedulingModeEnum) -> StateInstance:
+    """A diamond DAG: a -> (b, c) -> d"""
+    state = StateInstance(
+        id=uuid.uuid4(), name="diamond", scheduling_mode=scheduling_mode
+    )
+    state.sorted_tasks_phases = [["a"], ["b", "c"], ["d"]]
+    for name, depends_on in [
+        ("a", ["start"]),
+        ("b", ["a"]),
+        ("c", ["a"]),
+        ("d", ["b", "c"]),
+    ]:
+        TaskInstance(
+            name=name,
+            depends_on=depends_on,
+            state_instance=state,
+            state_instance_id=state.id,
+        )
+    state.start()
+    return state
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler(nc=None, inline_max_bytes=1024)
+    scheduler.assignments_queue = FakeQueue()
+    scheduler.connected = True
+    return scheduler
+
+
+def test_start_dag_resets_counters():
+    state = make_state(SchedulingModeEnum.dag)
+
+    assert state.tasks_remaining == 4
+    pending = {t.name: t.pending_dependencies for t in state.task_instances}
+    assert pending == {"a": 0, "b": 1, "c": 1, "d": 2}
+    assert {t.name for t in state.root_tasks} == {"a"}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_state_dag_enqueues_root_tasks(scheduler):
+    state = make_state(SchedulingModeEnum.dag)
+
+    await scheduler.enqueue_state(state, start_output={"x": 1})
+
+    (assignment,) = scheduler.assignments_queue.items
+    assert assignment.name == "a"
+    assert assignment.phase_index is None
+    assert assignment.inputs == {"start": {"x": 1}}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_state_phases_enqueues_current_phase(scheduler):
+    state = make_state(SchedulingModeEnum.phases)
+    state.next_phase()
+
+    await scheduler.enqueue_state(state)
+
+    names = {a.name for a in scheduler.assignments_queue.items}
+    assert names == {"b", "c"}
+    assert all(a.phase_index == 1 for a in scheduler.assignments_queue.items)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_tasks_inlines_small_outputs(scheduler):
+    state = make_state(SchedulingModeEnum.dag)
+    small, large = {"summary": "ok"}, {"code": "x" * 2048}
+    b, c, d = (t for t in state.task_instances if t.name != "a")
+
+    await scheduler.enqueue_tasks([b, c, d], outputs={"a": small, "b": small, "c": large})
+
+    inputs = {a.name: a.inputs for a in scheduler.assignments_queue.items}
+    # (c's output is over `inline_max_bytes`, so d reads it from the message bus instead)
+    assert inputs == {"b": {"a": small}, "c": {"a": small}, "d": {"b": small}}
+
+
+def test_inline_max_bytes_defaults_to_setting():
+    assert Scheduler(nc=None).inline_max_bytes == settings.inline_task_outputs_max_bytes
+    assert Scheduler(nc=None, inline_max_bytes=0)._inlineable_outputs({"a": {}}) == {}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_tasks_reports_partial_failures(scheduler):
+    state = make_state(SchedulingModeEnum.phases)
+    scheduler.assignments_queue.fail = {"c"}
+
+    with pytest.raises(MessagePublishException) as e:
+        await scheduler.enqueue_tasks(state.task_instances)
+
+    # the rest are still published
+    assert {a.name for a in scheduler.assignments_queue.items} == {"a", "b", "d"}
+    assert [str(error) for error in e.value.failures.values()] == ["c"]
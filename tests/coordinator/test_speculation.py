@@ -0,0 +1,157 @@
+import uuid
+
+import pytest
+
+from germinate_ai.coordinator import coordinator as coordinator_module
+from germinate_ai.coordinator.coordinator import Coordinator
+from germinate_ai.data.models import (
+    SchedulingModeEnum,
+    StateInstance,
+    StateInstanceStateEnum,
+    TaskInstance,
+    WorkflowRun,
+)
+from germinate_ai.data.models.enums import TaskInstanceStateEnum
+from germinate_ai.data.schemas import TaskAssignment
+
+
+def make_state(run: WorkflowRun, name: str, tasks: dict[str, list[str]], transitions=None):
+    state = StateInstance(
+        id=uuid.uuid4(),
+        name=name,
+        workflow_run=run,
+        workflow_run_id=run.id,
+        scheduling_mode=SchedulingModeEnum.phases,
+        transitions=transitions or {},
+    )
+    phases = [[t for t, deps in tasks.items() if deps == ["start"]]]
+    phases += [[t for t, deps in tasks.items() if deps != ["start"]]] if len(tasks) > 1 else []
+    state.sorted_tasks_phases = phases
+    for task_name, depends_on in tasks.items():
+        TaskInstance(
+            name=task_name,
+            depends_on=depends_on,
+            state_instance=state,
+            state_instance_id=state.id,
+            output={},
+        )
+    return state
+
+
+@pytest.fixture
+def run():
+    """design --(design_ok)--> coding, design --(fallback)--> design"""
+    run = WorkflowRun(id=uuid.uuid4(), workflow_name="w", workflow_version="1")
+    design = make_state(
+        run,
+        "design",
+        {"pm_task": ["start"], "design_ok": ["pm_task"], "fallback": ["pm_task"]},
+        transitions={"design_ok": "coding", "fallback": "design"},
+    )
+    make_state(run, "coding", {"eng_task": ["start"]})
+    design.state = StateInstanceStateEnum.in_progress
+    design.start()
+    run.current_state = design
+    return run
+
+
+@pytest.fixture
+def coordinator(run, monkeypatch, make_coordinator):
+    async def aget_workflow_run(db, uuid):
+        return run
+
+    monkeypatch.setattr(coordinator_module, "aget_workflow_run", aget_workflow_run)
+    return make_coordinator(speculative=True)
+
+
+def complete_design(run: WorkflowRun, transition: str):
+    design = run.state_instance_by_name("design")
+    for task in design.task_instances:
+        task.state = TaskInstanceStateEnum.completed
+        if task.name in design.transitions:
+            task.output = {"condition_evaluation": task.name == transition}
+    design.current_phase_remaining = 0
+    return design
+
+
+async def speculate(coordinator: Coordinator, run: WorkflowRun) -> StateInstance:
+    design = run.state_instance_by_name("design")
+    design.next_phase()
+    assert design.in_final_phase
+    await coordinator._speculate(design)
+    return run.state_instance_by_name("coding")
+
+
+@pytest.mark.asyncio
+async def test_likely_next_state_is_entered_speculatively(coordinator, run):
+    coding = await speculate(coordinator, run)
+
+    assert coding.speculative
+    assert coding.state == StateInstanceStateEnum.queued
+    (assignment,) = coordinator.scheduler.assignments_queue.items
+    assert (assignment.name, assignment.epoch) == ("eng_task", coding.epoch)
+    assert run.current_state.name == "design"
+
+
+@pytest.mark.asyncio
+async def test_speculation_is_kept_if_the_transition_fires(coordinator, run):
+    coding = await speculate(coordinator, run)
+    epoch = coding.epoch
+
+    await coordinator._complete_state(complete_design(run, "design_ok"))
+
+    assert not coding.speculative
+    assert coding.epoch == epoch
+    assert run.current_state is coding
+    # (not enqueued again)
+    assert len(coordinator.scheduler.assignments_queue.items) == 1
+
+
+@pytest.mark.asyncio
+async def test_speculation_is_discarded_if_another_transition_fires(coordinator, run):
+    coding = await speculate(coordinator, run)
+    (stale,) = coordinator.scheduler.assignments_queue.items
+
+    await coordinator._complete_state(complete_design(run, "fallback"))
+
+    assert not coding.speculative
+    assert coding.state == StateInstanceStateEnum.created
+    assert run.current_state.name == "design"
+    # completions of tasks assigned during the speculation are ignored
+    assert coordinator._current_assignments(coding, [stale]) == []
+
+
+@pytest.mark.asyncio
+async def test_discarded_speculation_restores_previous_state(coordinator, run):
+    # (e.g. coding already ran in an earlier iteration of a loop)
+    run.state_instance_by_name("coding").state = StateInstanceStateEnum.completed
+    coding = await speculate(coordinator, run)
+    assert coding.state == StateInstanceStateEnum.queued
+
+    await coordinator._complete_state(complete_design(run, "fallback"))
+
+    assert coding.state == StateInstanceStateEnum.completed
+    assert coding.state_before_speculation is None
+
+
+@pytest.mark.asyncio
+async def test_speculative_state_waits_for_confirmation_to_complete(coordinator, run):
+    coding = await speculate(coordinator, run)
+    coding.current_phase_remaining = 0
+
+    await coordinator._complete_state(coding)
+    assert run.current_state.name == "design"
+    assert coding.state == StateInstanceStateEnum.queued
+
+    await coordinator._complete_state(complete_design(run, "design_ok"))
+    assert coding.state == StateInstanceStateEnum.completed
+
+
+def test_start_begins_a_new_epoch():
+    state = StateInstance(name="s", sorted_tasks_phases=[["a"]])
+    state.start()
+    state.start()
+
+    assert state.epoch == 2
+    assignment = TaskAssignment(state_instance_id=uuid.uuid4(), name="a", epoch=1)
+    assert Coordinator._current_assignments(state, [assignment]) == []
@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from germinate_ai.data.schemas.messages import Message
+from germinate_ai.memory.claim_check import ClaimCheck
+from germinate_ai.memory.object_store import ObjectStore
+
+
+class FakeObjectStore:
+    connected = True
+
+    def __init__(self):
+        self.objects = {}
+
+    async def put(self, name: str, value: bytes):
+        self.objects[name] = value
+
+    async def get(self, name: str) -> bytes:
+        return self.objects[name]
+
+
+@pytest.fixture
+def claim_check():
+    return ClaimCheck(store=FakeObjectStore(), min_bytes=1024)
+
+
+@pytest.mark.asyncio
+async def test_small_payloads_are_published_as_is(claim_check):
+    msg = Message(source="pm_task", payload={"x": 1})
+
+    assert await claim_check.offload(msg, name="small") is msg
+    assert claim_check.store.objects == {}
+    assert await claim_check.resolve(msg) == {"x": 1}
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_are_offloaded(claim_check):
+    payload = {"code": "print('hello')\n" * 1000}
+    msg = Message(source="eng_task", payload=payload)
+
+    offloaded = await claim_check.offload(msg, name="large")
+
+    assert offloaded.payload == {}
+    assert offloaded.payload_ref == "large"
+    assert "large" in claim_check.store.objects
+    # survives a trip through the message bus
+    received = Message.model_validate_json(offloaded.model_dump_json())
+    assert await claim_check.resolve(received) == payload
+
+
+@pytest.mark.asyncio
+async def test_object_store_connects_once_with_ttl():
+    configs = []
+
+    async def create_object_store(config):
+        await asyncio.sleep(0.01)
+        configs.append(config)
+        return object()
+
+    connection = SimpleNamespace(
+        is_connected=True,
+        jetstream=SimpleNamespace(create_object_store=create_object_store),
+    )
+    store = ObjectStore("payloads", connection=connection, ttl=60)
+
+    await asyncio.gather(store.connect(), store.connect())
+
+    assert [(c.bucket, c.ttl) for c in configs] == [("payloads", 60)]
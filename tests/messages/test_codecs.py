@@ -0,0 +1,68 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from germinate_ai.data.schemas.messages import Message
+from germinate_ai.data.schemas.tasks import TaskAssignment
+from germinate_ai.message_bus import codecs as codecs_module
+from germinate_ai.message_bus.codecs import (
+    CONTENT_TYPE_HEADER,
+    check_codec,
+    decode_model,
+    get_codec,
+)
+
+
+@pytest.fixture
+def assignment():
+    return TaskAssignment(
+        state_instance_id=uuid.uuid4(),
+        name="pm_task",
+        phase_index=1,
+        inputs={"start": {"description": "A snake game", "n": 3}},
+    )
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+def test_codec_round_trip(name, assignment):
+    """Models survive being encoded and decoded by each codec."""
+    if name != "json":
+        pytest.importorskip(name)
+    codec = get_codec(name)
+
+    data = codec.encode(assignment)
+    msg = SimpleNamespace(data=data, headers=codec.headers)
+
+    assert isinstance(data, bytes)
+    assert decode_model(msg, TaskAssignment) == assignment
+
+
+def test_messages_without_content_type_are_json():
+    """Messages from nodes that don't send a content type (already decoded to str) are read as JSON."""
+    message = Message(source="start", payload={"x": 1})
+    msg = SimpleNamespace(data=message.model_dump_json(), headers=None)
+
+    assert decode_model(msg, Message) == message
+
+
+def test_unknown_content_type():
+    msg = SimpleNamespace(data=b"", headers={CONTENT_TYPE_HEADER: "text/x-unknown"})
+
+    with pytest.raises(ValueError):
+        decode_model(msg, Message)
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("pickle")
+
+
+def test_unavailable_codec_fails_at_startup(monkeypatch):
+    monkeypatch.setattr(codecs_module, "msgpack", None)
+
+    with pytest.raises(ImportError, match=r"germinate-ai\[msgpack\]"):
+        check_codec("msgpack")
+    with pytest.raises(ValueError):
+        check_codec("pickle")
+    check_codec("json")
@@ -0,0 +1,83 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from germinate_ai.data.schemas.messages import Message
+from germinate_ai.message_bus.codecs import CONTENT_TYPE_HEADER, decode_model
+from germinate_ai.message_bus import compression as compression_module
+from germinate_ai.message_bus.compression import (
+    CONTENT_ENCODING_HEADER,
+    check_compression,
+    compress,
+    decompress_msg,
+)
+from germinate_ai.message_bus.message_queue import NATSQueue, _decode_data
+
+LARGE = ("def main():\n    print('hello world')\n" * 500).encode()
+
+
+@pytest.mark.parametrize(
+    "name, module", [("zlib", "zlib"), ("zstd", "zstandard"), ("lz4", "lz4")]
+)
+def test_compression_round_trip(name, module):
+    pytest.importorskip(module)
+    headers = {CONTENT_TYPE_HEADER: "application/json"}
+
+    data, compressed_headers = compress(LARGE, headers, name, min_bytes=1024)
+    msg = SimpleNamespace(data=data, headers=compressed_headers)
+    decompress_msg(msg)
+
+    assert len(data) < len(LARGE)
+    assert compressed_headers == {**headers, CONTENT_ENCODING_HEADER: name}
+    assert msg.data == LARGE
+
+
+def test_small_or_incompressible_data_is_not_compressed():
+    small = b"hello"
+    incompressible = os.urandom(4096)
+
+    assert compress(small, None, "zlib", min_bytes=1024) == (small, None)
+    assert compress(incompressible, None, "zlib", min_bytes=1024) == (
+        incompressible,
+        None,
+    )
+    assert compress(LARGE, None, "none", min_bytes=1024) == (LARGE, None)
+
+
+@pytest.mark.asyncio
+async def test_nats_queue_compresses_large_messages():
+    """Large messages are published compressed, and decoded transparently."""
+    published = []
+
+    async def publish(subject, payload, headers=None):
+        published.append(SimpleNamespace(data=payload, headers=headers))
+
+    connection = SimpleNamespace(jetstream=SimpleNamespace(publish=publish))
+    nq = NATSQueue(
+        "jobs",
+        "jobs.test",
+        connection=connection,
+        compression="zlib",
+        compression_min_bytes=1024,
+    )
+    message = Message(source="eng_task", payload={"code": LARGE.decode()})
+
+    await nq.enqueue(message)
+    (msg,) = published
+    assert msg.headers[CONTENT_ENCODING_HEADER] == "zlib"
+
+    _decode_data(msg)
+    assert decode_model(msg, Message) == message
+
+
+def test_unavailable_compression_fails_at_startup(monkeypatch):
+    monkeypatch.setattr(compression_module, "zstandard", None)
+    monkeypatch.setattr(compression_module, "_compressors", {})
+
+    with pytest.raises(ImportError, match=r"germinate-ai\[zstd\]"):
+        check_compression("zstd")
+    with pytest.raises(ValueError):
+        check_compression("brotli")
+    check_compression("none")
+    check_compression("zlib")
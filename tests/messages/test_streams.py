@@ -0,0 +1,116 @@
+import io
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from germinate_ai.cli.tail_run import StreamPrinter
+from germinate_ai.message_bus.streams import TaskStream, task_stream
+from germinate_ai.toolbox.chains import astream_chain
+from germinate_ai.utils.llm_cache import CachedLLM, LLMCache
+from germinate_ai.utils.llm_pool import LLMClientPool
+from germinate_ai.worker.task_dispatcher import TaskDispatcher
+
+
+class FakeConnection:
+    def __init__(self, fail: bool = False):
+        self.published = []
+
+        async def publish(subject, payload):
+            if fail:
+                raise ConnectionError("connection closed")
+            self.published.append((subject, json.loads(payload)))
+
+        self.nc = SimpleNamespace(publish=publish)
+
+
+def chain(llm):
+    return PromptTemplate.from_template("Say {x}") | llm | StrOutputParser()
+
+
+@pytest.mark.asyncio
+async def test_astream_chain_publishes_chunks_on_current_task_stream():
+    connection = FakeConnection()
+    run_id = uuid.uuid4()
+    stream = TaskStream(connection, run_id, "design", "pm_task")
+
+    with task_stream(stream):
+        output = await astream_chain(chain(FakeListChatModel(responses=["hello"])), {"x": "hi"})
+    await stream.end()
+
+    assert output == "hello"
+    subjects = {subject for subject, _ in connection.published}
+    assert subjects == {f"streams.{run_id}.design.pm_task"}
+    events = [event for _, event in connection.published]
+    assert "".join(e.get("chunk", "") for e in events) == "hello"
+    assert len(events) > 2
+    assert events[-1] == {"seq": len(events) - 1, "done": True, "error": None}
+
+
+@pytest.mark.asyncio
+async def test_astream_chain_without_stream():
+    output = await astream_chain(chain(FakeListChatModel(responses=["hello"])), {"x": "hi"})
+
+    assert output == "hello"
+
+
+@pytest.mark.asyncio
+async def test_pooled_cached_llms_stream():
+    pool = LLMClientPool()
+    model = FakeListChatModel(responses=["hello"])
+    cache = LLMCache()
+    llm = CachedLLM(pool.get("fake", "model", {}, lambda: model), "fake:model", cache)
+
+    chunks = [chunk async for chunk in chain(llm).astream({"x": "hi"})]
+    assert chunks == list("hello")
+
+    # cached responses arrive all at once
+    chunks = [chunk async for chunk in chain(llm).astream({"x": "hi"})]
+    assert chunks == ["hello"]
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+class FakeExecutor:
+    def __init__(self, error: Exception = None):
+        self.error = error
+
+    def is_async(self) -> bool:
+        return True
+
+    async def __call__(self, task_input):
+        if self.error is not None:
+            raise self.error
+        return await astream_chain(
+            chain(FakeListChatModel(responses=["hello"])), {"x": "hi"}
+        )
+
+
+@pytest.mark.asyncio
+async def test_failing_stream_doesnt_fail_tasks():
+    dispatcher = TaskDispatcher(
+        nc=None, sessionmaker=None, subscriptions=object(), claim_check=object()
+    )
+    stream = TaskStream(FakeConnection(fail=True), uuid.uuid4(), "design", "pm_task")
+
+    assert await dispatcher._run_executor(FakeExecutor(), None, stream) == "hello"
+    # (the executor's own error is raised, not the stream's)
+    with pytest.raises(ValueError):
+        await dispatcher._run_executor(FakeExecutor(ValueError()), None, stream)
+
+
+def test_stream_printer():
+    out = io.StringIO()
+    printer = StreamPrinter(out=out)
+
+    for subject, event in [
+        ("streams.run.design.pm_task", {"seq": 0, "chunk": "hel"}),
+        ("streams.run.design.pm_task", {"seq": 1, "chunk": "lo"}),
+        ("streams.run.design.pm_task", {"seq": 2, "done": True, "error": None}),
+    ]:
+        printer.handle(subject, json.dumps(event).encode())
+
+    assert out.getvalue() == "\n--- design.pm_task ---\nhello\n--- design.pm_task done ---\n"
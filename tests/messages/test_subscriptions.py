@@ -0,0 +1,60 @@
+import pytest
+
+from germinate_ai.message_bus.message_queue import NATSQueue
+from germinate_ai.message_bus.subscriptions import SubscriptionCache
+
+
+@pytest.fixture
+def fake_queues(monkeypatch):
+    """Stub out NATS round trips, and record (un)subscriptions."""
+    calls = {"connect": [], "unsubscribe": []}
+
+    async def connect(self, subscribe=True):
+        calls["connect"].append((self.subject, subscribe))
+        self.consumer = object() if subscribe else None
+
+    async def unsubscribe(self):
+        calls["unsubscribe"].append(self.subject)
+        self.consumer = None
+
+    monkeypatch.setattr(NATSQueue, "connect", connect)
+    monkeypatch.setattr(NATSQueue, "unsubscribe", unsubscribe)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_subscription_cache_reuses_queues(fake_queues):
+    """Looking up the same subject twice only connects once."""
+    cache = SubscriptionCache(connection=object(), max_size=4)
+
+    q1 = await cache.subscriber("jobs", "jobs.a")
+    q2 = await cache.subscriber("jobs", "jobs.a")
+    assert q1 is q2
+
+    p1 = await cache.publisher("jobs", "jobs.a")
+    assert p1 is not q1
+    assert p1 is await cache.reader("jobs", "jobs.a")
+
+    assert fake_queues["connect"] == [("jobs.a", True), ("jobs.a", False)]
+
+
+@pytest.mark.asyncio
+async def test_subscription_cache_evicts_lru(fake_queues):
+    """Least recently used queues are evicted and unsubscribed."""
+    cache = SubscriptionCache(connection=object(), max_size=2)
+
+    await cache.subscriber("jobs", "jobs.a")
+    await cache.subscriber("jobs", "jobs.b")
+    # touch a so b is least recently used
+    await cache.subscriber("jobs", "jobs.a")
+    await cache.subscriber("jobs", "jobs.c")
+
+    assert len(cache) == 2
+    assert fake_queues["unsubscribe"] == ["jobs.b"]
+
+    await cache.unsubscribe("jobs", "jobs.a")
+    assert fake_queues["unsubscribe"] == ["jobs.b", "jobs.a"]
+
+    await cache.close()
+    assert len(cache) == 0
+    assert fake_queues["unsubscribe"] == ["jobs.b", "jobs.a", "jobs.c"]
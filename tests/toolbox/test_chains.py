@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from germinate_ai.core.tasks.executors.langchain import LCChainExecutor
+from germinate_ai.toolbox.chains import (
+    ainvoke_chain,
+    has_native_async,
+    lc_prompt_chain_factory,
+)
+from germinate_ai.utils.llm_cache import CachedLLM, LLMCache
+
+
+class BlockingChatModel(FakeListChatModel):
+    """Fake chat model with only a (blocking) sync implementation."""
+
+    delay: float = 0.2
+    threads: list = []
+
+    def _call(self, *args, **kwargs):
+        self.threads.append(threading.current_thread())
+        time.sleep(self.delay)
+        return super()._call(*args, **kwargs)
+
+
+class AsyncChatModel(FakeListChatModel):
+    """Fake chat model with a native async implementation."""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(0)
+        message = AIMessage(content=self.responses[0])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class ChainExecutor(LCChainExecutor):
+    def __call__(self, **kwargs):
+        return self.run(**kwargs)
+
+
+def chain(llm):
+    return lc_prompt_chain_factory(get_llm=lambda: llm)(prompt="Say {x}")
+
+
+def test_has_native_async():
+    assert not has_native_async(chain(BlockingChatModel(responses=["a"])))
+    assert has_native_async(chain(AsyncChatModel(responses=["a"])))
+    # (wrappers are as async as the model they wrap)
+    cached = CachedLLM(AsyncChatModel(responses=["a"]), "fake:async", LLMCache())
+    assert has_native_async(chain(cached))
+
+
+@pytest.mark.asyncio
+async def test_blocking_chains_run_in_threads_and_overlap():
+    llm = BlockingChatModel(responses=["a"], threads=[])
+
+    started = time.monotonic()
+    outputs = await asyncio.gather(
+        *[ainvoke_chain(chain(llm), {"x": i}) for i in range(4)]
+    )
+
+    assert outputs == ["a"] * 4
+    assert threading.main_thread() not in llm.threads
+    # (in the chains' own thread pool, not the event loop's default executor)
+    assert all(t.name.startswith("llm-chain") for t in llm.threads)
+    # (4 calls overlapped instead of taking 4 * 0.2s)
+    assert time.monotonic() - started < 0.6
+
+
+@pytest.mark.asyncio
+async def test_chain_executor_async_paths():
+    executor = ChainExecutor(chain=chain(AsyncChatModel(responses=["a"])))
+
+    assert await executor.arun(x="hi") == "a"
+    assert await executor.abatch([{"x": "hi"}, {"x": "bye"}]) == ["a", "a"]
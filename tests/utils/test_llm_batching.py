@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models.fake import FakeListLLM
+
+from germinate_ai.utils.llm_batching import BatchingLLM
+from germinate_ai.utils.llm_pool import LLMClientPool
+
+
+class RecordingLLM(FakeListLLM):
+    """Fake LLM that records the prompts of each batch it generates."""
+
+    batches: list = []
+
+    async def _agenerate(self, prompts, *args, **kwargs):
+        self.batches.append(prompts)
+        if "fail" in prompts:
+            raise ValueError("provider error")
+        return await super()._agenerate(prompts, *args, **kwargs)
+
+
+def batching_llm(window=0.05, max_size=8):
+    llm = RecordingLLM(responses=["ok"], batches=[])
+    pool = LLMClientPool(default_limit=1)
+    client = pool.get(
+        "fake",
+        "model",
+        {},
+        lambda: llm,
+        wrap=lambda client: BatchingLLM(client, window=window, max_size=max_size),
+    )
+    return llm, client, pool
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_batched():
+    llm, client, pool = batching_llm()
+
+    outputs = await asyncio.gather(*[client.ainvoke(f"p{i}") for i in range(5)])
+
+    assert outputs == ["ok"] * 5
+    assert llm.batches == [["p0", "p1", "p2", "p3", "p4"]]
+    assert (client.stats.batches, client.stats.requests, client.stats.largest) == (1, 5, 5)
+    # (the whole batch took a single concurrency slot)
+    assert pool.limiter("fake", "model").in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_full_batches_are_sent_right_away():
+    llm, client, _ = batching_llm(window=10, max_size=2)
+
+    outputs = await asyncio.wait_for(
+        asyncio.gather(*[client.ainvoke(f"p{i}") for i in range(4)]), timeout=1
+    )
+
+    assert outputs == ["ok"] * 4
+    assert llm.batches == [["p0", "p1"], ["p2", "p3"]]
+    assert client.stats.full == 2
+    assert client.stats.mean_size == 2
+
+
+@pytest.mark.asyncio
+async def test_requests_outside_the_window_are_not_batched():
+    llm, client, _ = batching_llm(window=0.01)
+
+    await client.ainvoke("p0")
+    await client.ainvoke("p1")
+
+    assert llm.batches == [["p0"], ["p1"]]
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_are_raised_to_every_request():
+    _, client, _ = batching_llm()
+
+    results = await asyncio.gather(
+        client.ainvoke("fail"), client.ainvoke("p1"), return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert await client.ainvoke("p2") == "ok"
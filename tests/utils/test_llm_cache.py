@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from germinate_ai.utils.llm_cache import (
+    CachedLLM,
+    InMemoryLLMCache,
+    LLMCache,
+    SQLiteLLMCache,
+)
+
+
+class CountingChatModel(FakeListChatModel):
+    """Fake chat model that counts (and slows down) calls."""
+
+    calls: int = 0
+    delay: float = 0.0
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return super()._call(*args, **kwargs)
+
+
+def chain(llm):
+    return PromptTemplate.from_template("Say {x}") | llm | StrOutputParser()
+
+
+def test_responses_are_cached():
+    llm = CountingChatModel(responses=["a", "b"])
+    cache = LLMCache()
+    cached = chain(CachedLLM(llm, llm_code="fake:model", cache=cache))
+
+    assert cached.invoke({"x": "hi"}) == "a"
+    assert cached.invoke({"x": "hi"}) == "a"
+    assert cached.invoke({"x": "bye"}) == "b"
+
+    assert llm.calls == 2
+    assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+    assert cache.stats.saved_tokens > 0
+
+
+def test_cache_is_keyed_by_model_code():
+    cache = LLMCache()
+    a = chain(CachedLLM(CountingChatModel(responses=["a"]), "fake:a", cache))
+    b = chain(CachedLLM(CountingChatModel(responses=["b"]), "fake:b", cache))
+
+    assert a.invoke({"x": "hi"}) == "a"
+    assert b.invoke({"x": "hi"}) == "b"
+
+
+def test_in_memory_cache_evicts_least_recently_used():
+    cache = InMemoryLLMCache(max_size=1)
+    cache.update("a", "1")
+    cache.update("b", "2")
+
+    assert cache.lookup("a") is None
+    assert cache.lookup("b") == "2"
+
+
+def test_responses_are_persisted(tmp_path):
+    path = tmp_path / "llm_cache.sqlite"
+    llm = CountingChatModel(responses=["a"])
+    cached = CachedLLM(llm, "fake:model", LLMCache(persistent=SQLiteLLMCache(path)))
+    assert cached.invoke("hi").content == "a"
+
+    # e.g. after a restart
+    restarted = CachedLLM(llm, "fake:model", LLMCache(persistent=SQLiteLLMCache(path)))
+    assert restarted.invoke("hi").content == "a"
+    assert llm.calls == 1
+
+
+def test_identical_concurrent_requests_are_deduplicated():
+    llm = CountingChatModel(responses=["a"], delay=0.2)
+    cache = LLMCache()
+    cached = CachedLLM(llm, "fake:model", cache)
+    barrier = threading.Barrier(4)
+
+    def invoke():
+        barrier.wait()
+        return cached.invoke("hi")
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: invoke(), range(4)))
+
+    assert llm.calls == 1
+    assert all(r.content == "a" for r in results)
+    assert cache.stats.deduplicated == 3
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_async_requests_are_deduplicated():
+    llm = CountingChatModel(responses=["a"], delay=0.2)
+    cache = LLMCache()
+    cached = chain(CachedLLM(llm, "fake:model", cache))
+
+    results = await asyncio.gather(*[cached.ainvoke({"x": "hi"}) for _ in range(4)])
+
+    assert results == ["a"] * 4
+    assert llm.calls == 1
+    assert cache.stats.deduplicated == 3
+
+
+def test_request_racing_a_finishing_leader_is_a_hit():
+    cache = LLMCache()
+    future, leader = cache.begin("key")
+    # (another request looked up the key and missed before the leader finished)
+    assert cache.lookup("key") is None
+    cache.finish("key", future, "value", latency=1)
+
+    future, leader = cache.begin("key")
+
+    assert not leader
+    assert future.done() and future.result() == "value"
+
+
+class ThreadRecordingSQLiteCache(SQLiteLLMCache):
+    """Records the threads it's used from."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = set()
+
+    def lookup(self, key):
+        self.threads.add(threading.get_ident())
+        return super().lookup(key)
+
+    def update(self, key, value):
+        self.threads.add(threading.get_ident())
+        super().update(key, value)
+
+
+@pytest.mark.asyncio
+async def test_async_requests_dont_block_on_persistent_cache(tmp_path):
+    persistent = ThreadRecordingSQLiteCache(tmp_path / "llm_cache.sqlite")
+    cached = CachedLLM(
+        CountingChatModel(responses=["a"]), "fake:model", LLMCache(persistent=persistent)
+    )
+
+    assert (await cached.ainvoke("hi")).content == "a"
+    assert [chunk async for chunk in cached.astream("bye")]
+
+    assert persistent.threads
+    assert threading.get_ident() not in persistent.threads
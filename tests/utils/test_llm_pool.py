@@ -0,0 +1,91 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from germinate_ai.utils.di import Depends
+from germinate_ai.utils.llm_pool import ConcurrencyLimiter, LLMClientPool
+from germinate_ai.utils.llms import get_llm
+
+
+class SlowChatModel(FakeListChatModel):
+    """Fake chat model that tracks the max number of concurrent calls."""
+
+    delay: float = 0.05
+    running: int = 0
+    max_running: int = 0
+
+    def _call(self, *args, **kwargs):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        self.running -= 1
+        return super()._call(*args, **kwargs)
+
+    async def _acall(self, *args, **kwargs):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        return self.responses[0]
+
+
+def test_clients_are_pooled_by_model_and_params():
+    a = get_llm("ollama:gemma:7b", cache=False)
+
+    assert get_llm("ollama:gemma:7b", cache=False) is a
+    assert get_llm("ollama:gemma:7b", cache=False, temperature=0.1) is not a
+    assert get_llm("ollama:llama2", cache=False) is not a
+
+
+def test_requests_are_limited_per_model():
+    pool = LLMClientPool(default_limit=4, limits={"fake:slow": 2})
+    model = SlowChatModel(responses=["a"])
+    llm = pool.get("fake", "slow", {}, lambda: model)
+    # (Shares the model's limit)
+    other = pool.get("fake", "slow", {"temperature": 0}, lambda: model)
+
+    with ThreadPoolExecutor(8) as threads:
+        list(threads.map(lambda i: (llm if i % 2 else other).invoke("hi"), range(8)))
+
+    assert model.max_running == 2
+    assert pool.limiter("fake", "slow").in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_async_requests_are_limited_per_model():
+    pool = LLMClientPool(default_limit=3)
+    model = SlowChatModel(responses=["a"])
+    llm = pool.get("fake", "slow", {}, lambda: model)
+
+    await asyncio.gather(*[llm.ainvoke("hi") for _ in range(9)])
+
+    assert model.max_running == 3
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiters_dont_leak_slots():
+    limiter = ConcurrencyLimiter(1)
+    await limiter.aacquire()
+    waiter = asyncio.create_task(limiter.aacquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    limiter.release()
+    assert limiter.in_use == 0
+    await asyncio.wait_for(limiter.aacquire(), timeout=1)
+
+
+def test_dependencies_are_cached_by_arguments():
+    def factory(name: str):
+        return object()
+
+    a = Depends(factory, name="a")
+
+    assert a() is a()
+    assert Depends(factory, name="a")() is a()
+    assert Depends(factory, name="b")() is not a()
@@ -0,0 +1,239 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from nats.errors import TimeoutError as NatsTimeoutError
+from nats.js.errors import KeyNotFoundError, KeyWrongLastSequenceError
+
+from germinate_ai.utils.llm_pool import (
+    AIMDController,
+    ConcurrencyLimitedLLM,
+    ConcurrencyLimiter,
+)
+from germinate_ai.utils.llm_rate_limit import (
+    BucketState,
+    LLMRateLimits,
+    RateLimitedLLM,
+    is_rate_limit_error,
+)
+
+
+class ResourceExhausted(Exception):
+    """Like Google's 429 error."""
+
+
+class FakeKV:
+    """In-memory KV with revisions, where (with `contention`) another process updates the key before every other
+    update."""
+
+    def __init__(self, contention: bool = False):
+        self.entries = {}
+        self.contention = contention
+        self.updates = 0
+        self.conflicts = 0
+
+    async def get(self, key):
+        if key not in self.entries:
+            raise KeyNotFoundError()
+        value, revision = self.entries[key]
+        return SimpleNamespace(value=value, revision=revision)
+
+    async def create(self, key, value):
+        if key in self.entries:
+            raise KeyWrongLastSequenceError()
+        self.entries[key] = (value, 1)
+
+    async def update(self, key, value, last=None):
+        self.updates += 1
+        current, revision = self.entries[key]
+        if self.contention and self.updates % 2:
+            revision += 1
+            self.entries[key] = (current, revision)
+        if last != revision:
+            self.conflicts += 1
+            raise KeyWrongLastSequenceError()
+        self.entries[key] = (value, revision + 1)
+
+
+class HotKV(FakeKV):
+    """KV where other processes update the key before each of our first `conflicting` updates."""
+
+    def __init__(self, conflicting: int):
+        super().__init__()
+        self.conflicting = conflicting
+
+    async def update(self, key, value, last=None):
+        if self.conflicting:
+            self.conflicting -= 1
+            current, revision = self.entries[key]
+            self.entries[key] = (current, revision + 1)
+        await super().update(key, value, last=last)
+
+
+class FailingKV:
+    async def get(self, key):
+        raise NatsTimeoutError()
+
+
+class FlakyChatModel(FakeListChatModel):
+    """Fake chat model that's rate limited the first `failures` times it's called."""
+
+    failures: int = 0
+    calls: int = 0
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ResourceExhausted("429 Quota exceeded")
+        return super()._call(*args, **kwargs)
+
+
+def test_bucket_reservations_are_spread_over_time():
+    state = BucketState(tokens=2, updated=0)
+
+    waits = [state.reserve(1, now=0, rate=2, capacity=2) for _ in range(4)]
+    assert waits == [0, 0, 0.5, 1.0]
+    # (refilled after idling, up to its capacity)
+    assert state.reserve(1, now=10, rate=2, capacity=2) == 0
+    assert state.tokens == 1
+
+
+@pytest.mark.asyncio
+async def test_processes_share_buckets_through_kv():
+    kv = FakeKV(contention=True)
+    processes = [LLMRateLimits({"google:gemini-pro": 10}) for _ in range(2)]
+    for rate_limits in processes:
+        await rate_limits.connect(kv)
+    a, b = (p.limiter("google:gemini-pro") for p in processes)
+
+    waits = [await limiter._areserve(1) for limiter in (a, b, a, b, a, b)]
+
+    assert a.is_shared and list(kv.entries) == ["google_gemini-pro"]
+    assert kv.conflicts > 0
+    # 10 tokens/s with a capacity of 10: no waiting until the shared bucket is empty
+    assert waits == [0] * 6
+    waits = [await limiter._areserve(1) for limiter in (a, b, a, b, a)]
+    assert [wait > 0 for wait in waits] == [False] * 4 + [True]
+    assert a.stats.fallbacks == 0
+
+
+@pytest.mark.asyncio
+async def test_contention_is_retried_instead_of_falling_back():
+    kv = HotKV(conflicting=0)
+    rate_limits = LLMRateLimits({"google:gemini-pro": 10})
+    await rate_limits.connect(kv)
+    limiter = rate_limits.limiter("google:gemini-pro")
+    await limiter.aacquire()
+
+    kv.conflicting = 8
+    await limiter.aacquire()
+
+    assert (limiter.stats.conflicts, limiter.stats.fallbacks) == (8, 0)
+    # (the reservation was made from the shared bucket, refilled while backing off)
+    (value, _) = kv.entries["google_gemini-pro"]
+    assert BucketState(**json.loads(value)).tokens <= 9
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_falls_back_to_local_bucket():
+    rate_limits = LLMRateLimits({"ollama:gemma:7b": 100}, fallback_share=0.25)
+    await rate_limits.connect(FailingKV())
+    limiter = rate_limits.limiter("ollama:gemma:7b")
+
+    await limiter.aacquire()
+
+    assert limiter.stats.fallbacks == 1
+    # (every process falls back to its own bucket, so each only gets a share of the rate)
+    assert (limiter.local.rate, limiter.local.capacity) == (25, 25)
+    assert rate_limits.limiter("ollama:llama2") is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_requests_are_retried():
+    llm = RateLimitedLLM(FlakyChatModel(responses=["ok"], failures=2), backoff=0.01)
+
+    assert (await llm.ainvoke("hi")).content == "ok"
+    assert llm.invoke("hi").content == "ok"
+
+
+def test_other_errors_and_exhausted_retries_are_raised():
+    llm = RateLimitedLLM(
+        FlakyChatModel(responses=["ok"], failures=3), max_retries=1, backoff=0.01
+    )
+    with pytest.raises(ResourceExhausted):
+        llm.invoke("hi")
+
+    assert is_rate_limit_error(ValueError("Ollama call failed with status code 429."))
+    assert not is_rate_limit_error(ValueError("Ollama call failed with status code 400."))
+
+
+def test_aimd_increases_additively_and_decreases_multiplicatively():
+    limiter = ConcurrencyLimiter(4)
+    controller = AIMDController(limiter, max_limit=8, latency_tolerance=3.0)
+
+    for _ in range(4 + 5):
+        controller.record_success(0.1)
+    assert limiter.limit == 6
+
+    # (rate limiting errors of requests in flight together only decrease the limit once)
+    for _ in range(3):
+        controller.record_error(ResourceExhausted())
+    assert limiter.limit == 3
+
+    controller._decreased_at = float("-inf")
+    controller.record_error(ValueError("not rate limiting"))
+    controller.record_success(10)
+    assert limiter.limit == 1
+
+
+def test_aimd_ignores_latency_by_default():
+    """Long generations after short ones don't lower the limit (only rate limiting errors do.)"""
+    limiter = ConcurrencyLimiter(4)
+    controller = AIMDController(limiter)
+
+    for _ in range(10):
+        for latency in (0.2, 0.3, 20, 45, 0.1):
+            controller.record_success(latency)
+
+    assert (limiter.limit, controller.decreases) == (4, 0)
+
+
+@pytest.mark.asyncio
+async def test_raising_the_limit_lets_waiters_in():
+    limiter = ConcurrencyLimiter(1)
+    await limiter.aacquire()
+    waiter = asyncio.create_task(limiter.aacquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    limiter.set_limit(2)
+    await asyncio.wait_for(waiter, timeout=1)
+    assert limiter.in_use == 2
+
+    # (lowering the limit doesn't hand over released slots above it)
+    limiter.set_limit(1)
+    waiter = asyncio.create_task(limiter.aacquire())
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    limiter.release()
+    await asyncio.wait_for(waiter, timeout=1)
+
+
+def test_limited_llm_reports_to_controller():
+    limiter = ConcurrencyLimiter(4)
+    controller = AIMDController(limiter)
+    llm = ConcurrencyLimitedLLM(
+        FlakyChatModel(responses=["ok"], failures=1), limiter, controller
+    )
+
+    with pytest.raises(ResourceExhausted):
+        llm.invoke("hi")
+    llm.invoke("hi")
+
+    assert (controller.decreases, limiter.limit) == (1, 2)
+    assert controller.latency is not None
+    assert limiter.in_use == 0
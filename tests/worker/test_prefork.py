@@ -0,0 +1,22 @@
+import gc
+
+from germinate_ai.worker.prefork import freeze_gc, memory_usage, preload_modules
+
+
+def test_memory_usage():
+    usage = memory_usage()
+
+    assert usage.rss > 0
+    assert "rss=" in str(usage)
+
+
+def test_freeze_gc():
+    try:
+        freeze_gc()
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+
+
+def test_preload_modules_skips_missing_modules():
+    preload_modules(["json", "germinate_ai_no_such_module"])
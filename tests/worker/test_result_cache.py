@@ -0,0 +1,100 @@
+import pytest
+from nats.js.errors import KeyNotFoundError
+from pydantic import BaseModel
+
+from germinate_ai.core import State
+from germinate_ai.worker.result_cache import (
+    InMemoryResultCache,
+    KVResultCache,
+    ResultCache,
+    result_cache_key,
+)
+
+
+class Input(BaseModel):
+    a: int
+    b: dict[str, int]
+
+
+class Output(BaseModel):
+    total: int
+
+
+def test_cache_key_is_canonical():
+    x = Input(a=1, b={"x": 1, "y": 2})
+    y = Input(b={"y": 2, "x": 1}, a=1)
+
+    assert result_cache_key("agent.sum_executor", x) == result_cache_key(
+        "agent.sum_executor", y
+    )
+    assert result_cache_key("agent.sum_executor", x) != result_cache_key(
+        "agent.other_executor", x
+    )
+    assert result_cache_key("agent.sum_executor", x) != result_cache_key(
+        "agent.sum_executor", Input(a=2, b={"x": 1, "y": 2})
+    )
+
+
+@pytest.mark.asyncio
+async def test_in_memory_cache_evicts_least_recently_used():
+    backend = InMemoryResultCache(max_size=2)
+
+    await backend.put("a", {"total": 1})
+    await backend.put("b", {"total": 2})
+    assert await backend.get("a") == {"total": 1}
+    await backend.put("c", {"total": 3})
+
+    assert await backend.get("b") is None
+    assert await backend.get("a") == {"total": 1}
+    assert await backend.get("c") == {"total": 3}
+
+
+@pytest.mark.asyncio
+async def test_in_memory_cache_expires_entries():
+    backend = InMemoryResultCache(ttl=0)
+
+    await backend.put("a", {"total": 1})
+
+    assert await backend.get("a") is None
+    assert len(backend) == 0
+
+
+@pytest.mark.asyncio
+async def test_kv_cache():
+    class FakeKeyValueStore:
+        connected = True
+
+        def __init__(self):
+            self.values = {}
+
+        async def get(self, key):
+            if key not in self.values:
+                raise KeyNotFoundError
+            return self.values[key]
+
+        async def put(self, key, value):
+            self.values[key] = value
+
+    cache = ResultCache(KVResultCache(FakeKeyValueStore()))
+    input = Input(a=1, b={})
+
+    assert await cache.get("agent.sum_executor", input) is None
+    await cache.put("agent.sum_executor", input, {"total": 1})
+
+    assert await cache.get("agent.sum_executor", input) == {"total": 1}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_tasks_can_opt_out_of_caching():
+    state = State(name="result_cache_test")
+
+    @state.task(namespace="result_cache_test")
+    def cached_task(input: Input) -> Output:
+        return Output(total=input.a)
+
+    @state.task(namespace="result_cache_test", cache=False)
+    def uncached_task(input: Input) -> Output:
+        return Output(total=input.a)
+
+    assert cached_task.executor.cache
+    assert not uncached_task.executor.cache
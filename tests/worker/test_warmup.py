@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+
+from germinate_ai.core import State
+from germinate_ai.utils.di import Depends
+from germinate_ai.worker.warmup import preload_workflows, warm_up_executors
+
+
+class Empty(BaseModel):
+    pass
+
+
+def test_preload_workflows_registers_tasks():
+    (workflow,) = preload_workflows(["germinate_ai.workflows.metagpt.main:workflow"])
+
+    assert workflow.name == "simple_metagpt"
+
+
+def test_warm_up_executors_resolves_dependencies():
+    calls = []
+
+    def client_factory():
+        calls.append(1)
+        return object()
+
+    state = State(name="warmup_test")
+
+    @state.task(namespace="warmup_test")
+    def uses_client(input: Empty, client=Depends(client_factory)) -> Empty:
+        return Empty()
+
+    assert warm_up_executors() >= 1
+    assert calls == [1]
+    # cached for the first task
+    uses_client.executor(Empty())
+    assert calls == [1]
@@ -0,0 +1,115 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from germinate_ai.data.schemas import TaskAssignment
+from germinate_ai.worker.worker import Worker
+
+
+class FakeMsg:
+    def __init__(self, name: str, fail_ack: bool = False):
+        self.data = TaskAssignment(
+            state_instance_id=uuid.uuid4(), name=name
+        ).model_dump_json()
+        self.headers = None
+        self.fail_ack = fail_ack
+
+    async def ack(self):
+        if self.fail_ack:
+            raise ConnectionError("ack failed")
+
+
+class FakeQueue:
+    """Hands out up to `batch` queued messages per poll, and times out once empty."""
+
+    def __init__(self, msgs=()):
+        self.msgs = list(msgs)
+        self.batches = []
+        self.enqueued = []
+
+    async def dequeue_batch(self, batch: int, timeout: float):
+        self.batches.append(batch)
+        if not self.msgs:
+            await asyncio.sleep(0.01)
+            raise TimeoutError()
+        msgs, self.msgs = self.msgs[:batch], self.msgs[batch:]
+        return msgs
+
+    async def enqueue(self, item):
+        self.enqueued.append(item)
+
+
+class FakeDispatcher:
+    """Runs each task for a little while, tracking how many run at once."""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+
+    async def execute(self, assignment: TaskAssignment):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return SimpleNamespace(name=assignment.name)
+
+
+def worker_for(msgs, concurrency: int) -> Worker:
+    worker = Worker(
+        nc=None, task_dispatcher=FakeDispatcher(), concurrency=concurrency
+    )
+    worker.assignments_queue = FakeQueue(msgs)
+    worker.completions_queue = FakeQueue()
+    return worker
+
+
+async def run_until(worker: Worker, done):
+    """Run the worker until `done()`, then shut it down."""
+    run = asyncio.create_task(worker._run_continuous())
+    try:
+        async with asyncio.timeout(5):
+            while not done():
+                await asyncio.sleep(0.005)
+    finally:
+        run.cancel()
+        await run
+
+
+@pytest.mark.asyncio
+async def test_at_most_concurrency_tasks_run_at_once():
+    worker = worker_for([FakeMsg(f"task_{i}") for i in range(10)], concurrency=3)
+
+    await run_until(worker, lambda: worker.stats.tasks_completed == 10)
+
+    assert worker.stats.tasks_completed == 10
+    assert worker.task_dispatcher.max_running == 3
+    # (only polls for as many assignments as there are free slots)
+    assert max(worker.assignments_queue.batches) == 3
+    assert len(worker.completions_queue.enqueued) == 10
+
+
+@pytest.mark.asyncio
+async def test_slot_is_released_when_task_raises():
+    msgs = [FakeMsg("a", fail_ack=True), FakeMsg("b", fail_ack=True), FakeMsg("c")]
+    worker = worker_for(msgs, concurrency=1)
+
+    await run_until(worker, lambda: worker.stats.tasks_completed == 1)
+
+    # (the failed tasks' slot was given back, so the last assignment still ran)
+    assert [e.name for e in worker.completions_queue.enqueued] == ["c"]
+    assert not worker._in_flight
+    assert worker._slots._value == 1
+
+
+@pytest.mark.asyncio
+async def test_time_to_first_task_is_measured_from_node_start():
+    worker = worker_for([FakeMsg("a")], concurrency=1)
+    # (e.g. the node spent a while importing workflows before forking this worker)
+    worker.stats.node_started_at = worker.stats.started_at - 10
+
+    await run_until(worker, lambda: worker.stats.tasks_completed == 1)
+
+    assert worker.stats.time_to_first_task >= 10
+    assert worker.stats.uptime < 10